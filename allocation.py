@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import random
+
+
+def collect_preferences(students):
+    """Collect the ranked course preferences of the students.
+
+    Args:
+        students (iterable): The Student objects.
+
+    Returns:
+        preferences (dict): The ranked course ids by the student id, for the students with any preference.
+    """
+    return {student.student_id: list(student.preferences) for student in students if len(student.preferences) > 0}
+
+
+def allocate(manager, preferences, students, priorities=None, max_courses=None, seed=None):
+    """Allocate the seats of the courses to the whole population in rounds, when the registration opens.
+
+    Every student gets a lottery number. In each round, the students are served in the order of the priority,
+    then of the lottery number, and each one gets the best ranked course left that still has a seat and doesn't
+    clash with the schedule. The students are kept in a heap keyed by (round, priority, lottery), so one
+    allocation costs O(log n) and nobody gets a second course before everybody had the chance of a first one.
+
+    The registrations are written into the CourseManager as one batch, with all the locks held for the whole pass.
+
+    Args:
+        manager (CourseManager): The course manager.
+        preferences (dict): The ranked course ids by the student id, like from collect_preferences.
+        students (dict): The Student objects by the student id.
+        priorities (dict): The priority by the student id, the higher the earlier (like the seniority), 0 by default.
+        max_courses (int): The maximum number of courses given to a student, None for no limit.
+        seed (int): The seed of the lottery.
+
+    Returns:
+        allocations (dict): The course ids allocated by the student id, in the order they were allocated.
+    """
+    rng = random.Random(seed)
+    priorities = priorities if priorities is not None else {}
+
+    # The heap of (round, -priority, lottery, student_id), and the next preference of each student.
+    heap = []
+    next_preference = {}
+    for student_id in preferences:
+        if student_id not in students:
+            continue
+        next_preference[student_id] = 0
+        heap.append((0, -priorities.get(student_id, 0),
+                    rng.random(), student_id))
+    heapq.heapify(heap)
+
+    allocations = {student_id: [] for student_id in next_preference}
+    information = {}
+    # The pass holds every lock once, so each seat is checked and written without locking the course again.
+    with manager.exclusive_batch() as register:
+        while heap:
+            round_number, priority, lottery, student_id = heapq.heappop(heap)
+            ranked = preferences[student_id]
+            i = next_preference[student_id]
+            # Take the best ranked course left that is available for the student.
+            while i < len(ranked):
+                course_id = ranked[i]
+                i += 1
+                # A course with a waitlist is skipped too, the seats there go to the students waiting.
+                if course_id not in manager.courses or manager.available_seats(course_id) == 0 or manager.courses[course_id].get('Waitlist'):
+                    continue
+                if student_id in manager.courses[course_id]['Registration']:
+                    continue
+                if student_id not in information:
+                    information[student_id] = students[student_id].registration_information()
+                # The registration checks the clash with the schedule itself.
+                status, _ = register(course_id, information[student_id])
+                if status == 'registered':
+                    allocations[student_id].append(course_id)
+                    break
+            next_preference[student_id] = i
+
+            # The student waits for the next round if there is anything left to ask for.
+            if i < len(ranked) and (max_courses is None or len(allocations[student_id]) < max_courses):
+                heapq.heappush(heap, (round_number + 1,
+                               priority, lottery, student_id))
+
+    return allocations
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from records import NO_GRADE
+
+# The edges of the grade bands of the distributions: [0, 60), [60, 70), [70, 80), [80, 90), [90, 100].
+GRADE_BANDS = [60, 70, 80, 90]
+
+
+class GradeTable(object):
+    """The registrations flattened into columns once, for the reports over the whole registry.
+
+    Each registration is one row: the index of the student, the index of the course, the credits and the grade.
+    The ungraded registrations (the grade -1) count in the registered credits, but not in the averages.
+    """
+
+    def __init__(self, courses):
+        """The initialization for the object.
+
+        Args:
+            courses (dict or RegistrySnapshot): The courses dict in the format of the CourseManager, or a snapshot
+                of it from CourseManager.snapshot, so the report does not block the registration.
+        """
+        # The courses are read once, so the ids, the departments and the rows agree even for a live snapshot.
+        courses = list(courses.items())
+        # The ids of the students and the courses, in the order of their index.
+        self.student_ids = []
+        self.course_ids = [course_id for course_id, course in courses]
+        self.course_departments = [course['Information']['Department']
+                                   for course_id, course in courses]
+        self.student_departments = []
+
+        student_index = {}
+        students = []
+        course_indexes = []
+        credits = []
+        grades = []
+        for index, (course_id, course) in enumerate(courses):
+            registration = course['Registration']
+            for student_id, record in registration.items():
+                if student_id not in student_index:
+                    student_index[student_id] = len(self.student_ids)
+                    self.student_ids.append(student_id)
+                    self.student_departments.append(record['Department'])
+                students.append(student_index[student_id])
+                grades.append(record['Grade'])
+            course_indexes.extend([index] * len(registration))
+            credits.extend([course['Information']['Credits']]
+                           * len(registration))
+
+        self.students = np.array(students, dtype=np.int64)
+        self.courses = np.array(course_indexes, dtype=np.int64)
+        self.credits = np.array(credits, dtype=np.float64)
+        self.grades = np.array(grades, dtype=np.float64)
+        self.graded = self.grades != NO_GRADE
+
+    def __len__(self):
+        return len(self.grades)
+
+    def gpa(self):
+        """Compute the GPA score of every student, weighted by the credits of the graded courses.
+
+        Returns:
+            gpa (dict): {'StudentId': (gpa_score, graded_credits, registered_credits)},
+                the GPA score is None if no course of the student is graded yet.
+        """
+        count = len(self.student_ids)
+        weights = np.where(self.graded, self.credits, 0.0)
+        graded_credits = np.bincount(
+            self.students, weights=weights, minlength=count)
+        registered_credits = np.bincount(
+            self.students, weights=self.credits, minlength=count)
+        total_score = np.bincount(
+            self.students, weights=weights * self.grades, minlength=count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = total_score / graded_credits
+
+        gpa = {}
+        for student_id, score, graded, registered in zip(self.student_ids, scores.tolist(),
+                                                         graded_credits.tolist(), registered_credits.tolist()):
+            gpa[student_id] = (None if graded == 0 else score,
+                               int(graded), int(registered))
+        return gpa
+
+    def course_statistics(self):
+        """Compute the registrants, the average grade and the grade distribution of every course.
+
+        Returns:
+            statistics (dict): {'CourseId': {'Registrants': int, 'Graded': int, 'Average': float or None,
+                'Distribution': [count of each band of GRADE_BANDS]}}
+        """
+        count = len(self.course_ids)
+        bands = len(GRADE_BANDS) + 1
+        registrants = np.bincount(self.courses, minlength=count)
+        graded_courses = self.courses[self.graded]
+        graded_grades = self.grades[self.graded]
+        graded = np.bincount(graded_courses, minlength=count)
+        total = np.bincount(graded_courses, weights=graded_grades, minlength=count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = total / graded
+        # The course and the band are counted together as one index into a flat histogram.
+        distribution = np.bincount(graded_courses * bands + np.digitize(graded_grades, GRADE_BANDS),
+                                   minlength=count * bands).reshape(count, bands)
+
+        statistics = {}
+        for course_id, course_registrants, course_graded, average, course_distribution in zip(
+                self.course_ids, registrants.tolist(), graded.tolist(), averages.tolist(), distribution.tolist()):
+            statistics[course_id] = {'Registrants': course_registrants, 'Graded': course_graded,
+                                     'Average': None if course_graded == 0 else average,
+                                     'Distribution': course_distribution}
+        return statistics
+
+    def department_averages(self, by='course'):
+        """Compute the average grade of every department.
+
+        Args:
+            by (str): 'course' to group by the department of the course, 'student' by the department of the student.
+
+        Returns:
+            averages (dict): {'Department': average}, the departments without any grade are left out.
+        """
+        if by == 'course':
+            names, codes = np.unique(
+                self.course_departments, return_inverse=True)
+            rows = codes[self.courses]
+        elif by == 'student':
+            names, codes = np.unique(
+                self.student_departments, return_inverse=True)
+            rows = codes[self.students]
+        else:
+            raise ValueError("The department is grouped by 'course' or 'student'.")
+        rows = rows[self.graded]
+        total = np.bincount(
+            rows, weights=self.grades[self.graded], minlength=len(names))
+        graded = np.bincount(rows, minlength=len(names))
+        return {name: department_total / department_graded for name, department_total, department_graded
+                in zip(names.tolist(), total.tolist(), graded.tolist()) if department_graded > 0}
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from basic_class import *
+from registry import LazyRegistry
+from instrumentation import instrumented
+
+import instrumentation
 
 import json
 import datetime
+import concurrent.futures
 
 
+@instrumented()
 def init_course(file_name):
     """
     Initialize the Course object with the data from the file.
@@ -20,12 +26,30 @@ def init_course(file_name):
     with open(file_name, 'r') as f:
         data = json.load(f)
 
+    return course_from_data(data)
+
+
+@instrumented()
+def course_from_data(data):
+    """
+    Initialize the Course object with the data in the format of Course.to_dict.
+
+    Args:
+        data (dict): The data of the course.
+
+    Returns:
+        course (Course): The Course object that initialized.
+    """
+
     course = Course(data['course_id'],
-                    data['course_name'], data['department'], data['credits'], data['time'], data['location'])
+                    data['course_name'], data['department'], data['credits'], data['time'], data['location'], data.get('capacity'))
+    # The course is the same as in the storage.
+    course.mark_clean()
 
     return course
 
 
+@instrumented()
 def init_student(file_name):
     """
     Initialize the Student object with the data from the file.
@@ -40,7 +64,198 @@ def init_student(file_name):
     with open(file_name, 'r') as f:
         data = json.load(f)
 
+    return student_from_data(data)
+
+
+@instrumented()
+def student_from_data(data):
+    """
+    Initialize the Student object with the data in the format of Student.to_dict.
+
+    Args:
+        data (dict): The data of the student.
+
+    Returns:
+        student (Student): The Student object that initialized.
+    """
+
     student = Student(data['student_id'], data['last_name'],
                       data['first_name'], data['gender'], datetime.datetime.strptime(data['birthday'], "%Y-%m-%d"), data['department'])
+    student.preferences = list(data.get('preferences', []))
+    # The student is the same as in the storage.
+    student.mark_clean()
 
     return student
+
+
+def lazy_courses(storage, capacity=1024):
+    """
+    Get the registry of the Course objects that are loaded from the storage on demand.
+
+    Args:
+        storage (JsonStorage or SqliteStorage): The storage.
+        capacity (int): The maximum number of loaded courses kept.
+
+    Returns:
+        courses (LazyRegistry): The registry from the course id to the Course object.
+    """
+
+    return LazyRegistry(storage.course_ids, lambda course_id: course_from_data(storage.load_course_data(course_id)), capacity)
+
+
+def lazy_students(storage, capacity=1024):
+    """
+    Get the registry of the Student objects that are loaded from the storage on demand.
+
+    Args:
+        storage (JsonStorage or SqliteStorage): The storage.
+        capacity (int): The maximum number of loaded students kept.
+
+    Returns:
+        students (LazyRegistry): The registry from the student id to the Student object.
+    """
+
+    return LazyRegistry(storage.student_ids, lambda student_id: student_from_data(storage.load_student_data(student_id)), capacity)
+
+
+@instrumented()
+def export_changed(storage, workers=4):
+    """
+    Export the courses and the students changed since they were loaded or exported, and only them.
+
+    Args:
+        storage (JsonStorage or SqliteStorage): The storage.
+        workers (int): The number of threads writing the files.
+
+    Returns:
+        courses (int): The number of courses exported.
+        students (int): The number of students exported.
+    """
+
+    courses = Course.take_dirty()
+    students = Student.take_dirty()
+    try:
+        storage.export_many([course.to_dict() for course in courses],
+                            [student.to_dict() for student in students], workers)
+    except Exception:
+        # The objects stay changed, so they are exported the next time.
+        Course.dirty.update(courses)
+        Student.dirty.update(students)
+        raise
+    if instrumentation.ENABLED:
+        instrumentation.record_size(
+            'objects_exported', len(courses) + len(students))
+    return len(courses), len(students)
+
+
+def _load_chunk(init_function, file_names):
+    """
+    Load a chunk of files in a worker of the bulk loader.
+
+    Args:
+        init_function (function): init_course or init_student.
+        file_names (list): The names of the files to read.
+
+    Returns:
+        results (list): The (file name, object, error message) tuples, the object is None when the file is broken.
+    """
+
+    results = []
+    for file_name in file_names:
+        try:
+            results.append((file_name, init_function(file_name), None))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Report the broken file and go on with the others.
+            results.append((file_name, None, "{error_type}: {error}".format(
+                error_type=type(e).__name__, error=e)))
+    return results
+
+
+@instrumented()
+def bulk_load(directory, init_function, key, workers=4, chunk_size=256, executor='process'):
+    """
+    Load all the json files in the directory with a pool of workers.
+
+    Args:
+        directory (str): The directory to read, like './Courses/'.
+        init_function (function): init_course or init_student.
+        key (str): The attribute used as the key of the dict, like 'course_id'.
+        workers (int): The number of workers, 1 for loading in the current thread.
+        chunk_size (int): The number of files given to a worker at a time.
+        executor (str): 'process' for a process pool, 'thread' for a thread pool.
+
+    Returns:
+        objects (dict): The objects loaded, with the key given.
+        errors (dict): The error message for each file that can't be loaded.
+    """
+
+    file_names = [os.path.join(directory, file_name)
+                  for file_name in sorted(os.listdir(directory)) if file_name.endswith('.json')]
+    chunks = [file_names[i:i + chunk_size]
+              for i in range(0, len(file_names), chunk_size)]
+    if instrumentation.ENABLED:
+        instrumentation.record_size('files_loaded', len(file_names))
+
+    if workers <= 1:
+        results = map(_load_chunk, [init_function] * len(chunks), chunks)
+        return _collect_chunks(results, key)
+
+    if executor == 'process':
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    elif executor == 'thread':
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    else:
+        raise ValueError("Unknown executor {executor}.".format(
+            executor=executor))
+
+    with pool:
+        results = pool.map(_load_chunk, [init_function] * len(chunks), chunks)
+        return _collect_chunks(results, key)
+
+
+def _collect_chunks(results, key):
+    objects = {}
+    errors = {}
+    for chunk in results:
+        for file_name, obj, error in chunk:
+            if error is None:
+                objects[getattr(obj, key)] = obj
+            else:
+                errors[file_name] = error
+    return objects, errors
+
+
+def bulk_load_courses(directory='./Courses/', workers=4, chunk_size=256, executor='process'):
+    """
+    Load all the courses in the directory with a pool of workers.
+
+    Args:
+        directory (str): The directory of the course files.
+        workers (int): The number of workers.
+        chunk_size (int): The number of files given to a worker at a time.
+        executor (str): 'process' or 'thread'.
+
+    Returns:
+        courses (dict): The Course objects by the course id.
+        errors (dict): The error message for each file that can't be loaded.
+    """
+
+    return bulk_load(directory, init_course, 'course_id', workers, chunk_size, executor)
+
+
+def bulk_load_students(directory='./Students/', workers=4, chunk_size=256, executor='process'):
+    """
+    Load all the students in the directory with a pool of workers.
+
+    Args:
+        directory (str): The directory of the student files.
+        workers (int): The number of workers.
+        chunk_size (int): The number of files given to a worker at a time.
+        executor (str): 'process' or 'thread'.
+
+    Returns:
+        students (dict): The Student objects by the student id.
+        errors (dict): The error message for each file that can't be loaded.
+    """
+
+    return bulk_load(directory, init_student, 'student_id', workers, chunk_size, executor)
@@ -3,13 +3,76 @@
 
 import os
 import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
+import instrumentation
+from instrumentation import emit, instrumented
+from journal import apply_entry
+from records import build_view, compact_courses, compact_record
+from catalog import CatalogIndex
+from planner import RoomPlanner
+from registry import RegistrySnapshot, copy_course
+from storage import JsonStorage, write_entity_file
+from timetable import ScheduleIndex, compile_time, time_meetings, render_time, times_overlap, free_intervals, find_clashes, parse_time
 
-class Course(object):
+
+def _status_level(status):
+    """Get the level of the event for the status of a registration, a drop or a grade.
+
+    Args:
+        status (str): The status returned by register, drop or set_grade.
+    """
+    return 'warning' if status in ('course_not_found', 'not_registered', 'clash', 'full', 'already_waitlisted', 'already_registered') else 'info'
+
+
+class Tracked(object):
+    """The base class of the objects exported to the storage, which remembers the objects changed since
+    they were loaded or exported in the dirty set of their class.
+
+    Only assigning one of the attributes in TRACKED marks the object, a change inside a dict attribute
+    like the time of the course needs mark_dirty.
+    """
+    TRACKED = ()
+    dirty = set()
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self.TRACKED:
+            self.dirty.add(self)
+
+    def mark_dirty(self):
+        """Mark the object as changed.
+        """
+        self.dirty.add(self)
+
+    def mark_clean(self):
+        """Mark the object as saved, e.g. just loaded or exported.
+        """
+        self.dirty.discard(self)
+
+    @classmethod
+    def take_dirty(cls):
+        """Take the objects changed, which are clean afterwards.
+
+        Returns:
+            objects (list): The objects changed since they were loaded or exported.
+        """
+        objects = list(cls.dirty)
+        cls.dirty.difference_update(objects)
+        return objects
+
+
+class Course(Tracked):
     """The Course class.
     """
+    TRACKED = ('course_id', 'course_name', 'department',
+               'credits', 'time', 'location', 'capacity')
+    # The courses changed since they were loaded or exported.
+    dirty = set()
 
-    def __init__(self, course_id, course_name, department, credits, time, location):
+    def __init__(self, course_id, course_name, department, credits, time, location, capacity=None):
         """The initialization for the object.
 
         Args:
@@ -19,6 +82,7 @@ class Course(object):
             credits (int): The credits.
             time (dict): The time.
             location (str): The location.
+            capacity (int): The number of seats, None for no limit.
         """
         self.course_id = course_id
         self.course_name = course_name
@@ -26,12 +90,31 @@ class Course(object):
         self.credits = credits
         self.time = time
         self.location = location
+        self.capacity = capacity
 
-    def export_object(self):
-        """Export the object to a json file.
+    def __setattr__(self, name, value):
+        Tracked.__setattr__(self, name, value)
+        if name == 'time':
+            # The time is compiled once whenever it is set, while the dict is kept for the json files.
+            object.__setattr__(self, 'week_minutes', compile_time(value))
+
+    def overlaps(self, other):
+        """Check whether the course meets at the same time as the other course.
+
+        Args:
+            other (Course): The other Course object.
+
+        Returns:
+            overlap (bool): Whether any lesson of the two courses overlaps.
         """
+        return times_overlap(self.week_minutes, other.week_minutes)
 
-        # Convert the object's information into the dict format.
+    def to_dict(self):
+        """Convert the object's information into the dict format.
+
+        Returns:
+            objectInformation (dict): The information of the course.
+        """
         objectInformation = {
             'course_id': self.course_id,
             'course_name': self.course_name,
@@ -40,22 +123,18 @@ class Course(object):
             'time': self.time,
             'location': self.location
         }
+        # The capacity is only written when it is limited, so the files of the other courses are unchanged.
+        if self.capacity is not None:
+            objectInformation['capacity'] = self.capacity
+        return objectInformation
+
+    def export_object(self):
+        """Export the object to a json file.
+        """
 
-        if os.path.exists('./Courses/'):
-            # The directory exists.
-            pass
-        else:
-            # The directory doesn't exist.
-            os.mkdir('./Courses/')
-
-        # Check whether the file is existed.
-        if os.path.exists('./Courses/{course_id}.json'.format(course_id=self.course_id)):
-            # If the file is existed, we remove it.
-            os.remove(
-                './Courses/{course_id}.json'.format(course_id=self.course_id))
-        with open('./Courses/{course_id}.json'.format(course_id=self.course_id), 'w') as f:
-            json.dump(objectInformation, f)
         # Convert the object to a json file.
+        write_entity_file('./Courses/', self.course_id, self.to_dict())
+        self.mark_clean()
 
         # Note, we plan to set the time of the course with the dict object.
         # {'Lesson-1': {'Weekday': 'Monday', 'StartTime': '08:30', 'EndTime': '09:30'}, 'Lesson-2': {'Weekday': 'Monday', 'StartTime': '09:30', 'EndTime': '10:30'}}
@@ -63,14 +142,202 @@ class Course(object):
 
 class CourseManager(object):
 
-    def __init__(self):
-        if os.path.exists('courses.json'):
-            print("Initialize the course manager from the json data file.")
-            self.load_courses_file()
+    def __init__(self, storage=None, stripes=64):
+        """The initialization for the object.
+
+        Args:
+            storage (JsonStorage or SqliteStorage): The storage backend, the json file tree by default.
+            stripes (int): The number of locks the courses (and the students) are spread over.
+        """
+        # The course manager is safe under concurrent threads with lock striping: a course is guarded by
+        # the lock of its stripe and so is a student, so the registrations to different courses run in parallel.
+        # The locks are always taken in the order of the course stripes, then the student stripes, both ascending.
+        # Adding or removing a course takes all the locks.
+        self._course_locks = [threading.RLock() for _ in range(stripes)]
+        self._student_locks = [threading.RLock() for _ in range(stripes)]
+
+        # The reverse index from the student id to the ids of the registered courses.
+        # The inner dict is used as an ordered set: {'StudentId': {'CourseId': None, 'CourseId': None}}
+        self.student_courses = {}
+        # The same for the waitlists the student is on: {'StudentId': {'CourseId': None}}
+        self.student_waitlists = {}
+
+        # The time of each course compiled once into the minutes since the start of the week, the meetings
+        # of each course, and the interval index of the schedule of each student.
+        # {'CourseId': array('H', [Start, End, Start, End])}, {'CourseId': [(Weekday, StartMinute, EndMinute)]}, {'StudentId': ScheduleIndex}
+        self.course_times = {}
+        self.course_meetings = {}
+        self.schedules = {}
+
+        # The number of the registrants of each course, so that the seats are counted in constant time.
+        # {'CourseId': Count}
+        self.enrolled = {}
+
+        # The secondary indexes of the courses by the department, the meeting times, the location and the credits.
+        self.catalog = CatalogIndex()
+
+        # The occupancy of each room in the week, from the locations and the times of the courses.
+        self.rooms = RoomPlanner()
+
+        # The information of each student kept once, and shared by the compact records of the registrations.
+        # {'StudentId': StudentProfile}
+        self.profiles = {}
+
+        # The students whose selected courses changed since the last save, and the number of changes
+        # since the courses were loaded or saved, so that the saves of an idle session are skipped.
+        # The count is updated under the locks of different courses, so it is a Counter with its own lock.
+        self.changed_students = set()
+        self.changes_since_save = instrumentation.Counter()
+
+        # The views of each student derived from the registrations, built on the first read and dropped
+        # when the registrations of the student change, with the counters of the reads.
+        # {'StudentId': {'SelectedCourses': dict, 'Schedule': list, 'Grades': list, 'GPA': float, 'Credits': int}}
+        self.views = {}
+        self.view_hits = instrumentation.Counter()
+        self.view_misses = instrumentation.Counter()
+
+        # The versions of the courses dict for the snapshots: taking one bumps the epoch, and a course record a live
+        # snapshot may see is copied before its first change, with the old one kept in the history.
+        # {Version}, {'CourseId': Epoch the record was copied}, {'CourseId': [(Epoch, Record)]}
+        self._epoch = 0
+        self._snapshots = set()
+        self._copied = {}
+        self._history = {}
+
+        # Whether each thread is inside a batch.
+        self._local = threading.local()
+
+        # Every mutation is recorded by the storage, e.g. appended to the journal of courses.json.
+        self.storage = storage if storage is not None else JsonStorage()
+
+        if self.storage.exists():
+            emit('manager_initialized', "Initialize the course manager from the saved data.", saved=True)
         else:
-            print("Initialize the course manager.")
-            self.courses = {}
+            emit('manager_initialized', "Initialize the course manager.", saved=False)
+        self.load_courses_file()
+
+    def _apply(self, entry):
+        """Apply the mutation to the courses dict, keep the index in step, and record it in the storage.
+
+        Args:
+            entry (dict): The journal entry.
+        """
+        op = entry['Op']
+        if op == 'add_course' and entry['CourseId'] in self.courses.keys():
+            # The course is replaced with an empty registration, so we drop the old registrants from the index.
+            self._unindex_course(entry['CourseId'])
+        elif op == 'remove_course':
+            self._unindex_course(entry['CourseId'])
+        elif op == 'add_student' and entry['StudentId'] in self.courses[entry['CourseId']]['Registration']:
+            # The student registers again, the old registration is replaced.
+            self._unindex_registration(entry['CourseId'], entry['StudentId'])
+
+        if self._snapshots:
+            self._copy_on_write(entry)
+        apply_entry(self.courses, entry)
+        self.changes_since_save.add()
+        if op == 'set_grade':
+            self._touch_student(entry['StudentId'])
+        elif op == 'set_grades':
+            for course_id, student_id, grade in entry['Grades']:
+                self._touch_student(student_id)
+        elif op == 'set_capacity':
+            # The capacity is a part of the information in the selected courses of the registrants.
+            for student_id in self.courses[entry['CourseId']]['Registration'].keys():
+                self._touch_student(student_id)
+        if op == 'waitlist_student':
+            self.student_waitlists.setdefault(entry['StudentId'], {})[
+                entry['CourseId']] = None
+        elif op == 'unwaitlist_student':
+            self._unindex_waitlist(entry['CourseId'], entry['StudentId'])
+        if op == 'add_student' or op == 'waitlist_student':
+            # The record of the entry is replaced with the compact one, which shares the profile of the student.
+            records = self.courses[entry['CourseId']]['Registration' if op == 'add_student' else 'Waitlist']
+            records[entry['StudentId']] = compact_record(
+                self.profiles, entry['StudentId'], entry['Record'])
+
+        if op == 'add_course':
+            self.course_times[entry['CourseId']] = compile_time(
+                entry['Information']['Time'])
+            self.course_meetings[entry['CourseId']] = time_meetings(
+                self.course_times[entry['CourseId']])
+            self.enrolled[entry['CourseId']] = 0
+            self.catalog.add(entry['CourseId'], entry['Information'],
+                             self.course_meetings[entry['CourseId']])
+            self.rooms.add(entry['CourseId'], entry['Information']['Location'],
+                           self.course_times[entry['CourseId']])
+        elif op == 'remove_course':
+            del self.course_times[entry['CourseId']]
+            del self.course_meetings[entry['CourseId']]
+            del self.enrolled[entry['CourseId']]
+            self.catalog.remove(entry['CourseId'])
+            self.rooms.remove(entry['CourseId'])
+        elif op == 'add_student':
+            self._index_registration(entry['CourseId'], entry['StudentId'])
+        elif op == 'remove_student':
+            self._unindex_registration(entry['CourseId'], entry['StudentId'])
+
+        # The entry is recorded while the locks of the change are held, so the storage gets the entries in the
+        # order they happened. Inside a batch, they are only made durable together at the end.
+        self.storage.record(entry, sync=not getattr(
+            self._local, 'in_batch', False))
+
+    def _copy_on_write(self, entry):
+        """Keep the course records of the entry for the live snapshots, and copy the ones changed in place.
 
+        Args:
+            entry (dict): The journal entry about to be applied.
+        """
+        op = entry['Op']
+        if op == 'set_grades':
+            course_ids = {course_id for course_id, student_id, grade in entry['Grades']}
+        else:
+            course_ids = [entry['CourseId']]
+        for course_id in course_ids:
+            if self._copied.get(course_id) == self._epoch:
+                # The record is new since the last snapshot, so no snapshot sees it.
+                continue
+            course = self.courses.get(course_id)
+            # The old record goes into the history before it is replaced, see RegistrySnapshot._resolve.
+            self._history.setdefault(course_id, []).append((self._epoch, course))
+            if course is not None and op != 'add_course' and op != 'remove_course':
+                self.courses[course_id] = copy_course(course)
+            self._copied[course_id] = self._epoch
+
+    @contextmanager
+    def _locked(self, course_ids=(), student_ids=()):
+        """Hold the locks of the courses and the students given, in the global order.
+
+        Args:
+            course_ids (iterable): The ids of the courses.
+            student_ids (iterable): The ids of the students.
+        """
+        stripes = len(self._course_locks)
+        locks = [self._course_locks[i] for i in sorted({hash(course_id) % stripes for course_id in course_ids})] + \
+            [self._student_locks[i] for i in sorted(
+                {hash(student_id) % stripes for student_id in student_ids})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @contextmanager
+    def _locked_all(self):
+        """Hold all the locks, for the changes of the courses list and the reads of the whole registry.
+        """
+        locks = self._course_locks + self._student_locks
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @instrumented()
     def add_courses(self, course):
         """Add the course into the courses dict.
 
@@ -79,11 +346,39 @@ class CourseManager(object):
         """
         # We set the template of the record in course manager object like below:
         # {'Information': {'Name': course.course_name, 'Department': course.department, 'Credits': course.credits, 'Time': course.time, 'Location': course.location}, 'Registration': {'StudentId': {'Name': StudentName, 'Grade': StudentGrade, 'Department': StudentDept, 'Gender': StudentGender}, 'StudentId': {'Name': StudentName, 'Grade': StudentGrade, 'Department': StudentDept, 'Gender': StudentGender}, 'StudentId': {'Name': StudentName, 'Grade': StudentGrade, 'Department': StudentDept, 'Gender': StudentGender}}}
-        self.courses[course.course_id] = {'Information': {'Name': course.course_name, 'Department': course.department,
-                                                          'Credits': course.credits, 'Time': course.time, 'Location': course.location},
-                                          'Registration': {}}
-        print("The course is added into the courses dict.")
+        # A course with limited seats also has 'Capacity' in the information, and the ordered 'Waitlist' once somebody waits:
+        # {'Waitlist': {'StudentId': {'Name': StudentName, 'Department': StudentDept, 'Gender': StudentGender}}}
+        information = self.course_information(course)
+        with self._locked_all():
+            self._apply({'Op': 'add_course', 'CourseId': course.course_id,
+                         'Information': information})
+            # The course is added anyway, but the room booked twice is reported.
+            conflicts = self.rooms.conflicts(
+                course.location, self.course_times[course.course_id], ignore=course.course_id)
+        emit('course_added', "The course is added into the courses dict.",
+             course_id=course.course_id)
+        if conflicts:
+            emit('room_double_booked', "The location {location} is already booked at the same time by the course(s) {course_ids}.".format(
+                location=course.location, course_ids=', '.join(conflicts)), level='warning', course_id=course.course_id, conflicts=conflicts)
+
+    @staticmethod
+    def course_information(course):
+        """Get the information of the course as kept in the courses dict.
 
+        Args:
+            course (Course): The Course object.
+
+        Returns:
+            information (dict): {'Name': ..., 'Department': ..., 'Credits': ..., 'Time': ..., 'Location': ...},
+                with 'Capacity' for a course with limited seats.
+        """
+        information = {'Name': course.course_name, 'Department': course.department,
+                       'Credits': course.credits, 'Time': course.time, 'Location': course.location}
+        if getattr(course, 'capacity', None) is not None:
+            information['Capacity'] = course.capacity
+        return information
+
+    @instrumented()
     def remove_courses(self, course_id):
         """Remove the course with the course id given.
 
@@ -91,14 +386,21 @@ class CourseManager(object):
             course_id (str): The id of the course.
         """
 
-        # First, we check whether the course is in the courses list.
-        if course_id in self.courses.keys():
-            # If the course is in the courses list, we remove the course.
-            del self.courses[course_id]
-            print("The course is removed.")
+        with self._locked_all():
+            # First, we check whether the course is in the courses list.
+            removed = course_id in self.courses.keys()
+            if removed:
+                # If the course is in the courses list, we remove the course.
+                registrants = list(self.courses[course_id]['Registration'])
+                self._apply({'Op': 'remove_course', 'CourseId': course_id})
+        if removed:
+            emit('course_removed', "The course is removed.", course_id=course_id)
+            # The course removed no longer clashes with the courses its registrants wait for.
+            for student_id in registrants:
+                self._recheck_waitlists(student_id)
         else:
-            print(
-                "The course is not in the courses list, so you can't remove the course.")
+            emit('course_not_found', "The course is not in the courses list, so you can't remove the course.",
+                 level='warning', course_id=course_id)
 
     def add_students(self, course_id, student_information):
         """Add the student into the course.
@@ -107,15 +409,63 @@ class CourseManager(object):
             course_id (str): The course id.
             student_information (dict): The student information.
         """
+        status, message = self.register(course_id, student_information)
+        if message is not None:
+            emit(status, message, level=_status_level(status), course_id=course_id,
+                 student_id=student_information['Student_id'])
 
+    @instrumented()
+    def register(self, course_id, student_information):
+        """Add the student into the course without printing, used by add_students and the batch API.
+
+        Args:
+            course_id (str): The course id.
+            student_information (dict): The student information.
+
+        Returns:
+            status (str): 'registered', 'waitlisted', 'already_registered', 'already_waitlisted', 'clash' or 'course_not_found'.
+            message (str): The message for the user, None if there is nothing to say.
+        """
+
+        with self._locked([course_id], [student_information['Student_id']]):
+            return self._register_locked(course_id, student_information)
+
+    def _register_locked(self, course_id, student_information):
         # First, we check whether the course is in the courses list.
-        if course_id in self.courses.keys():
-            # If the course is in the courses list, we add the student into the course.
-            # The grade is initialized to -1.
-            self.courses[course_id]['Registration'][student_information['Student_id']] = {
-                'Name': student_information['Name'], 'Grade': -1, 'Department': student_information['Department'], 'Gender': student_information['Gender']}
-        else:
-            print("The course is not in the courses list, so you can't add the student.")
+        if course_id not in self.courses.keys():
+            return 'course_not_found', "The course is not in the courses list, so you can't add the student."
+
+        student_id = student_information['Student_id']
+        # Next, we check whether the student is in the course already. Nothing is written, as adding the
+        # student again would replace the record and reset the grade.
+        if student_id in self.courses[course_id]['Registration']:
+            return 'already_registered', "The student is already in the course."
+
+        # Next, we check whether the course clashes with the schedule of the student.
+        clash = self.find_clash(course_id, student_id)
+        if clash is not None:
+            return 'clash', "The course clashes with the course {clash} in the schedule, so you can't add the student.".format(clash=clash)
+
+        # Then, we check whether there is a seat left for a new registrant. The waitlist goes first: a seat is only
+        # free while somebody waits when all of them clash with the course, and then a newcomer still waits behind them.
+        waitlisted = self.is_waitlisted(course_id, student_id)
+        if self.available_seats(course_id) == 0 or (not waitlisted and self.courses[course_id].get('Waitlist')):
+            if waitlisted:
+                return 'already_waitlisted', "The student is already on the waitlist of the course."
+            self._apply({'Op': 'waitlist_student', 'CourseId': course_id, 'StudentId': student_id,
+                         'Record': {'Name': student_information['Name'], 'Department': student_information['Department'], 'Gender': student_information['Gender']}})
+            return 'waitlisted', "The course is full, the student is put on the waitlist at position {position}.".format(
+                position=len(self.courses[course_id]['Waitlist']))
+
+        if waitlisted:
+            # The student takes the seat, so the student leaves the waitlist.
+            self._apply({'Op': 'unwaitlist_student',
+                         'CourseId': course_id, 'StudentId': student_id})
+        # If the course is in the courses list, we add the student into the course.
+        # The grade is initialized to -1.
+        self._apply({'Op': 'add_student', 'CourseId': course_id, 'StudentId': student_id,
+                     'Record': {'Name': student_information['Name'], 'Grade': -1, 'Department': student_information['Department'], 'Gender': student_information['Gender']}})
+        return 'registered', None
 
     def remove_student(self, course_id, student_id):
         """Remove the student with the course id and student id given.
@@ -124,33 +474,380 @@ class CourseManager(object):
             course_id (str): The id of the course.
             student_id (str): The id of the student.
         """
+        status, message, promoted = self.drop(course_id, student_id)
+        if message is not None:
+            emit(status, message, level=_status_level(status),
+                 course_id=course_id, student_id=student_id)
+        for promoted_id in promoted:
+            emit('promoted', "The student {student_id} is promoted from the waitlist of the course {course_id}.".format(
+                student_id=promoted_id, course_id=course_id), course_id=course_id, student_id=promoted_id)
+
+    @instrumented()
+    def drop(self, course_id, student_id):
+        """Remove the student from the course or its waitlist without printing, used by remove_student and the batch API.
 
-        # First, we check whether the course is in the courses list.
-        if course_id in self.courses.keys():
-            # Next, we check whether the student is in this course.
-            if student_id in self.courses[course_id]['Registration'].keys():
-                # If the student is in the course, we remove the student.
-                del self.courses[course_id]['Registration'][student_id]
-            else:
-                print("The student is not in the course.")
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+
+        Returns:
+            status (str): 'dropped', 'unwaitlisted', 'not_registered' or 'course_not_found'.
+            message (str): The message for the user, None if there is nothing to say.
+            promoted (list): The ids of the students promoted from the waitlist. The student who dropped may also be
+                promoted from the waitlists of other courses, which is reported as the 'promoted' events.
+        """
+
+        with self._locked([course_id]):
+            # First, we check whether the course is in the courses list.
+            if course_id not in self.courses.keys():
+                return 'course_not_found', "The course is not in the courses list, so you can't remove the student.", []
+
+            # The lock of the student is released before the promotion, which takes the locks of other students.
+            with self._locked(student_ids=[student_id]):
+                # Next, we check whether the student is in this course.
+                if student_id in self.courses[course_id]['Registration'].keys():
+                    # If the student is in the course, we remove the student, and the seat goes to the waitlist.
+                    self._apply({'Op': 'remove_student',
+                                 'CourseId': course_id, 'StudentId': student_id})
+                elif self.is_waitlisted(course_id, student_id):
+                    # If the student is waiting for the course, we remove the student from the waitlist.
+                    self._apply({'Op': 'unwaitlist_student',
+                                 'CourseId': course_id, 'StudentId': student_id})
+                    return 'unwaitlisted', "The student is removed from the waitlist.", []
+                else:
+                    return 'not_registered', "The student is not in the course.", []
+            promoted = self._promote_waitlist(course_id)
+        # The course dropped may have been the clash that kept the student on the waitlist of other courses.
+        self._recheck_waitlists(student_id)
+        return 'dropped', None, promoted
+
+    @instrumented()
+    def register_all(self, course_ids, student_information):
+        """Add the student into all the courses atomically: either every course is registered or none.
+
+        Nobody else can change these courses or the schedule of the student in between, and no course
+        goes to the waitlist.
+
+        Args:
+            course_ids (list): The ids of the courses.
+            student_information (dict): The student information.
+
+        Returns:
+            status (str): 'registered' or the status of the course that failed, like 'clash' or 'full'.
+            message (str): The message for the user, None if every course is registered.
+        """
+        student_id = student_information['Student_id']
+        with self._locked(course_ids, [student_id]):
+            # First, we check all the courses, including the clashes between the new courses themselves.
+            new_schedule = ScheduleIndex()
+            for course_id in course_ids:
+                if course_id not in self.courses.keys():
+                    return 'course_not_found', "The course {course_id} is not in the courses list.".format(course_id=course_id)
+                if student_id in self.courses[course_id]['Registration']:
+                    return 'already_registered', "The student is already in the course {course_id}.".format(course_id=course_id)
+                if self.available_seats(course_id) == 0 or (self.courses[course_id].get('Waitlist') and not self.is_waitlisted(course_id, student_id)):
+                    # The students on the waitlist go first, see _register_locked.
+                    return 'full', "The course {course_id} is full.".format(course_id=course_id)
+                clash = self.find_clash(course_id, student_id) or new_schedule.clash(
+                    self.course_meetings[course_id])
+                if clash is not None:
+                    return 'clash', "The course {course_id} clashes with the course {clash}.".format(course_id=course_id, clash=clash)
+                new_schedule.add(course_id, self.course_meetings[course_id])
+
+            # Then, we register all of them.
+            for course_id in course_ids:
+                self._register_locked(course_id, student_information)
+        return 'registered', None
+
+    @instrumented()
+    def snapshot(self):
+        """Take a read-only view of the courses at this moment in constant time, for a long report.
+
+        The registration goes on meanwhile: only the course records changed while the snapshot is alive are copied.
+
+        Returns:
+            snapshot (RegistrySnapshot): The dict-like view, released at the end of a with block or by release().
+        """
+        # A change under way, which may span several courses, is either fully in the snapshot or not at all.
+        with self._locked_all():
+            version = self._epoch
+            self._epoch += 1
+            self._snapshots.add(version)
+            return RegistrySnapshot(self, version, self.courses, self._history, len(self.courses))
+
+    def _release_snapshot(self, version):
+        """Drop the old course records that no live snapshot sees any more.
+
+        Args:
+            version (int): The version of the snapshot released.
+        """
+        with self._locked_all():
+            self._snapshots.discard(version)
+            if not self._snapshots:
+                self._history.clear()
+                return
+            oldest = min(self._snapshots)
+            for course_id in list(self._history):
+                # The list is replaced, not changed, as a snapshot may be reading it.
+                kept = [(epoch, course) for epoch, course in self._history[course_id]
+                        if epoch > oldest]
+                if kept:
+                    self._history[course_id] = kept
+                else:
+                    del self._history[course_id]
+            if instrumentation.ENABLED:
+                instrumentation.record_size(
+                    'snapshot_history', len(self._history))
+
+    @contextmanager
+    def batch(self):
+        """Defer the fsync (or the commit) of the changes made inside the with block, and make them durable together at the end.
+
+        The changes are still recorded one by one as they happen, so the order of the storage is the order in memory.
+        """
+        if getattr(self._local, 'in_batch', False):
+            # Already inside a batch, the outer one flushes the changes.
+            yield
+            return
+        self._local.in_batch = True
+        try:
+            yield
+        finally:
+            self._local.in_batch = False
+            self.storage.flush()
+
+    @contextmanager
+    def exclusive_batch(self):
+        """Hold all the locks for a pass over the whole registry, like the seat allocation, with the changes in one batch.
+
+        Nothing else changes the courses meanwhile, so each seat is checked and registered without locking again.
+
+        Yields:
+            register (function): Register the student like register, with the same arguments and returns.
+        """
+        with self.batch(), self._locked_all():
+            yield self._register_locked
+
+    @instrumented()
+    def process_batch(self, requests, students):
+        """Process many registration requests without any prompt, e.g. on the opening day.
+
+        The requests are validated first, then applied in one pass. The changes are made durable in the storage
+        together at the end, and the selected courses of each Student object used are synced once.
+
+        Args:
+            requests (iterable): The (student_id, course_id, action) tuples, the action is 'add' or 'drop'.
+            students (dict): The Student objects by the student id, like students_dict in main.py.
+
+        Returns:
+            results (list): A dict for each request, in the same order, with the keys
+                'StudentId', 'CourseId', 'Action', 'Status', 'Message' and 'Promoted'.
+        """
+        results = []
+        # First, we validate all the requests before changing anything.
+        for student_id, course_id, action in requests:
+            result = {'StudentId': student_id, 'CourseId': course_id, 'Action': action,
+                      'Status': None, 'Message': None, 'Promoted': []}
+            if action not in ('add', 'drop'):
+                result['Status'], result['Message'] = 'invalid', "The action must be 'add' or 'drop'."
+            elif course_id not in self.courses:
+                result['Status'], result['Message'] = 'course_not_found', "The course is not in the courses list."
+            elif action == 'add' and student_id not in students:
+                result['Status'], result['Message'] = 'student_not_found', "The student is not the registrant in the system."
+            results.append(result)
+
+        # Next, we apply the valid requests in one pass, made durable together at the end.
+        touched = {}
+        with self.batch():
+            for result in results:
+                if result['Status'] is not None:
+                    continue
+                student_id, course_id = result['StudentId'], result['CourseId']
+                if result['Action'] == 'add':
+                    student = students[student_id]
+                    touched[student_id] = student
+                    result['Status'], result['Message'] = self.register(
+                        course_id, student.registration_information())
+                else:
+                    if student_id not in touched and student_id in students:
+                        touched[student_id] = students[student_id]
+                    result['Status'], result['Message'], result['Promoted'] = self.drop(
+                        course_id, student_id)
+
+        # At last, we sync the selected courses of the students once, the ones who only dropped too.
+        for student in touched.values():
+            self.sync_selected_courses(student)
+        if instrumentation.ENABLED:
+            instrumentation.record_size('batch_requests', len(results))
+        return results
+
+    @instrumented()
+    def set_course_capacity(self, course_id, capacity):
+        """Set the number of seats of the course, the waitlisted students are promoted if there are more seats.
+
+        Args:
+            course_id (str): The id of the course.
+            capacity (int): The number of seats, None for no limit.
+        """
+        with self._locked([course_id]):
+            found = course_id in self.courses.keys()
+            if found:
+                self._apply({'Op': 'set_capacity',
+                             'CourseId': course_id, 'Capacity': capacity})
+                promoted = self._promote_waitlist(course_id)
+        if found:
+            for student_id in promoted:
+                emit('promoted', "The student {student_id} is promoted from the waitlist of the course {course_id}.".format(
+                    student_id=student_id, course_id=course_id), course_id=course_id, student_id=student_id)
         else:
-            print(
-                "The course is not in the courses list, so you can't remove the student.")
+            emit('course_not_found', "The course is not in the courses list, so you can't set the capacity.",
+                 level='warning', course_id=course_id)
+
+    def available_seats(self, course_id):
+        """Get the number of the seats left in the course, in constant time.
+
+        Args:
+            course_id (str): The id of the course.
+
+        Returns:
+            seats (int or float): The seats left, infinity if the seats are not limited.
+        """
+        capacity = self.courses[course_id]['Information'].get('Capacity')
+        if capacity is None:
+            return float('inf')
+        return max(capacity - self.enrolled[course_id], 0)
+
+    def is_waitlisted(self, course_id, student_id):
+        """Check whether the student is on the waitlist of the course.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+        """
+        return student_id in self.courses[course_id].get('Waitlist', ())
+
+    def _promote_waitlist(self, course_id):
+        """Give the free seats of the course to the first eligible students on the waitlist.
 
+        A waitlisted student whose schedule now clashes with the course keeps the position and is skipped.
+        The lock of the course must be held, the lock of each student is taken in turn.
+
+        The waitlist is walked in place from the front, so a promotion costs constant time plus the students
+        skipped, whatever the length of the waitlist.
+
+        Args:
+            course_id (str): The id of the course.
+
+        Returns:
+            promoted (list): The ids of the students promoted.
+        """
+        promoted = []
+        waitlist = self.courses[course_id].get('Waitlist')
+        while waitlist and self.available_seats(course_id) > 0:
+            # The waitlist is not copied: every change below is followed by a break, before the iteration goes on.
+            for student_id in waitlist:
+                with self._locked(student_ids=[student_id]):
+                    if student_id in self.courses[course_id]['Registration']:
+                        # The student is registered already, e.g. in the data loaded, so the registration and
+                        # its grade are kept, and only the place on the waitlist is dropped.
+                        self._apply({'Op': 'unwaitlist_student',
+                                     'CourseId': course_id, 'StudentId': student_id})
+                        break
+                    if self.find_clash(course_id, student_id) is None:
+                        record = waitlist[student_id]
+                        self._apply({'Op': 'unwaitlist_student',
+                                     'CourseId': course_id, 'StudentId': student_id})
+                        self._apply({'Op': 'add_student', 'CourseId': course_id, 'StudentId': student_id,
+                                     'Record': {'Name': record['Name'], 'Grade': -1, 'Department': record['Department'], 'Gender': record['Gender']}})
+                        promoted.append(student_id)
+                        break
+            else:
+                # Nobody on the waitlist is eligible.
+                break
+            waitlist = self.courses[course_id].get('Waitlist')
+        return promoted
+
+    def _recheck_waitlists(self, student_id):
+        """Promote from the waitlists the student is on, once a course of the student is dropped or removed,
+        which may have been the clash that kept the student waiting. No lock may be held.
+
+        Args:
+            student_id (str): The id of the student.
+        """
+        for course_id in list(self.student_waitlists.get(student_id, ())):
+            with self._locked([course_id]):
+                promoted = self._promote_waitlist(course_id) if course_id in self.courses else []
+            for promoted_id in promoted:
+                emit('promoted', "The student {student_id} is promoted from the waitlist of the course {course_id}.".format(
+                    student_id=promoted_id, course_id=course_id), course_id=course_id, student_id=promoted_id)
+
+    @instrumented()
     def sync_selected_courses(self, student):
         """Sync the courses with the student.
 
         Args:
             student (Student): The student object.
         """
-        # First, we clear the existed selected courses.
-        student.selected_courses.clear()
+        # The new selected courses replace the old ones at once, so a reader never sees a half built schedule.
+        student.selected_courses = self.build_selected_courses(
+            student.student_id)
 
-        # Sync the new selected courses.
-        for course_id in self.courses.keys():
-            if student.student_id in self.courses[course_id]['Registration'].keys():
-                student.selected_courses[course_id] = {'Information': self.courses[course_id]['Information'],
-                                                       'Grade': self.courses[course_id]['Registration'][student.student_id]['Grade']}
+    def build_selected_courses(self, student_id):
+        """Get the selected courses of the student, without the Student object.
+
+        Args:
+            student_id (str): The id of the student.
+
+        Returns:
+            selected_courses (dict): The selected courses in the format of Student.selected_courses,
+                shared with the view of the student, so it must not be modified.
+        """
+        return self.student_view(student_id)['SelectedCourses']
+
+    @instrumented()
+    def student_view(self, student_id):
+        """Get the views of the student derived from the registrations, built once until they change.
+
+        Args:
+            student_id (str): The id of the student.
+
+        Returns:
+            view (dict): The view with the keys 'SelectedCourses', 'Schedule', 'Grades', 'GPA' and 'Credits', from
+                build_view, the GPA is None if no course of the student is graded yet. It must not be modified.
+        """
+        with self._locked(student_ids=[student_id]):
+            view = self.views.get(student_id)
+            if view is not None:
+                self.view_hits.add()
+                return view
+            self.view_misses.add()
+
+            # Only visit the courses the student registered.
+            view = build_view((course_id, self.courses[course_id]['Information'],
+                               self.courses[course_id]['Registration'][student_id]['Grade'])
+                              for course_id in self.get_student_course_ids(student_id))
+            self.views[student_id] = view
+            if instrumentation.ENABLED:
+                instrumentation.record_size(
+                    'view_registrations_touched', len(view['SelectedCourses']))
+            return view
+
+    def view_statistics(self):
+        """Get the counters of the views of the students.
+
+        Returns:
+            statistics (dict): The hits, the misses and the number of views kept.
+        """
+        return {'Hits': self.view_hits.value, 'Misses': self.view_misses.value, 'Views': len(self.views)}
+
+    def _touch_student(self, student_id):
+        """Mark the registrations of the student as changed: the selected courses are saved again, and the views are dropped.
+
+        Args:
+            student_id (str): The id of the student.
+        """
+        self.changed_students.add(student_id)
+        self.views.pop(student_id, None)
 
     def set_course_grade(self, course_id, student_id, grade):
         """Set the grade with course id and student id given.
@@ -160,29 +857,351 @@ class CourseManager(object):
             student_id (str): The id of the student.
             grade (float): The grade.
         """
-        # First, we check whether the course is in the courses list.
-        if course_id in self.courses.keys():
+        status, message = self.set_grade(course_id, student_id, grade)
+        if message is not None:
+            emit(status, message, level=_status_level(status),
+                 course_id=course_id, student_id=student_id)
+
+    @instrumented()
+    def set_grade(self, course_id, student_id, grade):
+        """Set the grade without printing, used by set_course_grade and the service.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+            grade (float): The grade.
+
+        Returns:
+            status (str): 'graded', 'not_registered' or 'course_not_found'.
+            message (str): The message for the user, None if there is nothing to say.
+        """
+        # The lock of the student is held too, so no view of the student is built with the old grade meanwhile.
+        with self._locked([course_id], [student_id]):
+            # First, we check whether the course is in the courses list.
+            if course_id not in self.courses.keys():
+                return 'course_not_found', "The course is not in the courses list, so you can't set the grade."
             # Next, we check whether the student is in this course.
-            if student_id in self.courses[course_id]['Registration'].keys():
-                # If the student is in the course, we set the grade for the student.
-                self.courses[course_id]['Registration'][student_id]['Grade'] = grade
-            else:
-                print("The student is not in the course.")
-        else:
-            print("The course is not in the courses list, so you can't set the grade.")
+            if student_id not in self.courses[course_id]['Registration'].keys():
+                return 'not_registered', "The student is not in the course."
+            # If the student is in the course, we set the grade for the student.
+            self._apply({'Op': 'set_grade', 'CourseId': course_id,
+                         'StudentId': student_id, 'Grade': grade})
+            return 'graded', None
 
-    def save_courses_file(self):
-        """Save the courses into json file.
+    @instrumented()
+    def set_grades(self, grades):
+        """Set many grades at once, e.g. a whole grade sheet, recorded in the storage as one entry.
+
+        Args:
+            grades (list): The (course_id, student_id, grade) tuples, the grades between 0 and 100.
+
+        Returns:
+            applied (int): The number of grades set.
+            skipped (list): The (course_id, student_id, status) tuples of the grades not set, the status is
+                'course_not_found' or 'not_registered'.
         """
-        with open('courses.json', 'w') as f:
-            json.dump(self.courses, f)
+        applied = []
+        skipped = []
+        with self._locked({course_id for course_id, student_id, grade in grades},
+                          {student_id for course_id, student_id, grade in grades}):
+            # The grades are checked again under the locks, as a student may drop a course meanwhile.
+            for course_id, student_id, grade in grades:
+                if course_id not in self.courses:
+                    skipped.append((course_id, student_id, 'course_not_found'))
+                elif student_id not in self.courses[course_id]['Registration']:
+                    skipped.append((course_id, student_id, 'not_registered'))
+                else:
+                    applied.append([course_id, student_id, grade])
+            if applied:
+                self._apply({'Op': 'set_grades', 'Grades': applied})
+        if instrumentation.ENABLED:
+            instrumentation.record_size('grades_set', len(applied))
+        return len(applied), skipped
+
+    def compute_gpa(self, student_id):
+        """Compute the GPA score of the student, weighted by the credits of the graded courses.
 
+        Args:
+            student_id (str): The id of the student.
+
+        Returns:
+            gpa_score (float): The GPA score, None if no course of the student is graded yet.
+            total_credits (int): The total credits.
+        """
+        view = self.student_view(student_id)
+        return view['GPA'], view['Credits']
+
+    @instrumented()
+    def save_courses_file(self):
+        """Save the courses into the storage, unless nothing changed since they were loaded or saved.
+
+        For the json storage, courses.json becomes the new snapshot and the journal segments it covers are dropped.
+
+        Returns:
+            saved (bool): Whether the courses are saved.
+        """
+        with self._locked_all():
+            if self.changes_since_save.value == 0:
+                emit('save_skipped', "The courses are unchanged, so the save is skipped.")
+                return False
+            self.storage.save_courses(self.courses)
+            self.changes_since_save.reset()
+        return True
+
+    @instrumented()
     def load_courses_file(self):
-        """Load the courses from json file.
+        """Load the courses from the storage, e.g. courses.json with the journal written after it.
+        """
+        with self._locked_all():
+            self.courses, replayed = self.storage.load_courses()
+            self._build_indexes()
+            # The courses are the same as in the storage, but the changes replayed from the journal are
+            # not in the snapshot yet, so they count for the next save.
+            self.changed_students = set()
+            self.views = {}
+            self.changes_since_save.reset(replayed)
+        if instrumentation.ENABLED:
+            instrumentation.record_size('courses_loaded', len(self.courses))
+            instrumentation.record_size(
+                'registrations_loaded', sum(self.enrolled.values()))
+
+    @instrumented()
+    def save_selected_courses(self):
+        """Export the selected courses of the students whose registrations changed since the last save.
+
+        A student who dropped every course gets an empty file, so no old schedule is left behind.
+
+        Returns:
+            saved (int): The number of students whose selected courses are exported.
+        """
+        changed_students, self.changed_students = self.changed_students, set()
+        for student_id in changed_students:
+            self.storage.export_selected_courses(
+                student_id, self.build_selected_courses(student_id))
+        return len(changed_students)
+
+    def flush(self):
+        """Make the changes so far durable.
+        """
+        self.storage.flush()
+
+    def close(self):
+        """Flush and release the storage before exiting.
+        """
+        self.storage.close()
+
+    def _build_indexes(self):
+        """Rebuild the reverse indexes, the meetings and the schedules from the courses dict, with the compact records.
+        """
+        self.student_courses = {}
+        self.student_waitlists = {}
+        self.course_times = {}
+        self.course_meetings = {}
+        self.schedules = {}
+        self.enrolled = {}
+        self.catalog = CatalogIndex()
+        self.rooms = RoomPlanner()
+        # The snapshots taken before keep the old courses dict and history, which nothing changes any more.
+        self._copied = {}
+        self._history = {}
+        compact_courses(self.courses, self.profiles)
+        for course_id in self.courses.keys():
+            self.course_times[course_id] = compile_time(
+                self.courses[course_id]['Information']['Time'])
+            self.course_meetings[course_id] = time_meetings(
+                self.course_times[course_id])
+            self.catalog.add(
+                course_id, self.courses[course_id]['Information'], self.course_meetings[course_id])
+            self.rooms.add(course_id, self.courses[course_id]['Information']['Location'],
+                           self.course_times[course_id])
+            self.enrolled[course_id] = 0
+            if 'Waitlist' in self.courses[course_id]:
+                # The students leave the waitlist from the front, and the first one left is found in constant time
+                # in the OrderedDict, while a dict would walk over the removed entries first.
+                self.courses[course_id]['Waitlist'] = OrderedDict(
+                    self.courses[course_id]['Waitlist'])
+                for student_id in self.courses[course_id]['Waitlist']:
+                    self.student_waitlists.setdefault(
+                        student_id, {})[course_id] = None
+            for student_id in self.courses[course_id]['Registration'].keys():
+                self._index_registration(course_id, student_id)
+
+    def get_student_course_ids(self, student_id):
+        """Get the ids of the courses the student registered.
+
+        Args:
+            student_id (str): The id of the student.
+
+        Returns:
+            course_ids (list): The course ids, in the order of registration.
         """
-        with open('courses.json', 'r') as f:
-            self.courses = json.load(f)
+        return list(self.student_courses.get(student_id, ()))
+
+    @instrumented()
+    def search_courses(self, department=None, weekday=None, starts_between=None, location=None, location_prefix=None, credits=None):
+        """Find the courses in the catalog matching all the conditions given, with the secondary indexes.
 
+        Args:
+            department (str): The department.
+            weekday (str): The weekday of a meeting, like 'Monday'.
+            starts_between (tuple): The (earliest, latest) start time of a meeting like ('8:00', '12:00'), the latest excluded.
+            location (str): The exact location.
+            location_prefix (str): The start of the location, like 'Building 3 '.
+            credits (int or list): The credits, or the list of the credits accepted.
+
+        Returns:
+            course_ids (list): The ids of the courses matched, sorted.
+        """
+        # Adding or removing a course takes all the locks, so holding one of them is enough to read the catalog.
+        with self._course_locks[0]:
+            return self.catalog.query(department, weekday, starts_between, location, location_prefix, credits)
+
+    def _index_registration(self, course_id, student_id):
+        """Add one registration into the reverse index and the schedule of the student.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+        """
+        self.student_courses.setdefault(student_id, {})[course_id] = None
+        self._touch_student(student_id)
+        self.enrolled[course_id] += 1
+        if student_id not in self.schedules:
+            self.schedules[student_id] = ScheduleIndex()
+        self.schedules[student_id].add(
+            course_id, self.course_meetings[course_id])
+
+    def _unindex_registration(self, course_id, student_id):
+        """Remove one registration from the reverse index and the schedule of the student.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+        """
+        course_ids = self.student_courses.get(student_id)
+        if course_ids is not None and course_id in course_ids:
+            del course_ids[course_id]
+            self._touch_student(student_id)
+            self.enrolled[course_id] -= 1
+            self.schedules[student_id].remove(
+                course_id, self.course_meetings[course_id])
+            if len(course_ids) == 0:
+                del self.student_courses[student_id]
+                del self.schedules[student_id]
+
+    def _unindex_course(self, course_id):
+        """Remove all the registrations and the waitlist of the course from the reverse indexes.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        for student_id in self.courses[course_id]['Registration'].keys():
+            self._unindex_registration(course_id, student_id)
+        for student_id in self.courses[course_id].get('Waitlist', ()):
+            self._unindex_waitlist(course_id, student_id)
+
+    def _unindex_waitlist(self, course_id, student_id):
+        """Remove the place of the student on the waitlist of the course from the reverse index.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+        """
+        course_ids = self.student_waitlists.get(student_id)
+        if course_ids is not None:
+            course_ids.pop(course_id, None)
+            if len(course_ids) == 0:
+                del self.student_waitlists[student_id]
+
+    @instrumented()
+    def find_clash(self, course_id, student_id):
+        """Find the course in the schedule of the student that clashes with the course given.
+
+        Args:
+            course_id (str): The id of the course.
+            student_id (str): The id of the student.
+
+        Returns:
+            clash (str): The id of the course clashed, None if there is no clash.
+        """
+        if student_id not in self.schedules:
+            return None
+        return self.schedules[student_id].clash(self.course_meetings[course_id], ignore=course_id)
+
+    def free_time(self, student_id, day_start='8:00', day_end='22:00'):
+        """Find when the student has no lesson, from Monday to Friday.
+
+        Args:
+            student_id (str): The id of the student.
+            day_start (str): The time the day starts.
+            day_end (str): The time the day ends.
+
+        Returns:
+            free_time (list): The (weekday, start, end) tuples like ('Monday', '8:00', '10:30').
+        """
+        with self._locked(student_ids=[student_id]):
+            times = [self.course_times[course_id]
+                     for course_id in self.get_student_course_ids(student_id)]
+        intervals = free_intervals(
+            times, parse_time(day_start), parse_time(day_end))
+        return [lesson for start, end in intervals for lesson in render_time((start, end))]
+
+    @instrumented()
+    def double_bookings(self):
+        """Find every pair of the courses booked into one location at the same time.
+
+        Returns:
+            double_bookings (list): The (location, course_id, course_id, weekday, start, end) tuples, with the times of the overlap.
+        """
+        # Adding or removing a course takes all the locks, so holding one of them is enough to read the rooms.
+        with self._course_locks[0]:
+            return self.rooms.double_bookings()
+
+    @instrumented()
+    def suggest_rooms(self, time, locations=None, limit=10):
+        """Suggest the locations free at the time of a new section, the least used first.
+
+        Args:
+            time (dict): The time of the section, in the format of Course.time.
+            locations (iterable): The locations to consider, all the locations of the courses by default.
+            limit (int): The maximum number of the locations suggested.
+
+        Returns:
+            locations (list): The free locations.
+        """
+        week_minutes = compile_time(time)
+        with self._course_locks[0]:
+            return self.rooms.free_rooms(week_minutes, locations)[:limit]
+
+    def room_utilization(self):
+        """Report how much of the week each location is booked, from Monday to Friday, 8:00 to 22:00.
+
+        Returns:
+            utilization (dict): {'Location': {'Courses': int, 'Minutes': int, 'Utilization': float}}.
+        """
+        with self._course_locks[0]:
+            return self.rooms.utilization()
+
+    @instrumented()
+    def find_all_clashes(self):
+        """Find every clash in the schedules of all the students, e.g. in the data saved before the check existed.
+
+        Returns:
+            clashes (list): The (student_id, course_id, course_id, weekday) tuples of the clashes.
+        """
+        clashes = []
+        with self._locked_all():
+            for student_id, course_ids in self.student_courses.items():
+                meetings = {course_id: self.course_meetings[course_id]
+                            for course_id in course_ids}
+                for first, second, weekday in find_clashes(meetings):
+                    clashes.append((student_id, first, second, weekday))
+        if instrumentation.ENABLED:
+            instrumentation.record_size(
+                'clash_students_scanned', len(self.student_courses))
+        return clashes
+
+    @instrumented()
     def get_registrant_information(self, student_id):
         """Get the registrant information with the student id given.
 
@@ -201,14 +1220,13 @@ class CourseManager(object):
             total_score = 0
             total_courses = 0
 
-            # Find all the courses that the student is in.
-            for course_id in self.courses.keys():
-                if student_id in self.courses[course_id]['Registration'].keys():
-                    # If the student is in the course, we display the information.
-                    print(
-                        "The student named {name} is in course {course_id}, with grade {grade}.".format(name=self.courses[course_id]['Registration'][student_id]['Name'], course_id=course_id, grade=self.courses[course_id]['Registration'][student_id]['Grade']))
-                    total_score += self.courses[course_id]['Registration'][student_id]['Grade']
-                    total_courses += 1
+            # Find all the courses that the student is in with the reverse index.
+            for course_id in self.get_student_course_ids(student_id):
+                # The student is in the course, we display the information.
+                print(
+                    "The student named {name} is in course {course_id}, with grade {grade}.".format(name=self.courses[course_id]['Registration'][student_id]['Name'], course_id=course_id, grade=self.courses[course_id]['Registration'][student_id]['Grade']))
+                total_score += self.courses[course_id]['Registration'][student_id]['Grade']
+                total_courses += 1
 
             # Check whether the student is in any course.
             if total_courses == 0:
@@ -240,12 +1258,16 @@ class Person(object):
         self.birthday = birthday
 
 
-class Student(Person):
+class Student(Person, Tracked):
     """The Student class(Inherited from the Person class).
 
     Args:
         Person (class): The inherited class.
     """
+    TRACKED = ('student_id', 'last_name', 'first_name',
+               'gender', 'birthday', 'department', 'preferences')
+    # The students changed since they were loaded or exported.
+    dirty = set()
 
     def __init__(self, student_id, last_name, first_name, gender, birthday, department):
         """The initialization for the object.
@@ -262,12 +1284,16 @@ class Student(Person):
         self.student_id = student_id
         self.department = department
         self.selected_courses = {}
+        # The ranked course ids the student wants, used by the allocation when the registration opens.
+        # A new list is assigned to change them, so the student is exported again.
+        self.preferences = []
 
-    def export_object(self):
-        """ Export the data into the json file with the dictionary format.
-        """
+    def to_dict(self):
+        """Convert the object's information into the dict format.
 
-        # Convert the object's information into the dict format.
+        Returns:
+            objectInformation (dict): The information of the student.
+        """
         objectInformation = {
             'student_id': self.student_id,
             'last_name': self.last_name,
@@ -276,21 +1302,28 @@ class Student(Person):
             'birthday': self.birthday.strftime("%Y-%m-%d"),
             'department': self.department,
         }
+        # The preferences are only written when there are any, so the files of the other students are unchanged.
+        if len(self.preferences) > 0:
+            objectInformation['preferences'] = list(self.preferences)
+        return objectInformation
 
-        if os.path.exists('./Students/'):
-            # The directory exists.
-            pass
-        else:
-            # The directory doesn't exist.
-            os.mkdir('./Students/')
+    def registration_information(self):
+        """Get the information of the student that is kept in the registration of a course.
+
+        Returns:
+            student_information (dict): The information for CourseManager.add_students.
+        """
+        return {'Student_id': self.student_id, 'Name': ("{} {}".format(self.first_name, self.last_name)),
+                'Department': self.department, 'Gender': self.gender}
 
-        # Check whether the file is existed.
-        if os.path.exists('./Students/{student_id}.json'.format(student_id=self.student_id)):
-            os.remove(
-                './Students/{student_id}.json'.format(student_id=self.student_id))
-        with open('./Students/{student_id}.json'.format(student_id=self.student_id), 'w') as f:
-            json.dump(objectInformation, f)
+    def export_object(self):
+        """ Export the data into the json file with the dictionary format.
+        """
 
+        write_entity_file('./Students/', self.student_id, self.to_dict())
+        self.mark_clean()
+
+    @instrumented()
     def get_selected_courses(self, CourseManager):
         """Get the selected courses for the student.
 
@@ -318,12 +1351,14 @@ class Student(Person):
                     department=self.selected_courses[course_id]['Information']['Department']))
                 print("The location is {location}.".format(
                     location=self.selected_courses[course_id]['Information']['Location']))
-                for values in self.selected_courses[course_id]['Information']['Time'].values():
+                # The time is rendered from the compiled time of the course.
+                for weekday, start, end in render_time(CourseManager.course_times[course_id]):
                     print("The time is from {start} to {end} on {weekday}".format(
-                        start=values['StartTime'], end=values['EndTime'], weekday=values['Weekday']))
+                        start=start, end=end, weekday=weekday))
                 print(
                     "##########################################################################")
 
+    @instrumented()
     def get_gpa(self, CourseManager):
         """Get the GPA score of the student.
 
@@ -340,17 +1375,17 @@ class Student(Person):
         else:
             # There do exists something in the selected courses list.
 
-            # Record important information.
-            total_score = 0
-            total_credits = 0
-            for course_id in self.selected_courses:
-                total_score += self.selected_courses[course_id]['Grade'] * \
-                    self.selected_courses[course_id]['Information']['Credits']
-                total_credits += self.selected_courses[course_id]['Information']['Credits']
-            gpa_score = total_score / total_credits
-            print("The GPA score is {gpa_score} with total credits {credits}.".format(
-                gpa_score=gpa_score, credits=total_credits))
+            # The GPA is kept in the view of the student, with the selected courses just synced.
+            gpa_score, total_credits = CourseManager.compute_gpa(
+                self.student_id)
+            if gpa_score is None:
+                print("No course of the student is graded yet, with total credits {credits}.".format(
+                    credits=total_credits))
+            else:
+                print("The GPA score is {gpa_score} with total credits {credits}.".format(
+                    gpa_score=gpa_score, credits=total_credits))
 
+    @instrumented()
     def get_grade_credits_for_courses(self, CourseManager):
         """Get the grade and credits for the courses.
 
@@ -371,6 +1406,7 @@ class Student(Person):
                 print("The course with name {course_name} and {credit} credit(s) has grade {grade}.".format(
                     course_name=self.selected_courses[course_id]['Information']['Name'], credit=self.selected_courses[course_id]['Information']['Credits'], grade=self.selected_courses[course_id]['Grade']))
 
+    @instrumented()
     def save_selected_courses(self, CourseManager):
         """Save the selected courses.
 
@@ -382,18 +1418,14 @@ class Student(Person):
         # First, we check whether the selected courses is empty.
         if len(self.selected_courses) <= 0:
             # That means, no course is selected.
-            print("No course is selected.")
+            emit('no_course_selected', "No course is selected.",
+                 student_id=self.student_id)
         else:
-            # There do exists something in the selected courses.
-            if os.path.exists('./Selected_Courses/'):
-                # The directory exists.
-                pass
-            else:
-                os.mkdir('./Selected_Courses/')
-            with open("./Selected_Courses/selected_courses_{student_id}.json".format(student_id=self.student_id), "w") as f:
-                # Write the selected courses into the file.
-                json.dump(self.selected_courses, f)
+            # There do exists something in the selected courses, we write them into the storage.
+            CourseManager.storage.export_selected_courses(
+                self.student_id, self.selected_courses)
 
+    @instrumented()
     def print_schedule(self, CourseManager):
         """Print the schedule.
 
@@ -419,14 +1451,15 @@ class Student(Person):
                 print("Course name: {course_name}".format(
                     course_name=self.selected_courses[course_id]['Information']['Name']))
                 print("Course Time:")
-                for values in self.selected_courses[course_id]['Information']['Time'].values():
+                for weekday, start, end in render_time(CourseManager.course_times[course_id]):
                     print("{weekday} from {start} to {end}".format(
-                        weekday=values['Weekday'], start=values['StartTime'], end=values['EndTime']))
+                        weekday=weekday, start=start, end=end))
                 print("Course Location: {course_location}".format(
                     course_location=self.selected_courses[course_id]['Information']['Location']))
                 print(
                     "##########################################################################")
 
+    @instrumented()
     def modify_course(self, CourseManager, mode):
         """Modify the selected courses.
 
@@ -443,19 +1476,20 @@ class Student(Person):
             course_id = input("Please input the course id to add:")
             if course_id in CourseManager.courses.keys():
                 # That means, the course exists.
-                student_information = {'Student_id': self.student_id, 'Name': ("{} {}".format(self.first_name, self.last_name)),
-                                       'Department': self.department, 'Gender': self.gender}
-                CourseManager.add_students(course_id, student_information)
+                CourseManager.add_students(
+                    course_id, self.registration_information())
             else:
-                print("The course is not available!")
+                emit('course_not_available', "The course is not available!",
+                      level='warning', course_id=course_id, student_id=self.student_id)
         else:
             # Delete a course.
             course_id = input("Please input the course id to delete:")
-            if course_id in self.selected_courses.keys():
+            if course_id in self.selected_courses.keys() or (course_id in CourseManager.courses.keys() and CourseManager.is_waitlisted(course_id, self.student_id)):
                 # That means, the course exists.
                 CourseManager.remove_student(course_id, self.student_id)
             else:
-                print("The course is not available!")
+                emit('course_not_available', "The course is not available!",
+                      level='warning', course_id=course_id, student_id=self.student_id)
 
         # Sync the selected courses.
         CourseManager.sync_selected_courses(self)
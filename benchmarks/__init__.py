@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""The benchmarks of the course registration system, run from the repository root like:
+
+    python -m benchmarks.bench_bulk_load
+"""
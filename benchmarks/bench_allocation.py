@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import random
+import argparse
+import itertools
+
+from assistant_func import course_from_data, student_from_data
+from basic_class import CourseManager
+from allocation import allocate
+from benchmarks.synthetic import course_data, student_data
+from benchmarks.workspace import quiet, temporary_directory
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the allocation of the whole population finishes within the budget.")
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--preferences', type=int, default=10)
+    parser.add_argument('--capacity', type=int, default=40)
+    parser.add_argument('--max-courses', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=10.0,
+                        help="The seconds the allocation may take.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    courses = [course_from_data(course_data(i, rng))
+               for i in range(args.courses)]
+    students = {}
+    for i in range(args.students):
+        student = student_from_data(student_data(i, rng))
+        students[student.student_id] = student
+
+    # Some courses are far more popular than the others.
+    course_ids = [course.course_id for course in courses]
+    weights = list(itertools.accumulate(
+        1.0 / (rank + 1) ** 0.8 for rank in range(len(course_ids))))
+    preferences = {}
+    for student_id in students:
+        ranked = list(dict.fromkeys(rng.choices(
+            course_ids, cum_weights=weights, k=args.preferences * 2)))
+        preferences[student_id] = ranked[:args.preferences]
+
+    with temporary_directory():
+        with quiet():
+            manager = CourseManager()
+            with manager.batch():
+                for course in courses:
+                    course.capacity = args.capacity
+                    manager.add_courses(course)
+
+        start = time.perf_counter()
+        allocations = allocate(manager, preferences, students,
+                               max_courses=args.max_courses, seed=0)
+        seconds = time.perf_counter() - start
+        manager.close()
+
+    allocated = sum(len(course_ids) for course_ids in allocations.values())
+    print("Allocated {allocated} seat(s) to {students} student(s) with {preferences} preference(s) each in {seconds:.3f}s.".format(
+        allocated=allocated, students=len(allocations), preferences=args.preferences, seconds=seconds))
+    if seconds > args.budget:
+        print("The allocation is over the budget of {budget}s.".format(
+            budget=args.budget))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import argparse
+
+from analytics import GradeTable
+from basic_class import CourseManager
+from benchmarks.synthetic import term_courses
+from benchmarks.workspace import quiet, temporary_directory
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the vectorized term report with the GPA computed one student at a time.")
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--per-student', type=int, default=5)
+    parser.add_argument('--graded', type=float, default=0.8)
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help="The seconds the vectorized report may take.")
+    args = parser.parse_args()
+
+    courses = term_courses(
+        args.courses, args.students, args.per_student, args.graded)
+
+    start = time.perf_counter()
+    table = GradeTable(courses)
+    gpa = table.gpa()
+    statistics = table.course_statistics()
+    departments = table.department_averages()
+    seconds = time.perf_counter() - start
+
+    with temporary_directory():
+        with quiet():
+            manager = CourseManager()
+        manager.courses = courses
+        manager._build_indexes()
+        start = time.perf_counter()
+        for student_id in gpa:
+            manager.compute_gpa(student_id)
+        loop_seconds = time.perf_counter() - start
+        manager.close()
+
+    print("Reported {registrations} registration(s) of {students} student(s) in {courses} course(s) and {departments} department(s).".format(
+        registrations=len(table), students=len(gpa), courses=len(statistics), departments=len(departments)))
+    print("Vectorized: {seconds:.3f}s, compute_gpa per student: {loop_seconds:.3f}s.".format(
+        seconds=seconds, loop_seconds=loop_seconds))
+    if seconds > args.budget:
+        print("The report is over the budget of {budget}s.".format(
+            budget=args.budget))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import argparse
+import tempfile
+
+from assistant_func import bulk_load_courses, bulk_load_students
+from benchmarks.synthetic import write_tree
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how the bulk loader scales with the number of workers.")
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    parser.add_argument('--chunk-size', type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        print("Generating {courses} course(s) and {students} student(s)...".format(
+            courses=args.courses, students=args.students))
+        write_tree(root, args.courses, args.students)
+        files = args.courses + args.students
+
+        print("{executor:>8} {workers:>8} {seconds:>10} {rate:>12}".format(
+            executor='executor', workers='workers', seconds='seconds', rate='files/s'))
+        for executor in ['thread', 'process']:
+            for workers in args.workers:
+                start = time.perf_counter()
+                courses, course_errors = bulk_load_courses(os.path.join(
+                    root, 'Courses'), workers, args.chunk_size, executor)
+                students, student_errors = bulk_load_students(os.path.join(
+                    root, 'Students'), workers, args.chunk_size, executor)
+                seconds = time.perf_counter() - start
+                assert len(courses) == args.courses and len(students) == args.students
+                assert not course_errors and not student_errors
+                print("{executor:>8} {workers:>8} {seconds:>10.3f} {rate:>12.0f}".format(
+                    executor=executor, workers=workers, seconds=seconds, rate=files / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import random
+import argparse
+
+from catalog import CatalogIndex
+from timetable import course_meetings, parse_time
+from benchmarks.synthetic import DEPARTMENTS, WEEKDAYS, course_data, realistic_time
+
+
+def scan(courses, department, weekday, earliest, latest, location_prefix):
+    """Find the courses by reading every course, like the search before the indexes.
+    """
+    return sorted(course_id for course_id, information in courses.items()
+                  if information['Department'] == department and information['Location'].startswith(location_prefix)
+                  and any(lesson['Weekday'] == weekday and earliest <= parse_time(lesson['StartTime']) < latest
+                          for lesson in information['Time'].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the catalog search with the secondary indexes against a scan of every course.")
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--speedup', type=float, default=10.0,
+                        help="How many times faster than the scan the median search must be.")
+    parser.add_argument('--budget', type=float, default=1000.0,
+                        help="The microseconds the median search may take, at the default 100k courses.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    courses = {}
+    for index in range(args.courses):
+        data = course_data(index, rng)
+        courses[data['course_id']] = {'Department': data['department'], 'Credits': data['credits'],
+                                      'Time': realistic_time(rng), 'Location': data['location']}
+
+    start = time.perf_counter()
+    catalog = CatalogIndex()
+    for course_id, information in courses.items():
+        catalog.add(course_id, information,
+                    course_meetings(information['Time']))
+    build_seconds = time.perf_counter() - start
+
+    # The searches like 'the Math courses on Monday morning in the building 3'.
+    queries = [(rng.choice(DEPARTMENTS), rng.choice(WEEKDAYS), rng.choice(['8:00', '9:30', '13:00']), rng.choice(['12:00', '15:30', '18:00']),
+                'Building {building} '.format(building=rng.randint(1, 20))) for _ in range(args.queries)]
+    results = []
+    timings = []
+    for department, weekday, earliest, latest, prefix in queries:
+        start = time.perf_counter()
+        results.append(catalog.query(department=department, weekday=weekday,
+                                     starts_between=(earliest, latest), location_prefix=prefix))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median = timings[len(timings) // 2]
+
+    # The results must be the same as the scan.
+    for query, result in list(zip(queries, results))[:20]:
+        department, weekday, earliest, latest, prefix = query
+        if result != scan(courses, department, weekday, parse_time(earliest), parse_time(latest), prefix):
+            raise SystemExit("The search of {query} differs from the scan.".format(query=query))
+    start = time.perf_counter()
+    department, weekday, earliest, latest, prefix = queries[0]
+    scan(courses, department, weekday, parse_time(
+        earliest), parse_time(latest), prefix)
+    scan_seconds = time.perf_counter() - start
+
+    print("Indexed {courses} course(s) in {seconds:.3f}s.".format(
+        courses=len(catalog), seconds=build_seconds))
+    print("Search: median {median:.0f}us, p99 {p99:.0f}us, {matched:.1f} course(s) matched on average; scan: {scan:.1f}ms.".format(
+        median=median * 1e6, p99=timings[int(len(timings) * 0.99)] * 1e6,
+        matched=sum(len(result) for result in results) / args.queries, scan=scan_seconds * 1e3))
+    if median * 1e6 > args.budget:
+        print("The median search is over the budget of {budget:.0f}us.".format(
+            budget=args.budget))
+        sys.exit(1)
+    # The times depend on the machine, so the search is also compared with the scan on the same machine.
+    if median * args.speedup > scan_seconds:
+        print("The search is less than {speedup} times faster than the scan.".format(
+            speedup=args.speedup))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gc
+import json
+import argparse
+import tracemalloc
+
+from records import compact_courses, record_default
+from benchmarks.synthetic import term_courses
+
+
+def traced(build):
+    """Measure the memory still held by the result of the function.
+
+    Args:
+        build (function): The function that builds the data.
+
+    Returns:
+        data (object): The data built.
+        size (int): The bytes allocated for the data.
+    """
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the memory of the registrations kept as dicts and as compact records.")
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--per-student', type=int, default=5)
+    args = parser.parse_args()
+
+    # Both layouts are loaded from the same courses.json text, like the course manager does.
+    text = json.dumps(term_courses(
+        args.courses, args.students, args.per_student, graded=0.5))
+    enrollments = args.students * args.per_student
+
+    dicts, dict_size = traced(lambda: json.loads(text))
+
+    def compact():
+        courses = json.loads(text)
+        compact_courses(courses, {})
+        return courses
+    records, compact_size = traced(compact)
+
+    # The compact layout must save the same courses.json.
+    if json.dumps(records, default=record_default) != json.dumps(dicts):
+        raise SystemExit("The compact records don't round-trip to the same json.")
+
+    print("{enrollments} enrollment(s) of {students} student(s) in {courses} course(s).".format(
+        enrollments=enrollments, students=args.students, courses=args.courses))
+    for name, size in [('dicts', dict_size), ('compact records', compact_size)]:
+        print("{name:>16}: {megabytes:8.1f} MB, {per:6.0f} bytes per enrollment".format(
+            name=name, megabytes=size / 1e6, per=size / enrollments))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import copy
+import time
+import random
+import argparse
+import threading
+
+from analytics import GradeTable
+from basic_class import CourseManager
+from benchmarks.synthetic import term_courses
+from benchmarks.workspace import quiet, temporary_directory
+
+import instrumentation
+
+
+def register_while(manager, course_ids, report, seed):
+    """Register the students in a thread while the report runs in this one.
+
+    Args:
+        manager (CourseManager): The course manager.
+        course_ids (list): The ids of the courses.
+        report (function): The report.
+        seed (int): The random seed.
+
+    Returns:
+        seconds (float): The seconds the report took.
+        registrations (int): The number of registrations done meanwhile.
+    """
+    rng = random.Random(seed)
+    done = threading.Event()
+    count = [0]
+
+    def register():
+        while not done.is_set():
+            index = rng.randrange(10 ** 6)
+            manager.register(rng.choice(course_ids), {'Student_id': 'S-{index:07d}'.format(index=index), 'Name': 'Student',
+                                                      'Department': 'Math', 'Gender': 'Female'})
+            count[0] += 1
+
+    thread = threading.Thread(target=register)
+    thread.start()
+    # The writer is running before the report starts.
+    time.sleep(0.05)
+    start = time.perf_counter()
+    before = count[0]
+    report()
+    seconds = time.perf_counter() - start
+    registrations = count[0] - before
+    done.set()
+    thread.join()
+    return seconds, registrations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the snapshot of the courses against a deep copy, and the registration during a report.")
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--per-student', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--speedup', type=float, default=100.0,
+                        help="How many times faster than a deep copy taking a snapshot must be.")
+    args = parser.parse_args()
+
+    instrumentation.set_level('error')
+    courses = term_courses(
+        args.courses, args.students, args.per_student, 0.5, seed=args.seed)
+    with temporary_directory():
+        with quiet():
+            manager = CourseManager()
+        manager.courses = courses
+        manager._build_indexes()
+        course_ids = list(courses.keys())
+
+        start = time.perf_counter()
+        copy.deepcopy(manager.courses)
+        copy_seconds = time.perf_counter() - start
+        timings = []
+        for _ in range(100):
+            start = time.perf_counter()
+            snapshot = manager.snapshot()
+            timings.append(time.perf_counter() - start)
+            snapshot.release()
+        timings.sort()
+        snapshot_seconds = timings[len(timings) // 2]
+
+        # The report over the whole registry, with the registration stopped for the whole report, then on a snapshot.
+        def locked_report():
+            with manager._locked_all():
+                GradeTable(manager.courses).gpa()
+
+        def snapshot_report():
+            with manager.snapshot() as snapshot:
+                GradeTable(snapshot).gpa()
+
+        locked_seconds, locked_registrations = register_while(
+            manager, course_ids, locked_report, args.seed)
+        snapshot_seconds_report, snapshot_registrations = register_while(
+            manager, course_ids, snapshot_report, args.seed + 1)
+        manager.close()
+
+    print("Deep copy of {courses} course(s): {copy:.3f}s, snapshot: median {snapshot:.0f}us.".format(
+        courses=len(courses), copy=copy_seconds, snapshot=snapshot_seconds * 1e6))
+    print("Report with the registration stopped: {seconds:.3f}s, {registrations} registration(s) meanwhile.".format(
+        seconds=locked_seconds, registrations=locked_registrations))
+    print("Report on a snapshot: {seconds:.3f}s, {registrations} registration(s) meanwhile.".format(
+        seconds=snapshot_seconds_report, registrations=snapshot_registrations))
+    # The times depend on the machine, so the snapshot is compared with the deep copy on the same machine.
+    if snapshot_seconds * args.speedup > copy_seconds:
+        print("Taking a snapshot is less than {speedup} times faster than a deep copy.".format(
+            speedup=args.speedup))
+        sys.exit(1)
+    if snapshot_registrations == 0:
+        print("The registration was blocked during the report on a snapshot.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from assistant_func import lazy_students, course_from_data
+from basic_class import CourseManager
+from service import RegistrationService
+from benchmarks.synthetic import write_tree, course_data
+from benchmarks.workspace import quiet, temporary_directory
+
+
+async def request(reader, writer, method, path, payload=None):
+    """Send one request on the kept-alive connection and read the response.
+    """
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write('{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n'.format(
+        method=method, path=path, length=len(body)).encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, student_ids, course_ids, requests, write_ratio, latencies, seed):
+    """One client that sends its requests one after another and records the latency of each.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    for _ in range(requests):
+        student_id = rng.choice(student_ids)
+        if rng.random() < write_ratio:
+            action = rng.choice(['register', 'drop'])
+            method, path, payload = 'POST', '/' + action, {
+                'student_id': student_id, 'course_id': rng.choice(course_ids)}
+        else:
+            view = rng.choice(['schedule', 'grades', 'gpa'])
+            method, path, payload = 'GET', '/students/{student_id}/{view}'.format(
+                student_id=student_id, view=view), None
+        start = time.perf_counter()
+        await request(reader, writer, method, path, payload)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(args):
+    server = None
+    if args.port == 0:
+        # Serve a synthetic registry in the current process.
+        with quiet():
+            write_tree('.', args.courses, args.students)
+            manager = CourseManager()
+            rng = random.Random(0)
+            with manager.batch():
+                for i in range(args.courses):
+                    manager.add_courses(course_from_data(course_data(i, rng)))
+        service = RegistrationService(manager, lazy_students(manager.storage))
+        server = await asyncio.start_server(service.handle_connection, args.host, 0)
+        port = server.sockets[0].getsockname()[1]
+        student_ids = list(service.students.keys())
+        course_ids = list(manager.courses.keys())
+    else:
+        port = args.port
+        student_ids = args.student_ids
+        course_ids = args.course_ids
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args.host, port, student_ids, course_ids, args.requests, args.write_ratio, latencies, seed)
+                           for seed in range(args.clients)])
+    seconds = time.perf_counter() - start
+
+    print("{count} request(s) from {clients} client(s) in {seconds:.3f}s, {rate:.0f} request(s)/s".format(
+        count=len(latencies), clients=args.clients, seconds=seconds, rate=len(latencies) / seconds))
+    print("p50 {p50:.2f}ms, p99 {p99:.2f}ms".format(
+        p50=percentile(latencies, 0.5) * 1000, p99=percentile(latencies, 0.99) * 1000))
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+        manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate load on the registration service and report the latency.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0,
+                        help="The port of a running service, 0 to serve a synthetic registry in this process.")
+    parser.add_argument('--student-ids', nargs='*', default=[],
+                        help="The students to use with a running service.")
+    parser.add_argument('--course-ids', nargs='*', default=[],
+                        help="The courses to use with a running service.")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200,
+                        help="The number of requests of each client.")
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--courses', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.port == 0:
+        with temporary_directory():
+            asyncio.run(run(args))
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
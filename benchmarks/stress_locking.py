@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import random
+import argparse
+import threading
+import contextlib
+
+from assistant_func import course_from_data, student_from_data
+from basic_class import CourseManager
+from benchmarks.synthetic import course_data, student_data
+from benchmarks.workspace import quiet, temporary_directory
+
+
+def check_invariants(manager):
+    """Check that the courses dict and the indexes agree with each other.
+
+    Args:
+        manager (CourseManager): The course manager, with no writer running.
+
+    Returns:
+        errors (list): The messages of the invariants broken.
+    """
+    errors = []
+    expected = {}
+    waitlisted = {}
+    for course_id, course in manager.courses.items():
+        registrants = len(course['Registration'])
+        if manager.enrolled[course_id] != registrants:
+            errors.append("The count of {course_id} is {count}, but {registrants} registered.".format(
+                course_id=course_id, count=manager.enrolled[course_id], registrants=registrants))
+        capacity = course['Information'].get('Capacity')
+        if capacity is not None and registrants > capacity:
+            errors.append("The course {course_id} is over its capacity.".format(
+                course_id=course_id))
+        for student_id in course.get('Waitlist', ()):
+            if student_id in course['Registration']:
+                errors.append("The student {student_id} is both registered and waitlisted in {course_id}.".format(
+                    student_id=student_id, course_id=course_id))
+            # A seat is only left free while the students waiting all clash with the course.
+            elif manager.available_seats(course_id) > 0 and manager.find_clash(course_id, student_id) is None:
+                errors.append("The student {student_id} waits for {course_id}, which has a seat free.".format(
+                    student_id=student_id, course_id=course_id))
+            waitlisted.setdefault(student_id, set()).add(course_id)
+        for student_id in course['Registration']:
+            expected.setdefault(student_id, set()).add(course_id)
+    actual = {student_id: set(course_ids)
+              for student_id, course_ids in manager.student_courses.items()}
+    if actual != expected:
+        errors.append("The reverse index disagrees with the registrations.")
+    if {student_id: set(course_ids) for student_id, course_ids in manager.student_waitlists.items()} != waitlisted:
+        errors.append("The reverse index disagrees with the waitlists.")
+    for student_id, schedule in manager.schedules.items():
+        meetings = sum(len(manager.course_meetings[course_id])
+                       for course_id in manager.student_courses[student_id])
+        if len(schedule) != meetings:
+            errors.append("The schedule of {student_id} disagrees with the registrations.".format(
+                student_id=student_id))
+    for student_id, first, second, weekday in manager.find_all_clashes():
+        errors.append("The student {student_id} has {first} and {second} at the same time on {weekday}.".format(
+            student_id=student_id, first=first, second=second, weekday=weekday))
+    return errors
+
+
+def registry_state(manager):
+    """Get the registrations, the grades, the waitlists and the capacities, to compare the memory with the storage.
+
+    Args:
+        manager (CourseManager): The course manager, with no writer running.
+    """
+    return {course_id: ({student_id: record['Grade'] for student_id, record in course['Registration'].items()},
+                        list(course.get('Waitlist', ())), course['Information'].get('Capacity'))
+            for course_id, course in manager.courses.items()}
+
+
+def check_recovery(manager):
+    """Reopen the storage of the manager, and check that the replayed journal gives the state in memory.
+
+    Args:
+        manager (CourseManager): The course manager, with no writer running. It is closed.
+
+    Returns:
+        errors (list): The messages of the courses that differ after the restart.
+    """
+    expected = registry_state(manager)
+    manager.close()
+    with quiet():
+        reopened = CourseManager()
+    actual = registry_state(reopened)
+    reopened.close()
+    return ["The course {course_id} differs after the restart.".format(course_id=course_id)
+            for course_id in sorted(set(expected) | set(actual)) if expected.get(course_id) != actual.get(course_id)]
+
+
+def run(manager, students, course_ids, threads, operations, seed):
+    """Run the writers and the readers against the manager.
+
+    Args:
+        manager (CourseManager): The course manager.
+        students (list): The Student objects.
+        course_ids (list): The ids of the courses.
+        threads (int): The number of writer threads, there is one reader thread for each of them too.
+        operations (int): The number of operations of each writer.
+        seed (int): The random seed.
+
+    Returns:
+        seconds (float): The time the writers took.
+        errors (list): The inconsistencies the readers saw.
+    """
+    errors = []
+    done = threading.Event()
+
+    def write(index):
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(operations):
+            # Some of the operations run inside a batch, whose entries must keep their order with the others.
+            with manager.batch() if rng.random() < 0.05 else contextlib.nullcontext():
+                operate(rng)
+
+    def operate(rng):
+        student = rng.choice(students)
+        course_id = rng.choice(course_ids)
+        action = rng.random()
+        if action < 0.5:
+            manager.register(course_id, student.registration_information())
+        elif action < 0.6:
+            manager.register_all(rng.sample(course_ids, 2),
+                                 student.registration_information())
+        elif action < 0.9:
+            manager.drop(course_id, student.student_id)
+        else:
+            manager.set_grade(course_id, student.student_id,
+                              rng.randint(0, 100))
+
+    def read(index):
+        rng = random.Random(seed * 1000 + threads + index)
+        while not done.is_set():
+            student = rng.choice(students)
+            selected_courses = manager.build_selected_courses(
+                student.student_id)
+            meetings = [meeting for course in selected_courses.values()
+                        for meeting in course['Information']['Time'].values()]
+            # A reader must never see two courses of the student at the same time.
+            for i, first in enumerate(meetings):
+                for second in meetings[i + 1:]:
+                    if first['Weekday'] == second['Weekday'] and first['StartTime'] == second['StartTime']:
+                        errors.append("A reader saw a clash in the schedule of {student_id}.".format(
+                            student_id=student.student_id))
+
+    writers = [threading.Thread(target=write, args=(index,))
+               for index in range(threads)]
+    readers = [threading.Thread(target=read, args=(index,))
+               for index in range(threads)]
+    for reader in readers:
+        reader.start()
+    start = time.perf_counter()
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    seconds = time.perf_counter() - start
+    done.set()
+    for reader in readers:
+        reader.join()
+    return seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hammer the CourseManager with concurrent writers and readers, then check its invariants.")
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=10)
+    parser.add_argument('--operations', type=int, default=5000,
+                        help="The number of operations of each writer.")
+    parser.add_argument('--threads', default='1,2,4,8',
+                        help="The numbers of writer threads to run, separated by commas.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    courses = [course_from_data(course_data(i, rng))
+               for i in range(args.courses)]
+    students = [student_from_data(student_data(i, rng))
+                for i in range(args.students)]
+    course_ids = [course.course_id for course in courses]
+
+    failed = False
+    for threads in [int(count) for count in args.threads.split(',')]:
+        with temporary_directory():
+            with quiet():
+                manager = CourseManager()
+                with manager.batch():
+                    for course in courses:
+                        course.capacity = args.capacity
+                        manager.add_courses(course)
+            seconds, errors = run(manager, students, course_ids,
+                                  threads, args.operations, seed=threads)
+            errors += check_invariants(manager)
+            errors += check_recovery(manager)
+
+        print("{threads} writer(s): {operations} operations in {seconds:.3f}s, {rate:.0f} operations/s, {errors} error(s).".format(
+            threads=threads, operations=threads * args.operations, seconds=seconds,
+            rate=threads * args.operations / seconds, errors=len(errors)))
+        for error in errors[:10]:
+            print("  " + error)
+        failed = failed or len(errors) > 0
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
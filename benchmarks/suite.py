@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import importlib
+import contextlib
+
+from benchmarks.synthetic import write_registry
+from benchmarks.workspace import quiet, temporary_directory
+
+
+class Timer(object):
+    """Time the operations of the benchmarks, with the status messages of the system silenced.
+    """
+
+    def __init__(self, enrollments):
+        """The initialization for the object.
+
+        Args:
+            enrollments (int): The scale of the registry measured.
+        """
+        self.enrollments = enrollments
+        self.results = []
+
+    @contextlib.contextmanager
+    def measure(self, benchmark, operations):
+        """Time the with block as one benchmark.
+
+        Args:
+            benchmark (str): The name of the benchmark.
+            operations (int): The number of operations in the block.
+        """
+        with quiet():
+            start = time.perf_counter()
+            yield
+            seconds = time.perf_counter() - start
+        self.results.append({'Benchmark': benchmark, 'Enrollments': self.enrollments, 'Operations': operations,
+                             'Seconds': seconds, 'PerSecond': operations / seconds if seconds > 0 else None})
+        print("{enrollments:>9} {benchmark:<20} {operations:>9} {seconds:>10.4f}".format(
+            enrollments=self.enrollments, benchmark=benchmark, operations=operations, seconds=seconds), file=sys.stderr)
+
+
+def run_scale(root, enrollments, registrations, seed):
+    """Run all the benchmarks on a registry of the scale given, in the current directory.
+
+    Args:
+        root (str): The directory of the registry, the current one.
+        enrollments (int): The number of enrollments of the registry.
+        registrations (int): The number of registrations measured.
+        seed (int): The random seed.
+
+    Returns:
+        results (list): The result of each benchmark.
+    """
+    write_registry(root, enrollments, seed=seed)
+    timer = Timer(enrollments)
+
+    # The startup is the import of main.py, which opens the course manager, and main.initialize.
+    with timer.measure('startup', 1):
+        if 'main' in sys.modules:
+            main = importlib.reload(sys.modules['main'])
+        else:
+            main = importlib.import_module('main')
+        main.initialize()
+    manager = main.manager
+
+    rng = random.Random(seed)
+    course_ids = list(manager.courses.keys())
+    student_ids = rng.sample(list(main.students_dict.keys()), min(
+        registrations, len(main.students_dict)))
+    # The students are loaded before, so only the registration is measured.
+    students = [main.students_dict[student_id] for student_id in student_ids]
+    with timer.measure('add_students', len(students)):
+        for student in students:
+            manager.add_students(rng.choice(course_ids),
+                                 student.registration_information())
+
+    registrants = list(manager.student_courses.keys())
+    with timer.measure('schedule_sync_cold', len(students)):
+        for student in students:
+            manager.sync_selected_courses(student)
+    with timer.measure('schedule_sync_warm', len(students)):
+        for student in students:
+            manager.sync_selected_courses(student)
+
+    manager.views.clear()
+    with timer.measure('compute_gpa', len(registrants)):
+        for student_id in registrants:
+            manager.compute_gpa(student_id)
+
+    with timer.measure('save_courses', 1):
+        manager.save_courses_file()
+    with timer.measure('load_courses', 1):
+        manager.load_courses_file()
+
+    manager.close()
+    return timer.results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the benchmarks of the registration system on synthetic registries, and write the results as json.")
+    parser.add_argument('--enrollments', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="The scales of the registries, from 1k to 1M enrollments.")
+    parser.add_argument('--registrations', type=int, default=1000,
+                        help="The number of registrations and schedule syncs measured.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="The json file of the results, the standard output by default.")
+    args = parser.parse_args()
+
+    # main.py is imported from the repository, while the registry is in a temporary directory.
+    sys.path.insert(0, os.getcwd())
+    results = []
+    print("{enrollments:>9} {benchmark:<20} {operations:>9} {seconds:>10}".format(
+        enrollments='scale', benchmark='benchmark', operations='ops', seconds='seconds'), file=sys.stderr)
+    for enrollments in args.enrollments:
+        with temporary_directory() as root:
+            results += run_scale(root, enrollments,
+                                 args.registrations, args.seed)
+
+    report = {'Python': platform.python_version(), 'Platform': platform.platform(),
+              'Time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'Results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import random
+import argparse
+import itertools
+
+from journal import write_snapshot
+from timetable import ScheduleIndex, course_meetings
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+DEPARTMENTS = ['Math', 'Information Science',
+               'Physics', 'Chemistry', 'Economics', 'History']
+# The lessons of 100 minutes, with a break of 20 minutes.
+START_TIMES = ['8:00', '10:00', '12:00', '14:00', '16:00', '18:00']
+END_TIMES = ['9:40', '11:40', '13:40', '15:40', '17:40', '19:40']
+
+# The meeting patterns of a real timetable: (weight, weekdays, start times, minutes).
+MEETING_PATTERNS = [
+    (0.35, ['Monday', 'Wednesday', 'Friday'], [
+     '8:00', '9:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00', '16:00'], 50),
+    (0.30, ['Tuesday', 'Thursday'], ['8:00', '9:30',
+     '11:00', '12:30', '14:00', '15:30', '17:00'], 75),
+    (0.15, ['Monday', 'Wednesday'], ['8:00', '9:30',
+     '11:00', '12:30', '14:00', '15:30', '17:00'], 75),
+    # The labs, once a week in the afternoon.
+    (0.12, WEEKDAYS, ['13:00', '14:00'], 170),
+    # The evening courses, once a week.
+    (0.08, WEEKDAYS, ['18:30'], 150),
+]
+
+
+def course_data(index, rng):
+    """Generate the data of one course, in the format of Course.to_dict.
+
+    Args:
+        index (int): The index of the course.
+        rng (random.Random): The random generator.
+    """
+    department = rng.choice(DEPARTMENTS)
+    time = {}
+    for lesson in range(rng.randint(1, 2)):
+        slot = rng.randrange(len(START_TIMES))
+        time['Lesson-{number}'.format(number=lesson + 1)] = {
+            'Weekday': rng.choice(WEEKDAYS), 'StartTime': START_TIMES[slot], 'EndTime': END_TIMES[slot]}
+    return {'course_id': 'C-{index:06d}'.format(index=index), 'course_name': 'Course {index}'.format(index=index),
+            'department': department, 'credits': rng.randint(1, 4), 'time': time,
+            'location': 'Building {building} Room {room}'.format(building=rng.randint(1, 20), room=rng.randint(100, 520))}
+
+
+def realistic_time(rng):
+    """Generate the time of one course from the meeting patterns.
+
+    Args:
+        rng (random.Random): The random generator.
+
+    Returns:
+        time (dict): The time in the format of Course.time.
+    """
+    weight, weekdays, starts, minutes = rng.choices(
+        MEETING_PATTERNS, weights=[pattern[0] for pattern in MEETING_PATTERNS])[0]
+    if len(weekdays) == len(WEEKDAYS):
+        # The weekly patterns meet on one day only.
+        weekdays = [rng.choice(weekdays)]
+    start = rng.choice(starts)
+    hour, minute = start.split(':')
+    end = int(hour) * 60 + int(minute) + minutes
+    end = '{}:{:02d}'.format(end // 60, end % 60)
+    return {'Lesson-{number}'.format(number=number + 1): {'Weekday': weekday, 'StartTime': start, 'EndTime': end}
+            for number, weekday in enumerate(weekdays)}
+
+
+def student_data(index, rng):
+    """Generate the data of one student, in the format of Student.to_dict.
+
+    Args:
+        index (int): The index of the student.
+        rng (random.Random): The random generator.
+    """
+    return {'student_id': '3{index:011d}'.format(index=index), 'last_name': 'Last{index}'.format(index=index),
+            'first_name': 'First{index}'.format(index=index), 'gender': rng.choice(['Male', 'Female']),
+            'birthday': '{year}-{month:02d}-{day:02d}'.format(year=rng.randint(1998, 2004), month=rng.randint(1, 12), day=rng.randint(1, 28)),
+            'department': rng.choice(DEPARTMENTS)}
+
+
+def term_courses(courses, students, per_student, graded, seed=0):
+    """Build a courses dict with the registrations of the whole term.
+
+    Args:
+        courses (int): The number of courses.
+        students (int): The number of students.
+        per_student (int): The number of courses of each student.
+        graded (float): The part of the registrations that are graded already.
+        seed (int): The random seed.
+    """
+    rng = random.Random(seed)
+    result = {}
+    for i in range(courses):
+        data = course_data(i, rng)
+        result[data['course_id']] = {'Information': {'Name': data['course_name'], 'Department': data['department'],
+                                                     'Credits': data['credits'], 'Time': data['time'], 'Location': data['location']},
+                                     'Registration': {}}
+    course_ids = list(result.keys())
+    for i in range(students):
+        data = student_data(i, rng)
+        for course_id in rng.sample(course_ids, per_student):
+            result[course_id]['Registration'][data['student_id']] = {
+                'Name': data['last_name'] + ' ' + data['first_name'],
+                'Grade': rng.randint(40, 100) if rng.random() < graded else -1,
+                'Department': data['department'], 'Gender': data['gender']}
+    return result
+
+
+def write_registry(root, enrollments, per_student=5, class_size=40, graded=0.5, seed=0):
+    """Write a whole registry under the root: Courses/, Students/ and courses.json with the enrollments.
+
+    The courses meet in the realistic patterns, the popular courses fill up first, and no student has a clash.
+    Only one course of the snapshot is built in memory at a time.
+
+    Args:
+        root (str): The root directory.
+        enrollments (int): The number of enrollments wanted, from 1k to 1M.
+        per_student (int): The number of courses of each student.
+        class_size (int): The average number of students in a course.
+        graded (float): The part of the enrollments that are graded already.
+        seed (int): The random seed.
+
+    Returns:
+        summary (dict): The number of courses, students and enrollments written.
+    """
+    rng = random.Random(seed)
+    students = max(1, enrollments // per_student)
+    # There are more seats than enrollments, so the students find courses without a clash.
+    courses = max(per_student * 2, enrollments * 5 // (class_size * 4))
+
+    for directory in ['Courses', 'Students']:
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+
+    course_list = []
+    for index in range(courses):
+        data = course_data(index, rng)
+        data['time'] = realistic_time(rng)
+        data['capacity'] = class_size * 2
+        course_list.append(data)
+        with open(os.path.join(root, 'Courses', data['course_id'] + '.json'), 'w') as f:
+            json.dump(data, f)
+    meetings = [course_meetings(data['time']) for data in course_list]
+
+    # Some courses are far more popular than the others.
+    weights = list(itertools.accumulate(
+        1.0 / (rank + 1) ** 0.5 for rank in range(courses)))
+    registrations = [[] for _ in range(courses)]
+    # Only the fields kept in the registrations, as (student_id, name, department, gender).
+    student_list = []
+    total = 0
+    for index in range(students):
+        data = student_data(index, rng)
+        with open(os.path.join(root, 'Students', data['student_id'] + '.json'), 'w') as f:
+            json.dump(data, f)
+        student_list.append((data['student_id'], '{} {}'.format(
+            data['first_name'], data['last_name']), data['department'], data['gender']))
+
+        schedule = ScheduleIndex()
+        chosen = set()
+        for course in rng.choices(range(courses), cum_weights=weights, k=per_student * 4):
+            if len(chosen) == per_student:
+                break
+            if course in chosen or len(registrations[course]) >= course_list[course]['capacity'] or schedule.clash(meetings[course]) is not None:
+                continue
+            chosen.add(course)
+            schedule.add(course, meetings[course])
+            registrations[course].append(index)
+        total += len(chosen)
+
+    def snapshot_courses():
+        for data, registrants in zip(course_list, registrations):
+            registration = {}
+            for index in registrants:
+                student_id, name, department, gender = student_list[index]
+                registration[student_id] = {'Name': name, 'Grade': rng.randint(40, 100) if rng.random() < graded else -1,
+                                            'Department': department, 'Gender': gender}
+            yield data['course_id'], {'Information': {'Name': data['course_name'], 'Department': data['department'],
+                                                      'Credits': data['credits'], 'Time': data['time'], 'Location': data['location'],
+                                                      'Capacity': data['capacity']},
+                                      'Registration': registration}
+    write_snapshot(os.path.join(root, 'courses.json'), snapshot_courses())
+    return {'Courses': courses, 'Students': students, 'Enrollments': total}
+
+
+def write_tree(root, courses, students, seed=0):
+    """Write the Courses/ and Students/ directories under the root.
+
+    Args:
+        root (str): The root directory.
+        courses (int): The number of courses.
+        students (int): The number of students.
+        seed (int): The random seed.
+    """
+    rng = random.Random(seed)
+    for directory, count, generate, key in [('Courses', courses, course_data, 'course_id'),
+                                            ('Students', students, student_data, 'student_id')]:
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+        for index in range(count):
+            data = generate(index, rng)
+            with open(os.path.join(root, directory, data[key] + '.json'), 'w') as f:
+                json.dump(data, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic registry: Courses/, Students/ and courses.json.")
+    parser.add_argument('root', help="The directory to write into.")
+    parser.add_argument('--enrollments', type=int, default=10000)
+    parser.add_argument('--per-student', type=int, default=5)
+    parser.add_argument('--class-size', type=int, default=40)
+    parser.add_argument('--graded', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    summary = write_registry(args.root, args.enrollments, args.per_student,
+                             args.class_size, args.graded, args.seed)
+    print("Wrote {Courses} course(s), {Students} student(s) and {Enrollments} enrollment(s) into {root}.".format(
+        root=args.root, **summary))
+
+
+if __name__ == '__main__':
+    main()
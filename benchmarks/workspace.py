@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import contextlib
+
+import storage
+
+
+@contextlib.contextmanager
+def temporary_directory():
+    """Run the with block in a new empty directory, like a fresh install, and come back to the current directory after it.
+
+    Yields:
+        root (str): The directory, removed at the end of the with block.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        os.chdir(root)
+        # The directories created in the last one don't exist here.
+        storage._directories.clear()
+        try:
+            yield root
+        finally:
+            os.chdir(cwd)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Drop what the with block prints, like the messages of the CourseManager.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
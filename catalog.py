@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+
+from timetable import parse_time
+
+
+class CatalogIndex(object):
+    """The secondary indexes of the courses for the catalog search: the department, the weekday and the start time
+    of each meeting, the location and the credits.
+
+    Each index maps a value to the set of the course ids, so a query intersects a few sets instead of
+    scanning every course.
+    """
+
+    def __init__(self):
+        # {'Department': {CourseId}}, {Credits: {CourseId}}, {'Location': {CourseId}}
+        self.departments = {}
+        self.credits = {}
+        self.locations = {}
+        # The courses under each leading part of the locations, up to a space, like 'Building 3 ', so the search
+        # by such a prefix reads one set. The other prefixes are a range of the locations sorted.
+        # {'Prefix': {CourseId}}
+        self.location_prefixes = {}
+        self.sorted_locations = []
+        # The meetings by the weekday and the exact start time, and by the department too, which keeps the sets
+        # small for the most common search. The start times of each weekday are kept sorted for the time ranges.
+        # {'Weekday': ([StartMinute], {StartMinute: {CourseId}})}, {('Department', 'Weekday'): ([StartMinute], {StartMinute: {CourseId}})}
+        self.starts = {}
+        self.department_starts = {}
+        # The meetings of each course, to check a course against a time range.
+        # {'CourseId': [(Weekday, StartMinute, EndMinute)]}
+        self.meetings = {}
+        # The values each course is indexed under, so it is removed or checked without reading the courses dict.
+        # {'CourseId': (Department, Credits, Location)}
+        self.keys = {}
+
+    def add(self, course_id, information, meetings):
+        """Index the course.
+
+        Args:
+            course_id (str): The id of the course.
+            information (dict): The information of the course, like {'Department': ..., 'Credits': ..., 'Location': ...}.
+            meetings (list): The (weekday, start, end) tuples of the course, from course_meetings.
+        """
+        if course_id in self.keys:
+            self.remove(course_id)
+        department, credits, location = information['Department'], information['Credits'], information['Location']
+        self.departments.setdefault(department, set()).add(course_id)
+        self.credits.setdefault(credits, set()).add(course_id)
+        if location not in self.locations:
+            self.locations[location] = set()
+            bisect.insort(self.sorted_locations, location)
+        self.locations[location].add(course_id)
+        for prefix in self._word_prefixes(location):
+            self.location_prefixes.setdefault(prefix, set()).add(course_id)
+        for weekday, start, end in meetings:
+            self._add_start(self.starts, weekday, start, course_id)
+            self._add_start(self.department_starts,
+                            (department, weekday), start, course_id)
+        self.meetings[course_id] = meetings
+        self.keys[course_id] = (department, credits, location)
+
+    def remove(self, course_id):
+        """Remove the course from the indexes.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        keys = self.keys.pop(course_id, None)
+        if keys is None:
+            return
+        department, credits, location = keys
+        self._discard(self.departments, department, course_id)
+        self._discard(self.credits, credits, course_id)
+        if self._discard(self.locations, location, course_id):
+            del self.sorted_locations[bisect.bisect_left(
+                self.sorted_locations, location)]
+        for prefix in self._word_prefixes(location):
+            self._discard(self.location_prefixes, prefix, course_id)
+        for weekday, start, end in self.meetings.pop(course_id):
+            self._discard_start(self.starts, weekday, start, course_id)
+            self._discard_start(self.department_starts,
+                                (department, weekday), start, course_id)
+
+    @staticmethod
+    def _word_prefixes(location):
+        """Get the leading parts of the location that end with a space.
+
+        Args:
+            location (str): The location, like 'Building 3 Room 120'.
+
+        Returns:
+            prefixes (list): The prefixes, like ['Building ', 'Building 3 ', 'Building 3 Room '].
+        """
+        prefixes = []
+        end = location.find(' ')
+        while end != -1:
+            prefixes.append(location[:end + 1])
+            end = location.find(' ', end + 1)
+        return prefixes
+
+    @staticmethod
+    def _add_start(index, key, start, course_id):
+        """Add the meeting of the course into the start times of the key.
+        """
+        if key not in index:
+            index[key] = ([], {})
+        starts, course_ids = index[key]
+        if start not in course_ids:
+            course_ids[start] = set()
+            bisect.insort(starts, start)
+        course_ids[start].add(course_id)
+
+    @classmethod
+    def _discard_start(cls, index, key, start, course_id):
+        """Remove the meeting of the course from the start times of the key.
+        """
+        if key not in index:
+            return
+        starts, course_ids = index[key]
+        if cls._discard(course_ids, start, course_id):
+            del starts[bisect.bisect_left(starts, start)]
+            if len(starts) == 0:
+                del index[key]
+
+    @staticmethod
+    def _discard(index, key, course_id):
+        """Remove the course from the set of the key, and the key once its set is empty.
+
+        Returns:
+            emptied (bool): Whether the key is removed.
+        """
+        course_ids = index.get(key)
+        if course_ids is None:
+            return False
+        course_ids.discard(course_id)
+        if len(course_ids) == 0:
+            del index[key]
+            return True
+        return False
+
+    def query(self, department=None, weekday=None, starts_between=None, location=None, location_prefix=None, credits=None):
+        """Find the courses matching all the conditions given, the conditions left as None match any course.
+
+        Args:
+            department (str): The department.
+            weekday (str): The weekday of a meeting, like 'Monday'.
+            starts_between (tuple): The (earliest, latest) start time of a meeting like ('8:00', '12:00'),
+                the latest excluded, on the weekday if one is given.
+            location (str): The exact location.
+            location_prefix (str): The start of the location, like 'Building 3 '.
+            credits (int or list): The credits, or the list of the credits accepted.
+
+        Returns:
+            course_ids (list): The ids of the courses matched, sorted.
+        """
+        keys = self.keys
+        meetings = self.meetings
+        # Each condition is (the number of the courses in its sets, the number of its sets, the function that
+        # gets its sets, where a course matches if it is in any of them, the check of one course against it).
+        conditions = []
+        if weekday is not None or starts_between is not None:
+            earliest, latest = (0, 24 * 60) if starts_between is None else (
+                parse_time(starts_between[0]), parse_time(starts_between[1]))
+            parts = []
+            for day in ([weekday] if weekday is not None else sorted(self.starts)):
+                # The sets of the department cover the department condition too.
+                index = self.starts.get(day) if department is None else self.department_starts.get(
+                    (department, day))
+                if index is None:
+                    continue
+                starts, course_ids = index
+                for start in starts[bisect.bisect_left(starts, earliest):bisect.bisect_left(starts, latest)]:
+                    parts.append(course_ids[start])
+
+            def time_check(course_id):
+                return (department is None or keys[course_id][0] == department) and any(
+                    (weekday is None or day == weekday) and earliest <= start < latest for day, start, end in meetings[course_id])
+            conditions.append((sum(len(part) for part in parts), len(parts),
+                               lambda parts=parts: parts, time_check))
+        elif department is not None:
+            course_ids = self.departments.get(department, set())
+            conditions.append((len(course_ids), 1, lambda: [course_ids],
+                               lambda course_id: keys[course_id][0] == department))
+        if credits is not None:
+            accepted = set(credits) if isinstance(
+                credits, (list, tuple, set)) else {credits}
+            credit_parts = [self.credits[value]
+                            for value in accepted if value in self.credits]
+            conditions.append((sum(len(part) for part in credit_parts), len(credit_parts), lambda: credit_parts,
+                               lambda course_id: keys[course_id][1] in accepted))
+        if location is not None:
+            location_ids = self.locations.get(location, set())
+            conditions.append((len(location_ids), 1, lambda: [location_ids],
+                               lambda course_id: keys[course_id][2] == location))
+        if location_prefix is not None and location_prefix in self.location_prefixes:
+            prefix_ids = self.location_prefixes[location_prefix]
+            conditions.append((len(prefix_ids), 1, lambda: [prefix_ids],
+                               lambda course_id: keys[course_id][2].startswith(location_prefix)))
+        elif location_prefix is not None:
+            # The locations with the prefix are a range of the sorted locations, and the number of their
+            # courses is estimated with the average, so the range is only read if it is used.
+            first = bisect.bisect_left(self.sorted_locations, location_prefix)
+            last = bisect.bisect_left(
+                self.sorted_locations, location_prefix + '\U0010ffff')
+            conditions.append(((last - first) * len(keys) // max(len(self.locations), 1), last - first,
+                               lambda: [self.locations[name]
+                                        for name in self.sorted_locations[first:last]],
+                               lambda course_id: keys[course_id][2].startswith(location_prefix)))
+
+        if not conditions:
+            return sorted(keys)
+
+        # The smallest condition is taken from its index first. Each other condition intersects its sets with
+        # the courses left, or checks the courses left one by one when that is cheaper: a check in Python costs
+        # about as much as 20 lookups of an intersection, or as one set intersected.
+        conditions.sort(key=lambda condition: condition[0])
+        others = conditions[1:]
+        if others and (conditions[0][1] == 1 or others[0][1] == 1) and conditions[0][0] * 20 >= others[0][0] + others[0][1] * 20:
+            # When one of the two smallest conditions is a single set, the sets of the other are intersected with
+            # it before they are merged, so neither of them is copied whole.
+            single, parts = (conditions[0], others[0]) if conditions[0][1] == 1 else (others[0], conditions[0])
+            single_ids = single[2]()[0]
+            matched = set().union(*[part & single_ids for part in parts[2]()])
+            others = others[1:]
+        else:
+            matched = set().union(*conditions[0][2]())
+        for size, count, get_parts, check in others:
+            if not matched:
+                return []
+            if len(matched) * 20 < size + count * 20:
+                matched = {
+                    course_id for course_id in matched if check(course_id)}
+                continue
+            sets = get_parts()
+            if len(sets) == 1:
+                matched &= sets[0]
+            else:
+                matched = set().union(*[matched & course_ids for course_ids in sets])
+        return sorted(matched)
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import argparse
+import collections
+
+from allocation import allocate, collect_preferences
+from assistant_func import course_from_data, student_from_data, lazy_students
+from basic_class import CourseManager
+from importer import chunked, import_grades, invalid_row, read_rows
+from instrumentation import emit
+from storage import open_storage
+
+import instrumentation
+
+
+def print_summary(action, statuses):
+    """Print the number of rows of each status.
+
+    Args:
+        action (str): The command, like 'register'.
+        statuses (Counter): The number of rows of each status.
+
+    Returns:
+        code (int): The exit code, 1 if any row was not applied.
+    """
+    print("{action}: {rows} row(s), {statuses}.".format(action=action, rows=sum(statuses.values()),
+                                                      statuses=', '.join('{} {}'.format(count, status) for status, count in sorted(statuses.items())) or 'nothing to do'))
+    failed = sum(count for status, count in statuses.items()
+                 if status not in ('registered', 'waitlisted', 'dropped', 'unwaitlisted', 'graded', 'imported', 'unchanged'))
+    return 1 if failed else 0
+
+
+def import_command(args):
+    """Import the course or the student files, and add the courses into the course manager with --add.
+
+    The input is the .jsonl of the records in the format of Course.to_dict or Student.to_dict. With --add, a course
+    the course manager has already is kept with its registrations.
+    """
+    storage = open_storage(args.backend)
+    # The course manager is only opened to add the courses, the students are never added with --add.
+    manager = CourseManager(storage) if args.add and args.kind == 'courses' else None
+    from_data = course_from_data if args.kind == 'courses' else student_from_data
+    statuses = collections.Counter()
+    try:
+        for chunk in chunked(read_rows(args.file), args.batch_size):
+            objects = []
+            for number, data in chunk:
+                if data is None:
+                    invalid_row(statuses, number, "The line is not a json object.")
+                    continue
+                try:
+                    objects.append(from_data(data))
+                except (KeyError, TypeError, ValueError) as e:
+                    invalid_row(statuses, number,
+                                "The record is invalid: {error!r}.".format(error=e))
+            data = [item.to_dict() for item in objects]
+            if args.kind == 'courses':
+                storage.export_many(courses=data)
+            else:
+                storage.export_many(students=data)
+            if manager is not None:
+                with manager.batch():
+                    for course in objects:
+                        # Adding a course again would empty its registration, so a course managed already is kept.
+                        existing = manager.courses.get(course.course_id)
+                        if existing is None:
+                            manager.add_courses(course)
+                            statuses['imported'] += 1
+                        elif existing['Information'] == manager.course_information(course):
+                            statuses['unchanged'] += 1
+                        else:
+                            statuses['exists'] += 1
+                            emit('exists', "The course {course_id} is managed already with other information, so it is kept with its registrations.".format(
+                                course_id=course.course_id), level='warning', course_id=course.course_id)
+            else:
+                statuses['imported'] += len(objects)
+    finally:
+        storage.close()
+    return print_summary('import', statuses)
+
+
+def register_command(args):
+    """Register or drop the students in the courses, from the rows with student_id, course_id and action ('add' by default).
+    """
+    manager = CourseManager(open_storage(args.backend))
+    students = lazy_students(manager.storage)
+    statuses = collections.Counter()
+    try:
+        for chunk in chunked(read_rows(args.file), args.batch_size):
+            requests = []
+            for number, row in chunk:
+                if row is None:
+                    invalid_row(statuses, number, "The line is not a json object.")
+                    continue
+                if not row.get('student_id') or not row.get('course_id'):
+                    invalid_row(statuses, number,
+                                "The student_id and the course_id are required.")
+                    continue
+                requests.append((row['student_id'], row['course_id'],
+                                 row.get('action') or 'add'))
+            # Each chunk is validated and recorded as one batch.
+            for result in manager.process_batch(requests, students):
+                statuses[result['Status']] += 1
+                if result['Message'] is not None:
+                    emit(result['Status'], result['Message'], level='debug',
+                         course_id=result['CourseId'], student_id=result['StudentId'])
+        manager.save_selected_courses()
+    finally:
+        manager.close()
+    return print_summary('register', statuses)
+
+
+def grade_command(args):
+    """Set the grades, from the rows with student_id, course_id and grade, all recorded as one entry.
+    """
+    manager = CourseManager(open_storage(args.backend))
+    try:
+        report = import_grades(manager, read_rows(
+            args.file), args.batch_size, args.strict)
+        manager.save_selected_courses()
+    finally:
+        manager.close()
+    code = print_summary('grade', report['Statuses'])
+    print("grade: {rows} row(s) in {seconds:.3f}s, {speed:.0f} rows/s.".format(
+        rows=report['Rows'], seconds=report['Seconds'], speed=report['RowsPerSecond'] or 0))
+    return code
+
+
+def allocate_command(args):
+    """Allocate the seats to the students by their ranked preferences, in rounds by lottery, and save their selected courses.
+
+    The preferences are in the student files, e.g. imported with the 'preferences' of each student.
+    """
+    storage = open_storage(args.backend)
+    manager = CourseManager(storage)
+    try:
+        students = {}
+        for data in storage.iter_student_data():
+            student = student_from_data(data)
+            if len(student.preferences) > 0:
+                students[student.student_id] = student
+        allocations = allocate(manager, collect_preferences(students.values()), students,
+                               max_courses=args.max_courses, seed=args.seed)
+        for student_id, course_ids in allocations.items():
+            for course_id in course_ids:
+                emit('registered', "The student {student_id} is allocated a seat in the course {course_id}.".format(
+                    student_id=student_id, course_id=course_id), level='debug', course_id=course_id, student_id=student_id)
+        manager.save_selected_courses()
+    finally:
+        manager.close()
+    print("allocate: {seats} seat(s) to {students} student(s) with preferences.".format(
+        seats=sum(len(course_ids) for course_ids in allocations.values()), students=len(allocations)))
+    return 0
+
+
+def report_command(args):
+    """Write the views of the students and the courses as json lines, all the registrants by default.
+
+    The report reads one snapshot of the courses, so it is consistent and never blocks the registration.
+    """
+    manager = CourseManager(open_storage(args.backend))
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        with manager.snapshot() as snapshot:
+            transcripts = snapshot.transcripts(
+                args.student or ([] if args.course else None))
+            for student_id, transcript in transcripts.items():
+                out.write(json.dumps({'StudentId': student_id, 'Schedule': transcript['Schedule'], 'Grades': transcript['Grades'],
+                                      'GPA': transcript['GPA'], 'Credits': transcript['Credits']}) + '\n')
+            for course_id in args.course or []:
+                course = snapshot.get(course_id)
+                if course is None:
+                    emit('course_not_found', "The course {course_id} is not in the courses list.".format(
+                        course_id=course_id), level='warning', course_id=course_id)
+                    continue
+                capacity = course['Information'].get('Capacity')
+                out.write(json.dumps({'CourseId': course_id, 'Information': course['Information'],
+                                      'Registrants': len(course['Registration']),
+                                      'AvailableSeats': None if capacity is None else max(capacity - len(course['Registration']), 0),
+                                      'Waitlist': len(course.get('Waitlist', ()))}) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        manager.close()
+    return 0
+
+
+def export_command(args):
+    """Save the snapshot of the courses, and export the selected courses of the registrants.
+    """
+    manager = CourseManager(open_storage(args.backend))
+    try:
+        saved = manager.save_courses_file()
+        student_ids = args.student or list(manager.student_courses.keys())
+        for student_id in student_ids:
+            manager.storage.export_selected_courses(
+                student_id, manager.build_selected_courses(student_id))
+    finally:
+        manager.close()
+    print("export: snapshot {saved}, {selected} selected courses file(s).".format(
+        saved='saved' if saved else 'unchanged', selected=len(student_ids)))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run the course registration without the interactive menu, e.g. for the bulk jobs.")
+    parser.add_argument('--backend', default=os.environ.get('COURSE_STORAGE', 'json'),
+                        help="The storage backend, 'json' or 'sqlite'.")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Print the status message of every row.")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Print the call counts and the latencies at the end.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser(
+        'import', help="Import the courses or the students from a .jsonl file.")
+    command.add_argument('kind', choices=['courses', 'students'])
+    command.add_argument('file', help="The .jsonl file, '-' for the standard input.")
+    command.add_argument('--add', action='store_true',
+                         help="Also add the new courses into the course manager, the courses managed already are kept. Only for the courses.")
+    command.set_defaults(function=import_command)
+
+    command = commands.add_parser(
+        'register', help="Register or drop the students from the rows with student_id, course_id and action.")
+    command.add_argument('file', help="The .csv or .jsonl file, '-' for the standard input.")
+    command.set_defaults(function=register_command)
+
+    command = commands.add_parser(
+        'grade', help="Set the grades from the rows with student_id, course_id and grade.")
+    command.add_argument('file', help="The .csv or .jsonl file, '-' for the standard input.")
+    command.add_argument('--strict', action='store_true',
+                         help="Set no grade at all if any row is not valid.")
+    command.set_defaults(function=grade_command)
+
+    command = commands.add_parser(
+        'allocate', help="Allocate the seats to the students by the preferences in the student files.")
+    command.add_argument('--max-courses', type=int,
+                         help="The maximum number of courses given to a student, no limit by default.")
+    command.add_argument('--seed', type=int,
+                         help="The seed of the lottery, a random one by default.")
+    command.set_defaults(function=allocate_command)
+
+    command = commands.add_parser(
+        'report', help="Write the schedules, the grades and the GPA as json lines.")
+    command.add_argument('--student', nargs='+',
+                         help="The students, all the registrants by default.")
+    command.add_argument('--course', nargs='+', help="The courses.")
+    command.add_argument('--output', default='-',
+                         help="The output file, the standard output by default.")
+    command.set_defaults(function=report_command)
+
+    command = commands.add_parser(
+        'export', help="Save the snapshot of the courses and the selected courses files.")
+    command.add_argument('--student', nargs='+',
+                         help="The students, all the registrants by default.")
+    command.set_defaults(function=export_command)
+
+    for command in [commands.choices['import'], commands.choices['register'], commands.choices['grade']]:
+        command.add_argument('--batch-size', type=int, default=1000,
+                             help="The number of rows made durable in the storage together.")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'import' and args.add and args.kind != 'courses':
+        # Nothing is imported, rather than the students exported and the add failing halfway.
+        parser.error("--add is only for the courses.")
+    # Only the warnings are printed by default, the status message of each row is at the info level or below.
+    instrumentation.set_level('debug' if args.verbose else 'warning')
+    if args.instrument:
+        instrumentation.enable()
+    code = args.function(args)
+    if args.instrument:
+        print(instrumentation.format_report(), file=sys.stderr)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
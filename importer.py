@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import csv
+import json
+import time
+import itertools
+import collections
+
+from instrumentation import emit
+
+
+def read_rows(file_name):
+    """Read the rows of the input file one at a time, so a file of any size is streamed.
+
+    A .jsonl file has one json object on each line, any other file is a csv file with a header line.
+
+    Args:
+        file_name (str): The path of the file, '-' for the standard input.
+
+    Returns:
+        rows (generator): The (line number, row dict) tuples, the row is None for a line that is not a json object,
+            so the caller reports it like any other invalid row.
+    """
+    f = sys.stdin if file_name == '-' else open(file_name, 'r', newline='')
+    try:
+        if file_name.endswith('.jsonl'):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield number, row if isinstance(row, dict) else None
+        else:
+            # The header is line 1, so the first row is line 2.
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, row
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def chunked(rows, size):
+    """Split the rows into the lists of the size given, the last one may be shorter.
+
+    Args:
+        rows (iterable): The rows.
+        size (int): The number of rows in a chunk.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def invalid_row(statuses, number, message, status='invalid'):
+    """Count the row as not applied and report it.
+
+    Args:
+        statuses (Counter): The number of rows of each status.
+        number (int): The line number of the row.
+        message (str): The reason.
+        status (str): The status counted, like 'invalid' or 'not_registered'.
+    """
+    statuses[status] += 1
+    emit('row_invalid', "Line {number}: {message}".format(
+        number=number, message=message), level='warning', line=number)
+
+
+def import_grades(manager, rows, chunk_size=1000, strict=False):
+    """Import a grade sheet: the rows are read and checked chunk by chunk, then all the grades are set in one batch,
+    which the storage records as one entry.
+
+    Args:
+        manager (CourseManager): The course manager.
+        rows (iterable): The (line number, row dict) tuples like read_rows, with student_id, course_id and grade.
+        chunk_size (int): The number of rows read at a time.
+        strict (bool): Whether no grade is set at all when any row is not valid.
+
+    Returns:
+        report (dict): {'Rows': int, 'Statuses': Counter, 'Seconds': float, 'RowsPerSecond': float}, with the number of
+            rows of each status: 'graded', 'invalid', 'course_not_found', 'not_registered', or 'rejected' for the valid rows
+            of a strict import that failed.
+    """
+    start = time.perf_counter()
+    statuses = collections.Counter()
+    # {(CourseId, StudentId): Grade}, a later row of the same student and course replaces the earlier one,
+    # and the rows of each pair are counted so every row gets a status.
+    grades = {}
+    pair_rows = collections.Counter()
+    total = 0
+    courses = manager.courses
+    for chunk in chunked(rows, chunk_size):
+        total += len(chunk)
+        for number, row in chunk:
+            if row is None:
+                invalid_row(statuses, number, "The line is not a json object.")
+                continue
+            # The rows are checked with the lookups of the courses and their registrations, without any scan.
+            course_id, student_id = row.get('course_id'), row.get('student_id')
+            try:
+                grade = float(row['grade'])
+            except (KeyError, TypeError, ValueError):
+                invalid_row(statuses, number,
+                            "The grade is missing or not a number.")
+                continue
+            if not 0 <= grade <= 100:
+                invalid_row(statuses, number,
+                            "The grade must be between 0 and 100.")
+            elif course_id not in courses:
+                invalid_row(statuses, number, "The course {course_id} is not in the courses list.".format(
+                    course_id=course_id), 'course_not_found')
+            elif student_id not in courses[course_id]['Registration']:
+                invalid_row(statuses, number, "The student {student_id} is not in the course {course_id}.".format(
+                    student_id=student_id, course_id=course_id), 'not_registered')
+            else:
+                grades[(course_id, student_id)] = grade
+                pair_rows[(course_id, student_id)] += 1
+
+    if strict and sum(statuses.values()) > 0:
+        emit('grades_rejected', "No grade is set, as {count} row(s) are not valid.".format(
+            count=sum(statuses.values())), level='warning')
+        statuses['rejected'] += sum(pair_rows.values())
+    else:
+        with manager.batch():
+            applied, skipped = manager.set_grades(
+                [(course_id, student_id, grade) for (course_id, student_id), grade in grades.items()])
+        statuses['graded'] += sum(pair_rows.values())
+        # The grades dropped meanwhile under the locks are moved out of the graded rows.
+        for course_id, student_id, status in skipped:
+            statuses['graded'] -= pair_rows[(course_id, student_id)]
+            statuses[status] += pair_rows[(course_id, student_id)]
+
+    seconds = time.perf_counter() - start
+    report = {'Rows': total, 'Statuses': statuses, 'Seconds': seconds,
+              'RowsPerSecond': total / seconds if seconds > 0 else None}
+    emit('grades_imported', "Imported {graded} grade(s) from {rows} row(s) in {seconds:.3f}s, {speed:.0f} rows/s.".format(
+        graded=statuses['graded'], rows=total, seconds=seconds, speed=report['RowsPerSecond'] or 0),
+        rows=total, graded=statuses['graded'], seconds=seconds)
+    return report
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import contextlib
+
+# The instrumentation is off unless enabled, then an instrumented call costs only the check of this flag.
+ENABLED = False
+
+# The levels of the events, the events below the current level are dropped.
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+# The latencies are counted in the buckets of the powers of 2 microseconds: < 1us, < 2us, < 4us, ...
+BUCKETS = 32
+
+_lock = threading.Lock()
+# {'Name': {'Calls': int, 'Seconds': float, 'Max': float, 'Histogram': [count of each bucket]}}
+_timings = {}
+# {'Name': {'Count': int, 'Total': int, 'Max': int}}
+_sizes = {}
+
+
+def enable():
+    """Start collecting the call counts, the latencies and the sizes.
+    """
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    """Stop collecting, the numbers collected so far are kept.
+    """
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """Drop the numbers collected so far.
+    """
+    with _lock:
+        _timings.clear()
+        _sizes.clear()
+
+
+def instrumented(name=None):
+    """The decorator that counts the calls of the function and their latencies, when the instrumentation is enabled.
+
+    Args:
+        name (str): The name in the report, the qualified name of the function by default.
+    """
+    def decorator(function):
+        label = name if name is not None else function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _observe_call(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _observe_call(name, seconds):
+    bucket = min(max(int(seconds * 1e6), 1).bit_length() - 1, BUCKETS - 1)
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = {'Calls': 0, 'Seconds': 0.0,
+                                       'Max': 0.0, 'Histogram': [0] * BUCKETS}
+        timing['Calls'] += 1
+        timing['Seconds'] += seconds
+        timing['Max'] = max(timing['Max'], seconds)
+        timing['Histogram'][bucket] += 1
+
+
+def record_size(name, value):
+    """Record a size, like the number of courses scanned or registrations touched by a call.
+
+    The callers check ENABLED first, so nothing is computed for a disabled instrumentation.
+
+    Args:
+        name (str): The name of the size.
+        value (int): The size.
+    """
+    with _lock:
+        size = _sizes.get(name)
+        if size is None:
+            size = _sizes[name] = {'Count': 0, 'Total': 0, 'Max': 0}
+        size['Count'] += 1
+        size['Total'] += value
+        size['Max'] = max(size['Max'], value)
+
+
+class Counter(object):
+    """A count safe under concurrent threads, for the counts updated under the locks of different stripes.
+    """
+
+    def __init__(self, value=0):
+        """The initialization for the object.
+
+        Args:
+            value (int): The count to start with.
+        """
+        self._lock = threading.Lock()
+        self.value = value
+
+    def add(self, count=1):
+        """Add to the count.
+
+        Args:
+            count (int): The number added.
+        """
+        with self._lock:
+            self.value += count
+
+    def reset(self, value=0):
+        """Set the count again.
+
+        Args:
+            value (int): The new count.
+        """
+        with self._lock:
+            self.value = value
+
+
+def _percentile(histogram, calls, fraction):
+    """Get the upper bound in seconds of the bucket holding the percentile.
+    """
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= calls * fraction:
+            return (2 ** (bucket + 1)) / 1e6
+    return None
+
+
+def report():
+    """Get the numbers collected so far.
+
+    Returns:
+        report (dict): {'Calls': {'Name': {...}}, 'Sizes': {'Name': {...}}}, the latencies are in seconds,
+            and P50/P99 are the upper bounds of their buckets.
+    """
+    with _lock:
+        calls = {}
+        for name, timing in _timings.items():
+            calls[name] = {'Calls': timing['Calls'], 'Seconds': timing['Seconds'],
+                           'Mean': timing['Seconds'] / timing['Calls'], 'Max': timing['Max'],
+                           'P50': _percentile(timing['Histogram'], timing['Calls'], 0.5),
+                           'P99': _percentile(timing['Histogram'], timing['Calls'], 0.99),
+                           'Histogram': list(timing['Histogram'])}
+        sizes = {name: dict(size, Mean=size['Total'] / size['Count'])
+                 for name, size in _sizes.items()}
+    return {'Calls': calls, 'Sizes': sizes}
+
+
+def format_report():
+    """Format the numbers collected so far as a table.
+
+    Returns:
+        text (str): The table of the calls, the slowest in total first, then the table of the sizes.
+    """
+    data = report()
+    lines = ['{name:<48} {calls:>9} {total:>10} {mean:>10} {p99:>10} {max:>10}'.format(
+        name='call', calls='calls', total='total ms', mean='mean us', p99='p99 us', max='max us')]
+    for name, timing in sorted(data['Calls'].items(), key=lambda item: -item[1]['Seconds']):
+        lines.append('{name:<48} {calls:>9} {total:>10.2f} {mean:>10.1f} {p99:>10.0f} {max:>10.1f}'.format(
+            name=name, calls=timing['Calls'], total=timing['Seconds'] * 1e3, mean=timing['Mean'] * 1e6,
+            p99=timing['P99'] * 1e6, max=timing['Max'] * 1e6))
+    if data['Sizes']:
+        lines.append('')
+        lines.append('{name:<48} {count:>9} {total:>10} {mean:>10} {max:>10}'.format(
+            name='size', count='count', total='total', mean='mean', max='max'))
+        for name, size in sorted(data['Sizes'].items()):
+            lines.append('{name:<48} {count:>9} {total:>10} {mean:>10.1f} {max:>10}'.format(
+                name=name, count=size['Count'], total=size['Total'], mean=size['Mean'], max=size['Max']))
+    return '\n'.join(lines)
+
+
+def dump_report(file_name):
+    """Write the numbers collected so far into a json file.
+
+    Args:
+        file_name (str): The path of the json file.
+    """
+    with open(file_name, 'w') as f:
+        json.dump(report(), f, indent=2)
+
+
+@contextlib.contextmanager
+def profile(file_name=None, limit=30):
+    """Capture the with block with cProfile.
+
+    Args:
+        file_name (str): The path of the pstats capture, for pstats or snakeviz. None to print the top calls instead.
+        limit (int): The number of calls printed without a file.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if file_name is not None:
+            profiler.dump_stats(file_name)
+        else:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+                'cumulative').print_stats(limit)
+
+
+# The events replace the status messages: each one has a name, a level, the message for the user and
+# the fields for the machines. The handlers receive the events at or above the level.
+_level = LEVELS[os.environ.get('COURSE_LOG_LEVEL', 'info').lower()]
+
+
+def print_handler(event):
+    """Print the message of the event, like the status messages always did.
+
+    Args:
+        event (dict): The event.
+    """
+    # sys.stdout is looked up on every event, so the redirections of the callers are respected.
+    print(event['Message'], file=sys.stdout)
+
+
+def json_handler(stream):
+    """Get the handler that writes each event as one json line.
+
+    Args:
+        stream (file): The stream, like sys.stderr.
+    """
+    def handler(event):
+        stream.write(json.dumps(event, default=str) + '\n')
+    return handler
+
+
+# The events are printed for the user, or written as json lines with COURSE_LOG_FORMAT=json.
+_handlers = [json_handler(sys.stdout) if os.environ.get(
+    'COURSE_LOG_FORMAT') == 'json' else print_handler]
+
+
+def set_level(level):
+    """Set the level of the events handled.
+
+    Args:
+        level (str): 'debug', 'info', 'warning' or 'error'.
+    """
+    global _level
+    _level = LEVELS[level]
+
+
+def add_handler(handler):
+    """Add a handler of the events.
+
+    Args:
+        handler (function): The function called with each event.
+    """
+    _handlers.append(handler)
+
+
+def remove_handler(handler):
+    """Remove a handler of the events, e.g. print_handler for a quiet session.
+
+    Args:
+        handler (function): The handler added before.
+    """
+    _handlers.remove(handler)
+
+
+def emit(name, message, level='info', **fields):
+    """Emit an event.
+
+    Args:
+        name (str): The name of the event, like 'course_added'.
+        message (str): The message for the user.
+        level (str): 'debug', 'info', 'warning' or 'error'.
+        fields (dict): The data of the event, like the course id.
+    """
+    if LEVELS[level] < _level:
+        return
+    event = {'Event': name, 'Level': level,
+             'Time': time.time(), 'Message': message}
+    event.update(fields)
+    for handler in _handlers:
+        handler(event)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import threading
+from collections import OrderedDict
+
+from instrumentation import emit
+from records import record_default
+
+# One encoder for all the entries, json.dumps with separators would build a new one for every call.
+_encoder = json.JSONEncoder(separators=(',', ':'))
+_snapshot_encoder = json.JSONEncoder(
+    separators=(',', ':'), default=record_default)
+
+# The snapshot is written as JSON Lines: this header, then one line for each course, so it is
+# written and read one course at a time. The old snapshot with one json document is still read.
+SNAPSHOT_HEADER = '{"Format":"courses-jsonl","Version":1}\n'
+
+
+def apply_entry(courses, entry):
+    """Apply one journal entry to the courses dict.
+
+    The entries only assign or delete keys, so replaying an entry on a state that already contains it is harmless.
+
+    Args:
+        courses (dict): The courses dict in the format of the CourseManager.
+        entry (dict): The journal entry, with the operation name in entry['Op'].
+    """
+    op = entry['Op']
+    if op == 'add_course':
+        courses[entry['CourseId']] = {
+            'Information': entry['Information'], 'Registration': {}}
+    elif op == 'remove_course':
+        courses.pop(entry['CourseId'], None)
+    elif op == 'add_student':
+        if entry['CourseId'] in courses:
+            courses[entry['CourseId']]['Registration'][entry['StudentId']] = entry['Record']
+    elif op == 'remove_student':
+        if entry['CourseId'] in courses:
+            courses[entry['CourseId']]['Registration'].pop(
+                entry['StudentId'], None)
+    elif op == 'set_capacity':
+        if entry['CourseId'] in courses:
+            if entry['Capacity'] is None:
+                courses[entry['CourseId']]['Information'].pop('Capacity', None)
+            else:
+                courses[entry['CourseId']]['Information']['Capacity'] = entry['Capacity']
+    elif op == 'waitlist_student':
+        if entry['CourseId'] in courses:
+            courses[entry['CourseId']].setdefault(
+                'Waitlist', OrderedDict())[entry['StudentId']] = entry['Record']
+    elif op == 'unwaitlist_student':
+        if entry['CourseId'] in courses and 'Waitlist' in courses[entry['CourseId']]:
+            waitlist = courses[entry['CourseId']]['Waitlist']
+            waitlist.pop(entry['StudentId'], None)
+            if len(waitlist) == 0:
+                # The key only exists while somebody waits, so courses.json is unchanged for the other courses.
+                del courses[entry['CourseId']]['Waitlist']
+    elif op == 'set_grade':
+        if entry['CourseId'] in courses and entry['StudentId'] in courses[entry['CourseId']]['Registration']:
+            courses[entry['CourseId']]['Registration'][entry['StudentId']]['Grade'] = entry['Grade']
+    elif op == 'set_grades':
+        # The grades of a whole import in one entry: [[CourseId, StudentId, Grade], ...]
+        for course_id, student_id, grade in entry['Grades']:
+            if course_id in courses and student_id in courses[course_id]['Registration']:
+                courses[course_id]['Registration'][student_id]['Grade'] = grade
+    else:
+        raise ValueError("Unknown journal operation {op}.".format(op=op))
+
+
+def iter_snapshot(snapshot_file):
+    """Read the courses of the snapshot file one at a time.
+
+    Args:
+        snapshot_file (str): The path of the snapshot file.
+
+    Yields:
+        course_id (str): The id of the course.
+        course (dict): The course in the format of the CourseManager.
+    """
+    if not os.path.exists(snapshot_file):
+        return
+    with open(snapshot_file, 'r') as f:
+        if f.read(len(SNAPSHOT_HEADER)) != SNAPSHOT_HEADER:
+            # The old snapshot is one json document, which is parsed as a whole.
+            f.seek(0)
+            yield from json.load(f).items()
+            return
+        for line in f:
+            course_id, course = json.loads(line)
+            # The lines are parsed one by one, so the same student id is shared between the courses by interning.
+            for key in ('Registration', 'Waitlist'):
+                if key in course:
+                    course[key] = {sys.intern(student_id): record
+                                   for student_id, record in course[key].items()}
+            yield course_id, course
+
+
+def snapshot_lines(courses):
+    """Encode the courses into the lines of the snapshot, one course at a time.
+
+    Args:
+        courses (dict or iterable): The courses dict, or the (course_id, course) pairs generated one at a time.
+
+    Yields:
+        line (str): The header, then the line of each course.
+    """
+    yield SNAPSHOT_HEADER
+    for course_id, course in (courses.items() if isinstance(courses, dict) else courses):
+        yield _snapshot_encoder.encode([course_id, course]) + '\n'
+
+
+def load_snapshot(snapshot_file):
+    """Load the courses dict from the snapshot file.
+
+    Args:
+        snapshot_file (str): The path of the snapshot file.
+
+    Returns:
+        courses (dict): The courses dict, empty if the snapshot doesn't exist.
+    """
+    return dict(iter_snapshot(snapshot_file))
+
+
+def write_snapshot(snapshot_file, courses):
+    """Write the courses dict into the snapshot file atomically.
+
+    Args:
+        snapshot_file (str): The path of the snapshot file.
+        courses (dict or iterable): The courses dict, or the (course_id, course) pairs generated one at a time.
+    """
+    # Write to a temporary file first, so that a crash never leaves a half written snapshot.
+    temp_file = snapshot_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        f.writelines(snapshot_lines(courses))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, snapshot_file)
+
+
+class Journal(object):
+    """The append-only journal of the mutations on the CourseManager.
+
+    The journal is split into segment files. The segment being written is fsynced every batch_size entries
+    (or when flush is called), and the closed segments are compacted into the snapshot in a background thread.
+    """
+
+    def __init__(self, directory='./Journal/', snapshot_file='courses.json', batch_size=64, compact_threshold=10000):
+        """The initialization for the object.
+
+        Args:
+            directory (str): The directory of the segment files.
+            snapshot_file (str): The snapshot that the journal is compacted into.
+            batch_size (int): The number of entries written between two fsync calls.
+            compact_threshold (int): The number of entries after which a background compaction starts.
+        """
+        self.directory = directory
+        self.snapshot_file = snapshot_file
+        self.batch_size = batch_size
+        self.compact_threshold = compact_threshold
+
+        # The lock for the current segment, and the lock for the snapshot file.
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._compaction = None
+
+        self._file = None
+        self._pending = 0
+        self.entries_since_compaction = 0
+
+        if os.path.exists(self.directory):
+            # The directory exists.
+            pass
+        else:
+            # The directory doesn't exist.
+            os.mkdir(self.directory)
+
+        # Never append to an old segment, its last line may be torn by a crash.
+        segments = self._segments()
+        self._sequence = self._segment_sequence(
+            segments[-1]) if len(segments) > 0 else 0
+        self._open_segment()
+
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, 'journal-{sequence:06d}.log'.format(sequence=sequence))
+
+    @staticmethod
+    def _segment_sequence(path):
+        return int(os.path.basename(path)[len('journal-'):-len('.log')])
+
+    def _segments(self):
+        """Get the paths of the segment files, in the order they were written.
+        """
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith('journal-') and name.endswith('.log')]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def _open_segment(self):
+        self._sequence += 1
+        self._file = open(self._segment_path(self._sequence), 'a')
+
+    def _rotate(self):
+        """Close the current segment and start a new one.
+
+        Returns:
+            segments (list): The paths of all the closed segments.
+        """
+        with self._lock:
+            return self._rotate_locked()
+
+    def _rotate_locked(self):
+        """Close the current segment and start a new one, with the lock held.
+
+        Returns:
+            segments (list): The paths of all the closed segments.
+        """
+        self._flush()
+        self._file.close()
+        current = self._sequence
+        self._open_segment()
+        return [path for path in self._segments() if self._segment_sequence(path) <= current]
+
+    def replay(self, courses):
+        """Replay all the segments on the courses dict.
+
+        Args:
+            courses (dict): The courses dict loaded from the snapshot.
+
+        Returns:
+            count (int): The number of entries replayed.
+        """
+        count = 0
+        for path in self._segments():
+            count += self._replay_segment(path, courses)
+        self.entries_since_compaction += count
+        return count
+
+    @staticmethod
+    def _replay_segment(path, courses):
+        count = 0
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn line at the end of the segment, the entry was never acknowledged.
+                    emit('journal_entry_skipped', "Skip a broken journal entry in {path}.".format(path=path),
+                         level='warning', path=path)
+                    continue
+                apply_entry(courses, entry)
+                count += 1
+        return count
+
+    def append(self, entry, sync=True):
+        """Append an entry to the journal.
+
+        Args:
+            entry (dict): The journal entry.
+            sync (bool): Whether the entries are fsynced once batch_size of them are pending, False inside a batch,
+                which calls flush at its end. The compaction also waits for the flush of the batch, so a long batch
+                doesn't rewrite the snapshot again and again.
+        """
+        with self._lock:
+            self._file.write(_encoder.encode(entry) + '\n')
+            self._pending += 1
+            self.entries_since_compaction += 1
+            if sync and self._pending >= self.batch_size:
+                self._flush()
+            if sync and self.entries_since_compaction >= self.compact_threshold:
+                self._start_compaction()
+
+    def _flush(self):
+        if self._pending > 0:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def flush(self):
+        """Fsync the entries written since the last batch, and start the compaction the batch held back.
+        """
+        with self._lock:
+            self._flush()
+            if self.entries_since_compaction >= self.compact_threshold:
+                self._start_compaction()
+
+    def compact(self):
+        """Start compacting the closed segments into the snapshot in a background thread.
+        """
+        with self._lock:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        """Start the compaction with the lock held, so two writers crossing the threshold together start only one.
+        """
+        if self._compaction is not None and self._compaction.is_alive():
+            # A compaction is running, the next threshold will start another one.
+            return
+        self.entries_since_compaction = 0
+        segments = self._rotate_locked()
+        self._compaction = threading.Thread(
+            target=self._compact, args=(segments,), daemon=True)
+        self._compaction.start()
+
+    def _compact(self, segments):
+        with self._snapshot_lock:
+            # A checkpoint in between may have written the snapshot and dropped some of the segments already.
+            segments = [path for path in segments if os.path.exists(path)]
+            courses = load_snapshot(self.snapshot_file)
+            for path in segments:
+                self._replay_segment(path, courses)
+            write_snapshot(self.snapshot_file, courses)
+            for path in segments:
+                os.remove(path)
+
+    def checkpoint(self, courses):
+        """Write the whole courses dict as the snapshot and drop the segments it covers.
+
+        Args:
+            courses (dict): The current courses dict.
+        """
+        self.wait()
+        with self._snapshot_lock:
+            segments = self._rotate()
+            write_snapshot(self.snapshot_file, courses)
+            for path in segments:
+                os.remove(path)
+            self.entries_since_compaction = 0
+
+    def wait(self):
+        """Wait for the running compaction to finish.
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def close(self):
+        """Flush the journal and wait for the background compaction.
+        """
+        self.flush()
+        self.wait()
+        with self._lock:
+            self._file.close()
+            # Don't leave an empty segment behind for every session.
+            if os.path.getsize(self._file.name) == 0:
+                os.remove(self._file.name)
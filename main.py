@@ -2,12 +2,23 @@
 # -*- coding: utf-8 -*-
 
 from assistant_func import *
+from importer import import_grades, read_rows
+from storage import open_storage
 from time import sleep
 
+import sys
+import contextlib
+
 courses_dict = {}
 students_dict = {}
 
-manager = CourseManager()
+# COURSE_INSTRUMENT=1 collects the call counts, the latencies and the sizes of the session, reported at the exit,
+# into the json file COURSE_INSTRUMENT_REPORT if it is given. COURSE_PROFILE=<file> captures the session with cProfile.
+if os.environ.get('COURSE_INSTRUMENT'):
+    instrumentation.enable()
+
+# The storage backend is selected with the environment variable COURSE_STORAGE ('json' or 'sqlite').
+manager = CourseManager(open_storage(os.environ.get('COURSE_STORAGE', 'json')))
 
 
 def student_registration():
@@ -45,15 +56,13 @@ def student_registration():
 
 def initialize():
     """Initialize the data.
-    """
 
-    for file_name in os.listdir('./Courses/'):
-        course = init_course('./Courses/' + file_name)
-        courses_dict[course.course_id] = course
+    Only the ids are listed here, a course or a student is loaded the first time it is used.
+    """
+    global courses_dict, students_dict
 
-    for file_name in os.listdir('./Students/'):
-        student = init_student('./Students/' + file_name)
-        students_dict[student.student_id] = student
+    courses_dict = lazy_courses(manager.storage)
+    students_dict = lazy_students(manager.storage)
 
 
 def exit_system():
@@ -63,12 +72,27 @@ def exit_system():
     # Back the data of the current status into external files.
     print("$ Backing up the data...")
 
-    for course in courses_dict.values():
-        course.export_object()
+    # Only the courses and the students changed in this session are exported.
+    courses, students = export_changed(manager.storage)
+
+    # The selected courses are built from the course manager, only for the students whose registrations changed.
+    selected_courses = manager.save_selected_courses()
 
-    for student in students_dict.values():
-        student.save_selected_courses(manager)
-        student.export_object()
+    print("$ Exported {courses} course(s), {students} student(s) and {selected} selected courses file(s).".format(
+        courses=courses, students=students, selected=selected_courses))
+    print("$ Skipped {courses} course(s), {students} student(s) and {selected} selected courses file(s) unchanged.".format(
+        courses=max(len(courses_dict) - courses, 0), students=max(len(students_dict) - students, 0),
+        selected=max(len(students_dict) - selected_courses, 0)))
+
+    # The course manager is already persisted by its journal, we only make the last batch durable.
+    manager.close()
+
+    if instrumentation.ENABLED:
+        if os.environ.get('COURSE_INSTRUMENT_REPORT'):
+            instrumentation.dump_report(
+                os.environ['COURSE_INSTRUMENT_REPORT'])
+        else:
+            print(instrumentation.format_report(), file=sys.stderr)
 
     print("$ Data backed up.")
 
@@ -155,9 +179,9 @@ def control_sequence(choice):
         # Course management.
 
         mode = input(
-            "$ Course management mode(1 for add, 2 for remove, 3 is for score modification, and Q\q for exit):")
+            "$ Course management mode(1 for add, 2 for remove, 3 is for score modification, 4 is for a grade sheet, and Q\q for exit):")
 
-        while mode not in ['1', '2', '3', 'q', 'Q']:
+        while mode not in ['1', '2', '3', '4', 'q', 'Q']:
             print("$ Please give a valid mode.")
             mode = input(
                 "$ Please give your mode(1 for add, 2 for remove, Q\q for exit): ")
@@ -216,6 +240,20 @@ def control_sequence(choice):
 
             manager.set_course_grade(course_id, student_id, float(score))
 
+        elif mode == '4':
+            # Import the grades of a whole grade sheet at once.
+            file_name = input(
+                "$ Please give the .csv or .jsonl grade sheet(Q\q for exit): ")
+            while not os.path.isfile(file_name):
+                if file_name == 'q' or file_name == 'Q':
+                    return
+                print("$ Please give a valid file.")
+                file_name = input(
+                    "$ Please give the .csv or .jsonl grade sheet(Q\q for exit): ")
+            report = import_grades(manager, read_rows(file_name))
+            print("$ {graded} grade(s) set from {rows} row(s), {speed:.0f} rows/s.".format(
+                graded=report['Statuses']['graded'], rows=report['Rows'], speed=report['RowsPerSecond'] or 0))
+
         else:
             print("$ Exiting to the main menu...")
             return
@@ -255,9 +293,14 @@ def control_sequence(choice):
 
 def main():
     initialize()
-    while True:
-        choice = menu()
-        control_sequence(choice)
+    profile_file = os.environ.get('COURSE_PROFILE')
+    # The capture is written when the system exits from the menu.
+    with instrumentation.profile(profile_file) if profile_file else contextlib.nullcontext():
+        while True:
+            choice = menu()
+            control_sequence(choice)
+            # Make the changes of this action durable.
+            manager.flush()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+
+from timetable import MINUTES_PER_DAY, WEEKDAYS, busy_intervals, format_minutes
+
+
+class RoomPlanner(object):
+    """The occupancy of the rooms in the week, from the locations and the compiled times of the courses.
+
+    The lessons of each room are kept sorted by the start, in the minutes since the start of the week,
+    and updated course by course when a course is added or removed.
+    """
+
+    def __init__(self, day_start=8 * 60, day_end=22 * 60, weekdays=WEEKDAYS[:5]):
+        """The initialization for the object.
+
+        Args:
+            day_start (int): The minutes since midnight the rooms open, for the utilization.
+            day_end (int): The minutes since midnight the rooms close.
+            weekdays (list): The weekdays the rooms are open, Monday to Friday by default.
+        """
+        # {'Location': ([Start], [(Start, End, CourseId)])}
+        self.rooms = {}
+        # The longest lesson of each room, so a search only looks back that far: {'Location': Minutes}
+        self.longest = {}
+        # The room and the compiled time of each course: {'CourseId': ('Location', array('H'))}
+        self.courses = {}
+        # The minutes each room is booked, counted on demand and dropped when the room changes: {'Location': Minutes}
+        self.booked = {}
+        # The opening hours of the week, as the (start, end) tuples of the minutes since the start of the week.
+        self.open_hours = [(WEEKDAYS.index(weekday) * MINUTES_PER_DAY + day_start, WEEKDAYS.index(weekday) * MINUTES_PER_DAY + day_end)
+                           for weekday in weekdays]
+
+    def add(self, course_id, location, week_minutes):
+        """Book the room of the course for its lessons.
+
+        Args:
+            course_id (str): The id of the course.
+            location (str): The location of the course.
+            week_minutes (array): The compiled time of the course, from compile_time.
+        """
+        if course_id in self.courses:
+            self.remove(course_id)
+        if location not in self.rooms:
+            self.rooms[location] = ([], [])
+            self.longest[location] = 0
+        starts, lessons = self.rooms[location]
+        self.booked.pop(location, None)
+        for i in range(0, len(week_minutes), 2):
+            start, end = week_minutes[i], week_minutes[i + 1]
+            j = bisect.bisect_right(starts, start)
+            starts.insert(j, start)
+            lessons.insert(j, (start, end, course_id))
+            self.longest[location] = max(self.longest[location], end - start)
+        self.courses[course_id] = (location, week_minutes)
+
+    def remove(self, course_id):
+        """Release the room of the course.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        booking = self.courses.pop(course_id, None)
+        if booking is None:
+            return
+        location, week_minutes = booking
+        starts, lessons = self.rooms[location]
+        self.booked.pop(location, None)
+        for i in range(0, len(week_minutes), 2):
+            lesson = (week_minutes[i], week_minutes[i + 1], course_id)
+            j = bisect.bisect_left(starts, lesson[0])
+            while lessons[j] != lesson:
+                j += 1
+            del starts[j]
+            del lessons[j]
+        if len(starts) == 0:
+            del self.rooms[location]
+            del self.longest[location]
+
+    def conflicts(self, location, week_minutes, ignore=None):
+        """Find the courses booked in the room at the same time as the lessons given.
+
+        Args:
+            location (str): The location.
+            week_minutes (array): The compiled time, from compile_time.
+            ignore (str): The id of the course that is not checked, like the course itself.
+
+        Returns:
+            course_ids (list): The ids of the courses in the way, in the order of their lessons.
+        """
+        if location not in self.rooms:
+            return []
+        starts, lessons = self.rooms[location]
+        longest = self.longest[location]
+        found = []
+        for i in range(0, len(week_minutes), 2):
+            start, end = week_minutes[i], week_minutes[i + 1]
+            # Only the lessons starting before the end and not longer ago than the longest lesson may overlap.
+            j = bisect.bisect_left(starts, end) - 1
+            while j >= 0 and starts[j] > start - longest:
+                other_end, course_id = lessons[j][1], lessons[j][2]
+                if other_end > start and course_id != ignore and course_id not in found:
+                    found.append(course_id)
+                j -= 1
+        return found
+
+    def double_bookings(self):
+        """Find every pair of the courses booked into one room at the same time, with one sweep over each room.
+
+        Returns:
+            double_bookings (list): The (location, course_id, course_id, weekday, start, end) tuples, with the times
+                of the overlap like ('Room 101', 'CS-001', 'SM-001', 'Monday', '8:30', '9:30').
+        """
+        double_bookings = []
+        for location, (starts, lessons) in sorted(self.rooms.items()):
+            # The lessons that are still running at the current start.
+            active = []
+            for start, end, course_id in lessons:
+                active = [lesson for lesson in active if lesson[0] > start]
+                for active_end, active_course_id in active:
+                    if active_course_id != course_id:
+                        day = start // MINUTES_PER_DAY * MINUTES_PER_DAY
+                        double_bookings.append((location, active_course_id, course_id, WEEKDAYS[start // MINUTES_PER_DAY],
+                                                format_minutes(start - day), format_minutes(min(end, active_end) - day)))
+                active.append((end, course_id))
+        return double_bookings
+
+    def free_rooms(self, week_minutes, locations=None):
+        """Find the rooms free for all the lessons given, the least used first.
+
+        Args:
+            week_minutes (array): The compiled time of the new section, from compile_time.
+            locations (iterable): The rooms to consider, all the rooms known by default.
+
+        Returns:
+            locations (list): The free rooms.
+        """
+        candidates = self.rooms.keys() if locations is None else locations
+        free = [location for location in candidates
+                if not self.conflicts(location, week_minutes)]
+        booked = {location: self.booked_minutes(location) for location in free}
+        return sorted(free, key=lambda location: (booked[location], location))
+
+    def booked_minutes(self, location):
+        """Count the minutes the room is booked within the opening hours, the double bookings counted once.
+
+        Args:
+            location (str): The location.
+
+        Returns:
+            minutes (int): The minutes booked in the week.
+        """
+        if location not in self.rooms:
+            return 0
+        minutes = self.booked.get(location)
+        if minutes is None:
+            minutes = 0
+            for start, end in busy_intervals([lesson[:2] for lesson in self.rooms[location][1]]):
+                for open_start, open_end in self.open_hours:
+                    minutes += max(0, min(end, open_end) - max(start, open_start))
+            self.booked[location] = minutes
+        return minutes
+
+    def utilization(self):
+        """Report how much of the opening hours each room is booked.
+
+        Returns:
+            utilization (dict): {'Location': {'Courses': int, 'Minutes': int, 'Utilization': float}}, the utilization
+                is the part of the opening hours booked, from 0 to 1.
+        """
+        open_minutes = sum(end - start for start, end in self.open_hours)
+        report = {}
+        for location, (starts, lessons) in sorted(self.rooms.items()):
+            minutes = self.booked_minutes(location)
+            report[location] = {'Courses': len({lesson[2] for lesson in lessons}), 'Minutes': minutes,
+                                'Utilization': minutes / open_minutes if open_minutes else 0.0}
+        return report
+
+    def __len__(self):
+        return len(self.rooms)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+
+# The grade of a registration before the course is graded.
+NO_GRADE = -1
+
+
+class _Record(object):
+    """The read-only dict interface of the compact records, so they are used like the dicts they replace.
+
+    The subclasses list their keys in KEYS, and turn a key into the value in __getitem__.
+    """
+    __slots__ = ()
+    KEYS = ()
+
+    def keys(self):
+        return list(self.KEYS)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        if key in self.KEYS:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in self.KEYS]
+
+    def values(self):
+        return [self[key] for key in self.KEYS]
+
+    def to_dict(self):
+        """Get the record as the dict saved in courses.json.
+        """
+        return {key: self[key] for key in self.KEYS}
+
+    def __eq__(self, other):
+        if isinstance(other, (_Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class StudentProfile(_Record):
+    """The information of the student copied into the registrations, kept once and shared by all of them.
+
+    It is also the record of the student on a waitlist.
+    """
+    __slots__ = ('name', 'department', 'gender')
+    KEYS = ('Name', 'Department', 'Gender')
+
+    def __init__(self, name, department, gender):
+        """The initialization for the object.
+
+        Args:
+            name (str): The name of the student.
+            department (str): The department of the student.
+            gender (str): The gender of the student.
+        """
+        self.name = name
+        # There are only a few departments and genders, so one string of each is kept.
+        self.department = sys.intern(department)
+        self.gender = sys.intern(gender)
+
+    def __getitem__(self, key):
+        if key == 'Name':
+            return self.name
+        elif key == 'Department':
+            return self.department
+        elif key == 'Gender':
+            return self.gender
+        raise KeyError(key)
+
+    def matches(self, record):
+        """Check whether the record holds the same information.
+
+        Args:
+            record (dict): The record, with the keys 'Name', 'Department' and 'Gender'.
+        """
+        return self.name == record['Name'] and self.department == record['Department'] and self.gender == record['Gender']
+
+
+class RegistrationRecord(_Record):
+    """The registration of the student in one course: the grade, and the profile of the student.
+    """
+    __slots__ = ('profile', 'grade')
+    KEYS = ('Name', 'Grade', 'Department', 'Gender')
+
+    def __init__(self, profile, grade):
+        """The initialization for the object.
+
+        Args:
+            profile (StudentProfile): The shared profile of the student.
+            grade (float): The grade, -1 before the course is graded.
+        """
+        self.profile = profile
+        self.grade = grade
+
+    def __getitem__(self, key):
+        if key == 'Grade':
+            return self.grade
+        return self.profile[key]
+
+    def copy(self):
+        """Copy the registration, the profile is shared.
+        """
+        return RegistrationRecord(self.profile, self.grade)
+
+    def __setitem__(self, key, value):
+        if key == 'Grade':
+            self.grade = value
+        elif key in self.KEYS:
+            # The profile is shared, so this registration gets its own one.
+            information = self.profile.to_dict()
+            information[key] = value
+            self.profile = StudentProfile(
+                information['Name'], information['Department'], information['Gender'])
+        else:
+            raise KeyError(key)
+
+
+def compact_record(profiles, student_id, record):
+    """Turn the record dict of a registration or a waitlist into the compact record.
+
+    Args:
+        profiles (dict): The shared profiles by the student id, updated in place.
+        student_id (str): The id of the student.
+        record (dict): The record, with the key 'Grade' for a registration.
+
+    Returns:
+        record (RegistrationRecord or StudentProfile): The compact record.
+    """
+    profile = profiles.get(student_id)
+    if profile is None or not profile.matches(record):
+        profile = StudentProfile(
+            record['Name'], record['Department'], record['Gender'])
+        profiles[student_id] = profile
+    if 'Grade' in record:
+        return RegistrationRecord(profile, record['Grade'])
+    return profile
+
+
+def compact_courses(courses, profiles):
+    """Turn all the records of the courses dict into the compact records, in place.
+
+    Args:
+        courses (dict): The courses dict in the format of the CourseManager.
+        profiles (dict): The shared profiles by the student id, updated in place.
+    """
+    for course in courses.values():
+        for key in ('Registration', 'Waitlist'):
+            records = course.get(key)
+            if records is None:
+                continue
+            for student_id, record in records.items():
+                records[student_id] = compact_record(
+                    profiles, student_id, record)
+
+
+def record_default(value):
+    """The default function of json.dump, which writes the compact records as the dicts they replace.
+
+    Args:
+        value (object): The value json can't serialize by itself.
+    """
+    if isinstance(value, _Record):
+        return value.to_dict()
+    raise TypeError("Object of type {name} is not JSON serializable.".format(
+        name=type(value).__name__))
+
+
+def build_view(registrations):
+    """Build the view of one student from the registrations: the selected courses, the schedule, the grades and the GPA.
+
+    The ungraded registrations (the grade -1) count in the credits, but not in the GPA.
+
+    Args:
+        registrations (iterable): The (course_id, information, grade) tuples of the student, in the order shown.
+
+    Returns:
+        view (dict): The view with the keys 'SelectedCourses', 'Schedule', 'Grades', 'GPA' and 'Credits',
+            the GPA is None if no course of the student is graded yet.
+    """
+    selected_courses = {}
+    schedule = []
+    grades = []
+    total_score = 0
+    graded_credits = 0
+    total_credits = 0
+    for course_id, information, grade in registrations:
+        selected_courses[course_id] = {
+            'Information': information, 'Grade': grade}
+        schedule.append({'CourseId': course_id, 'Name': information['Name'],
+                         'Time': list(information['Time'].values()), 'Location': information['Location']})
+        grades.append({'CourseId': course_id, 'Name': information['Name'],
+                       'Credits': information['Credits'], 'Grade': grade})
+        if grade != NO_GRADE:
+            total_score += grade * information['Credits']
+            graded_credits += information['Credits']
+        total_credits += information['Credits']
+    return {'SelectedCourses': selected_courses, 'Schedule': schedule, 'Grades': grades,
+            'GPA': None if graded_credits == 0 else total_score / graded_credits, 'Credits': total_credits}
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+from records import build_view
+
+
+class LazyRegistry(object):
+    """The dict-like registry that lists the ids cheaply and only loads an object when it is first accessed.
+
+    At most capacity loaded objects are kept, the least recently used one is dropped first.
+    The objects put into the registry with registry[key] = value are new, so they are pinned and never dropped.
+    """
+
+    def __init__(self, list_ids, load, capacity=1024):
+        """The initialization for the object.
+
+        Args:
+            list_ids (function): The function that returns the ids, like JsonStorage.course_ids.
+            load (function): The function that loads the object with the id given.
+            capacity (int): The maximum number of loaded objects kept.
+        """
+        self.load = load
+        self.capacity = capacity
+
+        # The ids are kept in a dict, which is used as an ordered set.
+        self._ids = dict.fromkeys(list_ids())
+        self._loaded = OrderedDict()
+        self._pinned = {}
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def keys(self):
+        """Get the ids, without loading any object.
+        """
+        return self._ids.keys()
+
+    def __getitem__(self, key):
+        if key in self._pinned:
+            return self._pinned[key]
+        if key in self._loaded:
+            # Mark the object as the most recently used one.
+            self._loaded.move_to_end(key)
+            return self._loaded[key]
+        if key not in self._ids:
+            raise KeyError(key)
+
+        value = self.load(key)
+        self._loaded[key] = value
+        if len(self._loaded) > self.capacity:
+            self._loaded.popitem(last=False)
+        return value
+
+    def __setitem__(self, key, value):
+        self._ids[key] = None
+        self._loaded.pop(key, None)
+        self._pinned[key] = value
+
+    def get(self, key, default=None):
+        if key in self._ids:
+            return self[key]
+        return default
+
+    def values(self):
+        """Iterate over all the objects, loading the ones not loaded yet.
+        """
+        for key in self._ids:
+            yield self[key]
+
+    def items(self):
+        """Iterate over all the ids and objects, loading the ones not loaded yet.
+        """
+        for key in self._ids:
+            yield key, self[key]
+
+    def loaded_values(self):
+        """Get the objects in memory, i.e. the pinned ones and the loaded ones still kept.
+        """
+        return list(self._pinned.values()) + list(self._loaded.values())
+
+
+def copy_course(course):
+    """Copy the course record before its first change after a snapshot, the parts a change may touch are copied.
+
+    Args:
+        course (dict): The course record, with 'Information', 'Registration' and maybe 'Waitlist'.
+
+    Returns:
+        course (dict): The copy, which shares only the time and the student profiles, which are never changed in place.
+    """
+    copied = dict(course)
+    copied['Information'] = dict(course['Information'])
+    # The grade is changed in place, so each registration record is copied too.
+    copied['Registration'] = {student_id: record.copy()
+                              for student_id, record in course['Registration'].items()}
+    if 'Waitlist' in course:
+        copied['Waitlist'] = OrderedDict(course['Waitlist'])
+    return copied
+
+
+class RegistrySnapshot(object):
+    """The read-only dict-like view of the courses at one moment, for the long reports during the registration.
+
+    Taking a snapshot only bumps the version of the course manager. A course record a snapshot may see is never
+    changed in place: the first change after the snapshot copies the record and keeps the old one in the history,
+    {'CourseId': [(Epoch, Record)]}, where the record was the current one for the snapshots older than the epoch,
+    and None means the course did not exist.
+    """
+
+    def __init__(self, manager, version, courses, history, count):
+        """The initialization for the object.
+
+        Args:
+            manager (CourseManager): The course manager, which keeps the history until the snapshot is released.
+            version (int): The version of the snapshot.
+            courses (dict): The courses dict of the course manager.
+            history (dict): The history of the course records of the course manager.
+            count (int): The number of the courses at the moment.
+        """
+        self.manager = manager
+        self.version = version
+        self._courses = courses
+        self._history = history
+        self._count = count
+        # The ids of the courses, listed on the first read and kept, so every read sees them in the same order.
+        self._keys = None
+        self.released = False
+
+    def _resolve(self, key):
+        """Get the record of the course at the moment of the snapshot, None if the course did not exist.
+        """
+        # The current record is read before the history: a writer puts the old record into the history
+        # before it replaces the record, so a record read here that is newer than the snapshot is found there.
+        record = self._courses.get(key)
+        for epoch, old_record in self._history.get(key, ()):
+            if epoch > self.version:
+                return old_record
+        return record
+
+    def __contains__(self, key):
+        return self._resolve(key) is not None
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        record = self._resolve(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def get(self, key, default=None):
+        record = self._resolve(key)
+        return default if record is None else record
+
+    def keys(self):
+        """Get the ids of the courses at the moment of the snapshot, the courses removed since come last.
+
+        The ids are listed once, so they are in the same order for every read of the snapshot.
+        """
+        if self._keys is not None:
+            return self._keys
+        # Adding or removing a course takes all the locks, so the ids are listed under one of them.
+        with self.manager._course_locks[0]:
+            course_ids = list(self._courses)
+            # The other writers may add into the history meanwhile, so its ids are copied at once first.
+            removed_ids = [course_id for course_id in list(self._history)
+                           if course_id not in self._courses]
+        self._keys = [course_id for course_id in course_ids + removed_ids
+                      if self._resolve(course_id) is not None]
+        return self._keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        """Iterate over the course records at the moment of the snapshot.
+        """
+        for key, record in self.items():
+            yield record
+
+    def items(self):
+        """Iterate over the ids and the records of the courses at the moment of the snapshot.
+        """
+        for key in self.keys():
+            record = self._resolve(key)
+            if record is not None:
+                yield key, record
+
+    def transcripts(self, student_ids=None):
+        """Build the views of the students with one pass over the courses.
+
+        Args:
+            student_ids (list): The ids of the students, all the registrants by default.
+
+        Returns:
+            transcripts (dict): {'StudentId': view}, the views from build_view like CourseManager.student_view,
+                with the courses in the order of the snapshot.
+        """
+        registrations = {} if student_ids is None else {
+            student_id: [] for student_id in student_ids}
+        for course_id, course in self.items():
+            information = course['Information']
+            for student_id, record in course['Registration'].items():
+                rows = registrations.get(student_id)
+                if rows is None:
+                    if student_ids is not None:
+                        continue
+                    rows = registrations[student_id] = []
+                rows.append((course_id, information, record['Grade']))
+        return {student_id: build_view(rows) for student_id, rows in registrations.items()}
+
+    def release(self):
+        """Let the course manager drop the old records kept for the snapshot.
+        """
+        if not self.released:
+            self.released = True
+            self.manager._release_snapshot(self.version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import asyncio
+import argparse
+from urllib.parse import unquote, parse_qs
+
+from assistant_func import lazy_students
+from basic_class import CourseManager
+from storage import open_storage
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """The error that is sent back to the client with the status given.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RegistrationService(object):
+    """The local HTTP/JSON service of the CourseManager for many concurrent clients.
+
+    The reads are answered directly on the event loop, so they run concurrently with everything else.
+    The writes are applied one at a time under a lock, then made durable with a flush in a worker thread,
+    where the concurrent writes share one flush (group commit).
+
+    GET  /students/<student_id>/schedule
+    GET  /students/<student_id>/grades
+    GET  /students/<student_id>/gpa
+    GET  /courses/<course_id>
+    GET  /courses?department=...&weekday=...&start=...&end=...&location=...&location_prefix=...&credits=...
+    POST /register  {"student_id": ..., "course_id": ...}
+    POST /drop      {"student_id": ..., "course_id": ...}
+    POST /grade     {"student_id": ..., "course_id": ..., "grade": ...}
+    POST /batch     {"requests": [[student_id, course_id, action], ...]}
+    """
+
+    def __init__(self, manager, students):
+        """The initialization for the object.
+
+        Args:
+            manager (CourseManager): The course manager.
+            students (dict): The Student objects by the student id, like lazy_students.
+        """
+        self.manager = manager
+        self.students = students
+        self._write_lock = asyncio.Lock()
+        self._flush_task = None
+
+    async def handle_connection(self, reader, writer):
+        """Serve the requests of one connection, which is kept alive until the client closes it.
+
+        Args:
+            reader (asyncio.StreamReader): The reader of the connection.
+            writer (asyncio.StreamWriter): The writer of the connection.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode(
+                    'latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode('latin-1').split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self.dispatch(method, target, body)
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                writer.write('HTTP/1.1 {status} {text}\r\nContent-Type: application/json\r\nContent-Length: {length}\r\nConnection: {connection}\r\n\r\n'.format(
+                    status=status, text=STATUS_TEXT[status], length=len(data),
+                    connection='keep-alive' if keep_alive else 'close').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # The client went away or sent something that is not HTTP.
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        """Route the request to the handler.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The path of the request.
+            body (bytes): The body of the request.
+
+        Returns:
+            status (int): The HTTP status.
+            payload (dict): The JSON payload of the response.
+        """
+        parts = [unquote(part) for part in target.split('?')[0].split('/') if part]
+        try:
+            if method == 'GET':
+                if len(parts) == 3 and parts[0] == 'students':
+                    return 200, self.read_student(parts[1], parts[2])
+                if len(parts) == 2 and parts[0] == 'courses':
+                    return 200, self.read_course(parts[1])
+                if len(parts) == 1 and parts[0] == 'courses':
+                    return 200, self.search_courses(parse_qs(target.partition('?')[2]))
+                raise HTTPError(404, "Unknown path.")
+            elif method == 'POST':
+                if len(parts) != 1 or parts[0] not in ('register', 'drop', 'grade', 'batch'):
+                    raise HTTPError(404, "Unknown path.")
+                try:
+                    request = json.loads(body or b'{}')
+                except ValueError:
+                    raise HTTPError(400, "The body is not valid JSON.")
+                return 200, await self.write(parts[0], request)
+            raise HTTPError(405, "Only GET and POST are supported.")
+        except HTTPError as e:
+            return e.status, {'Error': e.message}
+        except KeyError as e:
+            return 400, {'Error': "Missing field {field}.".format(field=e)}
+        except (ValueError, TypeError) as e:
+            return 400, {'Error': "Invalid field: {error}".format(error=e)}
+
+    def read_student(self, student_id, view):
+        """Answer the read of the schedule, the grades or the GPA of the student.
+
+        Args:
+            student_id (str): The id of the student.
+            view (str): 'schedule', 'grades' or 'gpa'.
+        """
+        if student_id not in self.students:
+            raise HTTPError(404, "The student is not the registrant in the system.")
+        # The views are memoized by the course manager until the registrations of the student change.
+        student_view = self.manager.student_view(student_id)
+        if view == 'schedule':
+            return {'StudentId': student_id, 'Schedule': student_view['Schedule']}
+        elif view == 'grades':
+            return {'StudentId': student_id, 'Grades': student_view['Grades']}
+        elif view == 'gpa':
+            return {'StudentId': student_id, 'GPA': student_view['GPA'], 'Credits': student_view['Credits']}
+        raise HTTPError(404, "Unknown view {view}.".format(view=view))
+
+    def read_course(self, course_id):
+        """Answer the read of the course with its seats.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        if course_id not in self.manager.courses:
+            raise HTTPError(404, "The course is not in the courses list.")
+        seats = self.manager.available_seats(course_id)
+        return {'CourseId': course_id, 'Information': self.manager.courses[course_id]['Information'],
+                'Registrants': self.manager.enrolled[course_id],
+                'AvailableSeats': None if seats == float('inf') else seats,
+                'Waitlist': len(self.manager.courses[course_id].get('Waitlist', ()))}
+
+    def search_courses(self, query):
+        """Answer the search of the catalog, the conditions not given match any course.
+
+        Args:
+            query (dict): The parameters of the query string, from parse_qs.
+        """
+        def get(name):
+            return query[name][0] if name in query else None
+        starts_between = None
+        if 'start' in query or 'end' in query:
+            starts_between = (get('start') or '0:00', get('end') or '24:00')
+        credits = [int(value) for value in query['credits']
+                   ] if 'credits' in query else None
+        return {'CourseIds': self.manager.search_courses(get('department'), get('weekday'), starts_between,
+                                                         get('location'), get('location_prefix'), credits)}
+
+    async def write(self, action, request):
+        """Apply the write under the lock, and answer after it is durable.
+
+        Args:
+            action (str): 'register', 'drop', 'grade' or 'batch'.
+            request (dict): The JSON body of the request.
+        """
+        async with self._write_lock:
+            if action == 'register':
+                student_id = request['student_id']
+                if student_id not in self.students:
+                    raise HTTPError(404, "The student is not the registrant in the system.")
+                status, message = self.manager.register(
+                    request['course_id'], self.students[student_id].registration_information())
+                result = {'Status': status, 'Message': message}
+            elif action == 'drop':
+                status, message, promoted = self.manager.drop(
+                    request['course_id'], request['student_id'])
+                result = {'Status': status,
+                          'Message': message, 'Promoted': promoted}
+            elif action == 'grade':
+                grade = float(request['grade'])
+                if grade < 0 or grade > 100:
+                    raise HTTPError(400, "The grade must be between 0 and 100.")
+                status, message = self.manager.set_grade(
+                    request['course_id'], request['student_id'], grade)
+                result = {'Status': status, 'Message': message}
+            else:
+                result = {'Results': self.manager.process_batch(
+                    [tuple(item) for item in request['requests']], self.students)}
+        await self._commit()
+        return result
+
+    async def _commit(self):
+        """Wait until the writes so far are durable, sharing one flush between the concurrent writers.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+        await asyncio.shield(self._flush_task)
+
+    async def _flush(self):
+        # The writes arriving from now on wait for the next flush.
+        self._flush_task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.manager.flush)
+
+
+async def serve(service, host='127.0.0.1', port=8080):
+    """Run the service until it is cancelled.
+
+    Args:
+        service (RegistrationService): The service.
+        host (str): The host to listen on.
+        port (int): The port to listen on, 0 for any free port.
+    """
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print("Serving the course registration on {address}.".format(
+        address=', '.join('{}:{}'.format(*socket.getsockname()[:2]) for socket in server.sockets)))
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the course registration over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--backend', default=os.environ.get('COURSE_STORAGE', 'json'),
+                        help="The storage backend, 'json' or 'sqlite'.")
+    args = parser.parse_args()
+
+    manager = CourseManager(open_storage(args.backend))
+    service = RegistrationService(manager, lazy_students(manager.storage))
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.close()
+
+
+if __name__ == '__main__':
+    main()
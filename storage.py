@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+import concurrent.futures
+
+from instrumentation import emit
+from journal import Journal, load_snapshot
+
+
+# The directories already created in this run, so each one is checked only once.
+_directories = set()
+
+
+def ensure_directory(directory):
+    """Create the directory if it doesn't exist, once per run.
+
+    Args:
+        directory (str): The directory, like './Courses/'.
+    """
+    if directory not in _directories:
+        os.makedirs(directory, exist_ok=True)
+        _directories.add(directory)
+
+
+def write_entity_file(directory, name, data):
+    """Write the data of one entity into the json file of the directory.
+
+    Args:
+        directory (str): The directory, like './Courses/'.
+        name (str): The file name without the extension.
+        data (dict): The data to write.
+    """
+    ensure_directory(directory)
+
+    file_name = os.path.join(directory, '{name}.json'.format(name=name))
+    # Write to a temporary file, then replace the old file with it, so a crash never leaves an empty or missing file.
+    # The temporary file is unique to the thread, as the exports run in a pool.
+    temp_file = '{file_name}.{thread}.tmp'.format(
+        file_name=file_name, thread=threading.get_ident())
+    try:
+        with open(temp_file, 'w') as f:
+            json.dump(data, f)
+            # The data must be on the disk before the rename, or a power loss may still leave an empty file.
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, file_name)
+    except BaseException:
+        # Don't leave the temporary file behind, e.g. when the data can't be serialized.
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def _write_entity_files(files):
+    """Write a batch of entity files in a worker of the export pool.
+
+    Args:
+        files (list): The (directory, name, data) tuples.
+    """
+    for directory, name, data in files:
+        write_entity_file(directory, name, data)
+
+
+class JsonStorage(object):
+    """The storage with the json file tree: courses.json with its journal, ./Courses/, ./Students/ and ./Selected_Courses/.
+    """
+
+    def __init__(self, snapshot_file='courses.json', journal_directory='./Journal/', courses_directory='./Courses/',
+                 students_directory='./Students/', selected_courses_directory='./Selected_Courses/'):
+        """The initialization for the object.
+
+        Args:
+            snapshot_file (str): The snapshot of the course manager.
+            journal_directory (str): The directory of the journal segments.
+            courses_directory (str): The directory of the course files.
+            students_directory (str): The directory of the student files.
+            selected_courses_directory (str): The directory of the selected courses files.
+        """
+        self.snapshot_file = snapshot_file
+        self.courses_directory = courses_directory
+        self.students_directory = students_directory
+        self.selected_courses_directory = selected_courses_directory
+        self.journal = Journal(journal_directory, snapshot_file)
+
+    def exists(self):
+        """Check whether the course manager has been saved before.
+        """
+        return os.path.exists(self.snapshot_file)
+
+    def load_courses(self):
+        """Load the courses dict of the course manager.
+
+        Returns:
+            courses (dict): The courses dict.
+            replayed (int): The number of the changes replayed from the journal, which courses.json doesn't have yet.
+        """
+        courses = load_snapshot(self.snapshot_file)
+
+        replayed = self.journal.replay(courses)
+        if replayed > 0:
+            emit('journal_replayed', "Replayed {count} change(s) from the journal.".format(
+                count=replayed), count=replayed)
+        return courses, replayed
+
+    def record(self, entry, sync=True):
+        """Persist one mutation of the course manager.
+
+        Args:
+            entry (dict): The journal entry.
+            sync (bool): Whether the mutation may be made durable now, False inside a batch, which flushes at its end.
+        """
+        self.journal.append(entry, sync)
+
+    def save_courses(self, courses):
+        """Save the whole courses dict.
+
+        Args:
+            courses (dict): The courses dict.
+        """
+        self.journal.checkpoint(courses)
+
+    def flush(self):
+        """Make the recorded mutations durable.
+        """
+        self.journal.flush()
+
+    def close(self):
+        """Flush and release the storage.
+        """
+        self.journal.close()
+
+    @staticmethod
+    def _list_ids(directory):
+        if not os.path.exists(directory):
+            return []
+        return [file_name[:-len('.json')] for file_name in os.listdir(directory) if file_name.endswith('.json')]
+
+    @staticmethod
+    def _load_file(directory, entity_id):
+        with open(os.path.join(directory, '{entity_id}.json'.format(entity_id=entity_id)), 'r') as f:
+            return json.load(f)
+
+    def course_ids(self):
+        """Get the ids of the courses in ./Courses/.
+        """
+        return self._list_ids(self.courses_directory)
+
+    def student_ids(self):
+        """Get the ids of the students in ./Students/.
+        """
+        return self._list_ids(self.students_directory)
+
+    def load_course_data(self, course_id):
+        """Load the data of one course, in the format written by Course.export_object.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        return self._load_file(self.courses_directory, course_id)
+
+    def load_student_data(self, student_id):
+        """Load the data of one student, in the format written by Student.export_object.
+
+        Args:
+            student_id (str): The id of the student.
+        """
+        return self._load_file(self.students_directory, student_id)
+
+    def iter_course_data(self):
+        """Iterate over the data of all the courses.
+        """
+        for course_id in self.course_ids():
+            yield self.load_course_data(course_id)
+
+    def iter_student_data(self):
+        """Iterate over the data of all the students.
+        """
+        for student_id in self.student_ids():
+            yield self.load_student_data(student_id)
+
+    def export_course(self, data):
+        """Save the data of one course.
+
+        Args:
+            data (dict): The data from Course.to_dict.
+        """
+        write_entity_file(self.courses_directory, data['course_id'], data)
+
+    def export_student(self, data):
+        """Save the data of one student.
+
+        Args:
+            data (dict): The data from Student.to_dict.
+        """
+        write_entity_file(self.students_directory, data['student_id'], data)
+
+    def export_selected_courses(self, student_id, selected_courses):
+        """Save the selected courses of one student.
+
+        Args:
+            student_id (str): The id of the student.
+            selected_courses (dict): The selected courses of the student.
+        """
+        write_entity_file(self.selected_courses_directory,
+                          'selected_courses_{student_id}'.format(student_id=student_id), selected_courses)
+
+    def export_many(self, courses=(), students=(), workers=4, batch_size=64):
+        """Save the data of many courses and students, in batches written by a pool of threads.
+
+        Args:
+            courses (list): The data of the courses, from Course.to_dict.
+            students (list): The data of the students, from Student.to_dict.
+            workers (int): The number of threads.
+            batch_size (int): The number of files given to a thread at a time.
+        """
+        files = [(self.courses_directory, data['course_id'], data) for data in courses] + \
+            [(self.students_directory, data['student_id'], data)
+             for data in students]
+        if len(files) == 0:
+            return
+        # The directories are created before the pool starts.
+        ensure_directory(self.courses_directory)
+        ensure_directory(self.students_directory)
+        batches = [files[i:i + batch_size]
+                   for i in range(0, len(files), batch_size)]
+        if workers <= 1 or len(batches) == 1:
+            for batch in batches:
+                _write_entity_files(batch)
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() raises the first error of the workers, if any.
+            list(pool.map(_write_entity_files, batches))
+
+
+class SqliteStorage(object):
+    """The storage with a local SQLite database, which has the same interface as JsonStorage.
+
+    The catalog of the courses and the students are kept in the tables catalog_courses and students,
+    the course manager in the tables courses and registrations.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS catalog_courses (
+            course_id TEXT PRIMARY KEY, course_name TEXT, department TEXT, credits NUMERIC, time TEXT, location TEXT);
+        CREATE TABLE IF NOT EXISTS students (
+            student_id TEXT PRIMARY KEY, last_name TEXT, first_name TEXT, gender TEXT, birthday TEXT, department TEXT);
+        CREATE TABLE IF NOT EXISTS courses (
+            course_id TEXT PRIMARY KEY, name TEXT, department TEXT, credits NUMERIC, time TEXT, location TEXT);
+        CREATE TABLE IF NOT EXISTS registrations (
+            course_id TEXT NOT NULL, student_id TEXT NOT NULL, name TEXT, grade NUMERIC, department TEXT, gender TEXT,
+            PRIMARY KEY (course_id, student_id));
+        CREATE INDEX IF NOT EXISTS registrations_student ON registrations (student_id);
+        CREATE TABLE IF NOT EXISTS waitlists (
+            course_id TEXT NOT NULL, student_id TEXT NOT NULL, name TEXT, department TEXT, gender TEXT,
+            PRIMARY KEY (course_id, student_id));
+    '''
+
+    # The columns added after the first version of the schema, added to the old databases when opened.
+    COLUMNS = [('catalog_courses', 'capacity', 'NUMERIC'),
+               ('courses', 'capacity', 'NUMERIC'),
+               ('students', 'preferences', 'TEXT')]
+
+    def __init__(self, database='registration.db', batch_size=64):
+        """The initialization for the object.
+
+        Args:
+            database (str): The path of the database file.
+            batch_size (int): The number of mutations committed together.
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        for table, column, column_type in self.COLUMNS:
+            columns = [row[1] for row in self.connection.execute(
+                'PRAGMA table_info({table})'.format(table=table))]
+            if column not in columns:
+                self.connection.execute('ALTER TABLE {table} ADD COLUMN {column} {column_type}'.format(
+                    table=table, column=column, column_type=column_type))
+        self.connection.commit()
+
+    def exists(self):
+        """Check whether the course manager has been saved before.
+        """
+        return self.connection.execute('SELECT 1 FROM courses LIMIT 1').fetchone() is not None
+
+    def load_courses(self):
+        """Load the courses dict of the course manager.
+
+        Returns:
+            courses (dict): The courses dict.
+            replayed (int): The number of the changes not saved in the snapshot yet, always 0 for the database.
+        """
+        courses = {}
+        with self._lock:
+            for course_id, name, department, credits, time, location, capacity in self.connection.execute(
+                    'SELECT course_id, name, department, credits, time, location, capacity FROM courses ORDER BY rowid'):
+                courses[course_id] = {'Information': {'Name': name, 'Department': department, 'Credits': credits,
+                                                      'Time': json.loads(time), 'Location': location},
+                                      'Registration': {}}
+                if capacity is not None:
+                    courses[course_id]['Information']['Capacity'] = capacity
+            for course_id, student_id, name, grade, department, gender in self.connection.execute(
+                    'SELECT course_id, student_id, name, grade, department, gender FROM registrations ORDER BY rowid'):
+                courses[course_id]['Registration'][student_id] = {
+                    'Name': name, 'Grade': grade, 'Department': department, 'Gender': gender}
+            for course_id, student_id, name, department, gender in self.connection.execute(
+                    'SELECT course_id, student_id, name, department, gender FROM waitlists ORDER BY rowid'):
+                courses[course_id].setdefault('Waitlist', {})[student_id] = {
+                    'Name': name, 'Department': department, 'Gender': gender}
+        return courses, 0
+
+    def _execute_entry(self, entry):
+        op = entry['Op']
+        if op == 'add_course':
+            information = entry['Information']
+            self.connection.execute('INSERT OR REPLACE INTO courses (course_id, name, department, credits, time, location, capacity) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    (entry['CourseId'], information['Name'], information['Department'], information['Credits'],
+                                     json.dumps(information['Time']), information['Location'], information.get('Capacity')))
+            self.connection.execute(
+                'DELETE FROM registrations WHERE course_id = ?', (entry['CourseId'],))
+            self.connection.execute(
+                'DELETE FROM waitlists WHERE course_id = ?', (entry['CourseId'],))
+        elif op == 'remove_course':
+            self.connection.execute(
+                'DELETE FROM courses WHERE course_id = ?', (entry['CourseId'],))
+            self.connection.execute(
+                'DELETE FROM registrations WHERE course_id = ?', (entry['CourseId'],))
+            self.connection.execute(
+                'DELETE FROM waitlists WHERE course_id = ?', (entry['CourseId'],))
+        elif op == 'set_capacity':
+            self.connection.execute('UPDATE courses SET capacity = ? WHERE course_id = ?',
+                                    (entry['Capacity'], entry['CourseId']))
+        elif op == 'waitlist_student':
+            record = entry['Record']
+            self.connection.execute('INSERT OR REPLACE INTO waitlists VALUES (?, ?, ?, ?, ?)',
+                                    (entry['CourseId'], entry['StudentId'], record['Name'], record['Department'], record['Gender']))
+        elif op == 'unwaitlist_student':
+            self.connection.execute('DELETE FROM waitlists WHERE course_id = ? AND student_id = ?',
+                                    (entry['CourseId'], entry['StudentId']))
+        elif op == 'add_student':
+            record = entry['Record']
+            self.connection.execute('INSERT OR REPLACE INTO registrations VALUES (?, ?, ?, ?, ?, ?)',
+                                    (entry['CourseId'], entry['StudentId'], record['Name'], record['Grade'],
+                                     record['Department'], record['Gender']))
+        elif op == 'remove_student':
+            self.connection.execute('DELETE FROM registrations WHERE course_id = ? AND student_id = ?',
+                                    (entry['CourseId'], entry['StudentId']))
+        elif op == 'set_grade':
+            self.connection.execute('UPDATE registrations SET grade = ? WHERE course_id = ? AND student_id = ?',
+                                    (entry['Grade'], entry['CourseId'], entry['StudentId']))
+        elif op == 'set_grades':
+            self.connection.executemany('UPDATE registrations SET grade = ? WHERE course_id = ? AND student_id = ?',
+                                        ((grade, course_id, student_id) for course_id, student_id, grade in entry['Grades']))
+        else:
+            raise ValueError("Unknown journal operation {op}.".format(op=op))
+
+    def record(self, entry, sync=True):
+        """Persist one mutation of the course manager, committed every batch_size mutations.
+
+        Args:
+            entry (dict): The journal entry.
+            sync (bool): Whether the mutation may be committed now, False inside a batch, which flushes at its end.
+        """
+        with self._lock:
+            self._execute_entry(entry)
+            self._pending += 1
+            if sync and self._pending >= self.batch_size:
+                self.connection.commit()
+                self._pending = 0
+
+    def save_courses(self, courses):
+        """Save the whole courses dict.
+
+        Args:
+            courses (dict): The courses dict.
+        """
+        with self._lock:
+            self.connection.execute('DELETE FROM courses')
+            self.connection.execute('DELETE FROM registrations')
+            self.connection.execute('DELETE FROM waitlists')
+            self.connection.executemany('INSERT INTO courses (course_id, name, department, credits, time, location, capacity) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        ((course_id, course['Information']['Name'], course['Information']['Department'],
+                                          course['Information']['Credits'], json.dumps(
+                                              course['Information']['Time']),
+                                          course['Information']['Location'], course['Information'].get('Capacity')) for course_id, course in courses.items()))
+            self.connection.executemany('INSERT INTO registrations VALUES (?, ?, ?, ?, ?, ?)',
+                                        ((course_id, student_id, record['Name'], record['Grade'], record['Department'], record['Gender'])
+                                         for course_id, course in courses.items() for student_id, record in course['Registration'].items()))
+            self.connection.executemany('INSERT INTO waitlists VALUES (?, ?, ?, ?, ?)',
+                                        ((course_id, student_id, record['Name'], record['Department'], record['Gender'])
+                                         for course_id, course in courses.items() for student_id, record in course.get('Waitlist', {}).items()))
+            self.connection.commit()
+            self._pending = 0
+
+    def flush(self):
+        """Make the recorded mutations durable.
+        """
+        with self._lock:
+            self.connection.commit()
+            self._pending = 0
+
+    def close(self):
+        """Flush and release the storage.
+        """
+        self.flush()
+        self.connection.close()
+
+    def course_ids(self):
+        """Get the ids of the courses in the catalog.
+        """
+        with self._lock:
+            return [row[0] for row in self.connection.execute('SELECT course_id FROM catalog_courses')]
+
+    def student_ids(self):
+        """Get the ids of the students.
+        """
+        with self._lock:
+            return [row[0] for row in self.connection.execute('SELECT student_id FROM students')]
+
+    @staticmethod
+    def _course_data(row):
+        data = {'course_id': row[0], 'course_name': row[1], 'department': row[2], 'credits': row[3],
+                'time': json.loads(row[4]), 'location': row[5]}
+        if row[6] is not None:
+            data['capacity'] = row[6]
+        return data
+
+    @staticmethod
+    def _student_data(row):
+        data = {'student_id': row[0], 'last_name': row[1], 'first_name': row[2], 'gender': row[3],
+                'birthday': row[4], 'department': row[5]}
+        if row[6] is not None:
+            data['preferences'] = json.loads(row[6])
+        return data
+
+    @staticmethod
+    def _student_row(data):
+        return (data['student_id'], data['last_name'], data['first_name'], data['gender'], data['birthday'],
+                data['department'], json.dumps(data['preferences']) if 'preferences' in data else None)
+
+    def load_course_data(self, course_id):
+        """Load the data of one course, in the format written by Course.export_object.
+
+        Args:
+            course_id (str): The id of the course.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT course_id, course_name, department, credits, time, location, capacity FROM catalog_courses WHERE course_id = ?', (course_id,)).fetchone()
+        if row is None:
+            raise KeyError(course_id)
+        return self._course_data(row)
+
+    def load_student_data(self, student_id):
+        """Load the data of one student, in the format written by Student.export_object.
+
+        Args:
+            student_id (str): The id of the student.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT student_id, last_name, first_name, gender, birthday, department, preferences FROM students WHERE student_id = ?', (student_id,)).fetchone()
+        if row is None:
+            raise KeyError(student_id)
+        return self._student_data(row)
+
+    def iter_course_data(self):
+        """Iterate over the data of all the courses.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT course_id, course_name, department, credits, time, location, capacity FROM catalog_courses').fetchall()
+        for row in rows:
+            yield self._course_data(row)
+
+    def iter_student_data(self):
+        """Iterate over the data of all the students.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT student_id, last_name, first_name, gender, birthday, department, preferences FROM students').fetchall()
+        for row in rows:
+            yield self._student_data(row)
+
+    def export_course(self, data):
+        """Save the data of one course.
+
+        Args:
+            data (dict): The data from Course.to_dict.
+        """
+        with self._lock:
+            self.connection.execute('INSERT OR REPLACE INTO catalog_courses (course_id, course_name, department, credits, time, location, capacity) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    (data['course_id'], data['course_name'], data['department'], data['credits'],
+                                     json.dumps(data['time']), data['location'], data.get('capacity')))
+            self._pending += 1
+
+    def export_student(self, data):
+        """Save the data of one student.
+
+        Args:
+            data (dict): The data from Student.to_dict.
+        """
+        with self._lock:
+            self.connection.execute('INSERT OR REPLACE INTO students (student_id, last_name, first_name, gender, birthday, department, preferences) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    self._student_row(data))
+            self._pending += 1
+
+    def export_selected_courses(self, student_id, selected_courses):
+        """The selected courses are a view of the registrations table, so nothing needs to be saved.
+
+        Args:
+            student_id (str): The id of the student.
+            selected_courses (dict): The selected courses of the student.
+        """
+        pass
+
+    def export_many(self, courses=(), students=(), workers=4, batch_size=64):
+        """Save the data of many courses and students in one transaction.
+
+        Args:
+            courses (list): The data of the courses, from Course.to_dict.
+            students (list): The data of the students, from Student.to_dict.
+            workers (int): Not used, the same interface as JsonStorage.
+            batch_size (int): Not used, the same interface as JsonStorage.
+        """
+        with self._lock:
+            self.connection.executemany('INSERT OR REPLACE INTO catalog_courses (course_id, course_name, department, credits, time, location, capacity) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        ((data['course_id'], data['course_name'], data['department'], data['credits'],
+                                          json.dumps(data['time']), data['location'], data.get('capacity')) for data in courses))
+            self.connection.executemany('INSERT OR REPLACE INTO students (student_id, last_name, first_name, gender, birthday, department, preferences) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        (self._student_row(data) for data in students))
+            self.connection.commit()
+            self._pending = 0
+
+
+def open_storage(backend='json'):
+    """Open the storage with the backend given.
+
+    Args:
+        backend (str): 'json' for the json file tree, 'sqlite' for the SQLite database.
+
+    Returns:
+        storage (JsonStorage or SqliteStorage): The storage.
+    """
+    if backend == 'json':
+        return JsonStorage()
+    elif backend == 'sqlite':
+        return SqliteStorage()
+    else:
+        raise ValueError("Unknown storage backend {backend}.".format(
+            backend=backend))
+
+
+def migrate_json_to_sqlite(database='registration.db'):
+    """Copy the json file tree in the current directory into the SQLite database.
+
+    Args:
+        database (str): The path of the database file.
+    """
+    source = JsonStorage()
+    target = SqliteStorage(database)
+
+    # The catalog is committed together with the courses by save_courses.
+    for data in source.iter_course_data():
+        target.export_course(data)
+    for data in source.iter_student_data():
+        target.export_student(data)
+    courses, replayed = source.load_courses()
+    target.save_courses(courses)
+
+    print("Migrated {courses} course(s), {students} student(s) and {managed} managed course(s) into {database}.".format(
+        courses=len(source.course_ids()), students=len(source.student_ids()), managed=len(courses), database=database))
+    source.close()
+    target.close()
+
+
+if __name__ == '__main__':
+    # Usage: python storage.py migrate [database]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        migrate_json_to_sqlite(*sys.argv[2:3])
+    else:
+        print("Usage: python storage.py migrate [database]")
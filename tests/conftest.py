@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import datetime
+
+import pytest
+
+# The modules are flat in the root of the repository, like when main.py runs.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from basic_class import Course, Student  # noqa: E402
+
+import instrumentation  # noqa: E402
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in an empty directory, as the storage keeps its files relative to the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    # The directories created in the other tests don't exist here.
+    storage._directories.clear()
+    monkeypatch.setattr(instrumentation, '_level', instrumentation.LEVELS['error'])
+    return tmp_path
+
+
+def make_course(course_id, weekday='Monday', start='08:30', end='09:30', capacity=None, location=None):
+    """Make a course meeting once a week.
+
+    Args:
+        course_id (str): The course id.
+        weekday (str): The weekday of the lesson.
+        start (str): The start time of the lesson.
+        end (str): The end time of the lesson.
+        capacity (int): The number of seats, None for no limit.
+        location (str): The location, a room of its own by default.
+
+    Returns:
+        course (Course): The Course object.
+    """
+    return Course(course_id, 'Course ' + course_id, 'Math', 3,
+                  {'Lesson-1': {'Weekday': weekday, 'StartTime': start, 'EndTime': end}},
+                  location or 'Room ' + course_id, capacity)
+
+
+def make_student(student_id):
+    """Make a student.
+
+    Args:
+        student_id (str): The student id.
+
+    Returns:
+        student (Student): The Student object.
+    """
+    return Student(student_id, 'Smith', 'Bob', 'Male', datetime.datetime(2000, 4, 12), 'Math')
+
+
+def write_jsonl(path, rows):
+    """Write the rows as json lines.
+
+    Args:
+        path (Path): The file.
+        rows (list): The dicts.
+    """
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
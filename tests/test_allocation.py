@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+
+from allocation import allocate, collect_preferences
+from assistant_func import student_from_data
+from basic_class import CourseManager
+from conftest import make_course, make_student, write_jsonl
+from storage import SqliteStorage
+
+import cli
+
+
+def make_manager():
+    manager = CourseManager()
+    manager.add_courses(make_course('A', capacity=1))
+    manager.add_courses(make_course('B', weekday='Tuesday', capacity=2))
+    # C meets at the same time as A.
+    manager.add_courses(make_course('C', capacity=2))
+    return manager
+
+
+def test_allocation_respects_the_seats_and_the_clashes(workdir):
+    manager = make_manager()
+    students = {student_id: make_student(student_id) for student_id in ['S-1', 'S-2', 'S-3']}
+    preferences = {student_id: ['A', 'C', 'B'] for student_id in students}
+
+    allocations = allocate(manager, preferences, students, priorities={'S-2': 1}, seed=0)
+
+    # The priority goes first, then nobody gets a second course before everybody had a first one.
+    assert allocations['S-2'][0] == 'A'
+    assert sorted(course_id for course_ids in allocations.values() for course_id in course_ids) == ['A', 'B', 'B', 'C', 'C']
+    for student_id, course_ids in allocations.items():
+        assert not {'A', 'C'} <= set(course_ids)
+        assert set(course_ids) == set(manager.get_student_course_ids(student_id))
+    assert 'Waitlist' not in manager.courses['A']
+    manager.close()
+
+
+def test_allocation_skips_a_course_with_a_waitlist(workdir):
+    manager = make_manager()
+    manager.register('A', make_student('S-0').registration_information())
+    manager.register('A', make_student('S-9').registration_information())
+    manager.register('C', make_student('S-9').registration_information())
+    # S-9 clashes with A now, so the seat of A stays free while S-9 waits for it.
+    manager.drop('A', 'S-0')
+    assert manager.available_seats('A') == 1
+
+    allocations = allocate(manager, {'S-1': ['A', 'B']}, {'S-1': make_student('S-1')}, seed=0)
+
+    assert allocations['S-1'] == ['B']
+    assert list(manager.courses['A']['Waitlist']) == ['S-9']
+    manager.close()
+
+
+def test_preferences_are_saved(workdir):
+    student = make_student('S-1')
+    student.mark_clean()
+    student.preferences = ['B', 'A']
+    assert student in type(student).dirty
+    student.export_object()
+
+    with open('Students/S-1.json') as f:
+        data = json.load(f)
+    assert student_from_data(data).preferences == ['B', 'A']
+    assert 'preferences' not in make_student('S-2').to_dict()
+
+    storage = SqliteStorage('registration.db')
+    storage.export_many(students=[student.to_dict(), make_student('S-2').to_dict()])
+    assert storage.load_student_data('S-1')['preferences'] == ['B', 'A']
+    assert 'preferences' not in storage.load_student_data('S-2')
+    storage.close()
+
+
+def test_allocate_command(workdir):
+    write_jsonl(workdir / 'courses.jsonl', [make_course(course_id, weekday=weekday, capacity=1).to_dict()
+                                            for course_id, weekday in [('A', 'Monday'), ('B', 'Tuesday')]])
+    students = []
+    for student_id, preferences in [('S-1', ['A', 'B']), ('S-2', ['A', 'B']), ('S-3', [])]:
+        data = make_student(student_id).to_dict()
+        if preferences:
+            data['preferences'] = preferences
+        students.append(data)
+    write_jsonl(workdir / 'students.jsonl', students)
+    assert cli.main(['import', 'courses', 'courses.jsonl', '--add']) == 0
+    assert cli.main(['import', 'students', 'students.jsonl']) == 0
+
+    assert cli.main(['allocate', '--seed', '0']) == 0
+
+    manager = CourseManager()
+    assert len(manager.courses['A']['Registration']) == 1
+    assert len(manager.courses['B']['Registration']) == 1
+    assert set(manager.student_courses) == {'S-1', 'S-2'}
+    manager.close()
+    for student_id in ['S-1', 'S-2']:
+        with open('Selected_Courses/selected_courses_{}.json'.format(student_id)) as f:
+            assert len(json.load(f)) == 1
+
+
+def test_collect_preferences():
+    students = [make_student('S-1'), make_student('S-2')]
+    students[0].preferences = ['A']
+
+    assert collect_preferences(students) == {'S-1': ['A']}
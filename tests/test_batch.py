@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from basic_class import CourseManager
+from conftest import make_course, make_student
+
+
+def make_manager(students):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    manager.add_courses(make_course('D', weekday='Tuesday'))
+    # E meets at the same time as C.
+    manager.add_courses(make_course('E'))
+    return manager, {student_id: make_student(student_id) for student_id in students}
+
+
+def test_statuses(workdir):
+    manager, students = make_manager(['S-1', 'S-2', 'S-3'])
+
+    results = manager.process_batch([
+        ('S-1', 'C', 'add'),
+        ('S-2', 'C', 'add'),
+        ('S-1', 'E', 'add'),
+        ('S-1', 'X', 'add'),
+        ('S-9', 'D', 'add'),
+        ('S-1', 'D', 'move'),
+        ('S-3', 'D', 'drop'),
+        ('S-2', 'C', 'drop'),
+    ], students)
+
+    assert [result['Status'] for result in results] == [
+        'registered', 'waitlisted', 'clash', 'course_not_found', 'student_not_found', 'invalid',
+        'not_registered', 'unwaitlisted']
+    manager.close()
+
+
+def test_drop_promotes(workdir):
+    manager, students = make_manager(['S-1', 'S-2'])
+    manager.process_batch([('S-1', 'C', 'add'), ('S-2', 'C', 'add')], students)
+
+    results = manager.process_batch([('S-1', 'C', 'drop')], students)
+
+    assert results[0]['Status'] == 'dropped'
+    assert results[0]['Promoted'] == ['S-2']
+    manager.close()
+
+
+def test_add_again_keeps_the_grade(workdir):
+    manager, students = make_manager(['S-1'])
+    manager.process_batch([('S-1', 'D', 'add')], students)
+    manager.set_grade('D', 'S-1', 92.5)
+
+    results = manager.process_batch([('S-1', 'D', 'add')], students)
+
+    assert results[0]['Status'] == 'already_registered'
+    assert manager.courses['D']['Registration']['S-1']['Grade'] == 92.5
+    assert manager.register('D', students['S-1'].registration_information())[0] == 'already_registered'
+    manager.close()
+
+
+def test_selected_courses_synced_after_drop(workdir):
+    manager, students = make_manager(['S-1'])
+    manager.process_batch([('S-1', 'C', 'add'), ('S-1', 'D', 'add')], students)
+    assert set(students['S-1'].selected_courses) == {'C', 'D'}
+
+    manager.process_batch([('S-1', 'D', 'drop')], students)
+
+    assert set(students['S-1'].selected_courses) == {'C'}
+    manager.close()
+
+
+def test_batch_is_durable(workdir):
+    manager, students = make_manager(['S-1', 'S-2'])
+    manager.process_batch([('S-1', 'C', 'add'), ('S-2', 'C', 'add'), ('S-2', 'D', 'add')], students)
+    manager.close()
+
+    manager = CourseManager()
+    assert list(manager.courses['C']['Registration']) == ['S-1']
+    assert list(manager.courses['C']['Waitlist']) == ['S-2']
+    assert list(manager.courses['D']['Registration']) == ['S-2']
+    manager.close()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+from catalog import CatalogIndex
+from timetable import course_meetings, parse_time
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday']
+DEPARTMENTS = ['Math', 'Physics', 'History']
+STARTS = ['8:00', '9:30', '10:00', '13:00', '15:30']
+
+
+def random_course(rng):
+    time = {}
+    for lesson in range(rng.randint(1, 2)):
+        start = rng.choice(STARTS)
+        time['Lesson-{}'.format(lesson + 1)] = {'Weekday': rng.choice(WEEKDAYS), 'StartTime': start,
+                                                'EndTime': '{}:50'.format(parse_time(start) // 60)}
+    return {'Department': rng.choice(DEPARTMENTS), 'Credits': rng.randint(1, 4), 'Time': time,
+            'Location': 'Building {} Room {}'.format(rng.randint(1, 12), rng.randint(100, 104))}
+
+
+def scan(courses, department=None, weekday=None, starts_between=None, location=None, location_prefix=None, credits=None):
+    matched = []
+    for course_id, information in courses.items():
+        if department is not None and information['Department'] != department:
+            continue
+        if location is not None and information['Location'] != location:
+            continue
+        if location_prefix is not None and not information['Location'].startswith(location_prefix):
+            continue
+        if credits is not None and information['Credits'] not in (credits if isinstance(credits, list) else [credits]):
+            continue
+        if weekday is not None or starts_between is not None:
+            earliest, latest = (0, 24 * 60) if starts_between is None else (
+                parse_time(starts_between[0]), parse_time(starts_between[1]))
+            if not any((weekday is None or lesson['Weekday'] == weekday) and earliest <= parse_time(lesson['StartTime']) < latest
+                       for lesson in information['Time'].values()):
+                continue
+        matched.append(course_id)
+    return sorted(matched)
+
+
+def random_query(rng):
+    query = {}
+    if rng.random() < 0.5:
+        query['department'] = rng.choice(DEPARTMENTS)
+    if rng.random() < 0.5:
+        query['weekday'] = rng.choice(WEEKDAYS)
+    if rng.random() < 0.5:
+        query['starts_between'] = tuple(sorted(rng.sample(STARTS + ['12:00', '18:00'], 2), key=parse_time))
+    if rng.random() < 0.3:
+        query['location'] = 'Building {} Room {}'.format(rng.randint(1, 12), rng.randint(100, 104))
+    if rng.random() < 0.5:
+        query['location_prefix'] = rng.choice(['Building {} '.format(rng.randint(1, 12)), 'Building 1', 'Building ',
+                                               'Building 3 Room 10', 'Building 99 ', 'B'])
+    if rng.random() < 0.3:
+        query['credits'] = rng.choice([rng.randint(1, 4), [1, 3]])
+    return query
+
+
+def test_query_matches_a_scan():
+    rng = random.Random(0)
+    catalog = CatalogIndex()
+    courses = {}
+    for index in range(600):
+        course_id = 'C-{:04d}'.format(index)
+        courses[course_id] = random_course(rng)
+        catalog.add(course_id, courses[course_id], course_meetings(courses[course_id]['Time']))
+    # Some courses are removed, and some are indexed again with other information.
+    for course_id in rng.sample(sorted(courses), 150):
+        catalog.remove(course_id)
+        del courses[course_id]
+    for course_id in rng.sample(sorted(courses), 100):
+        courses[course_id] = random_course(rng)
+        catalog.add(course_id, courses[course_id], course_meetings(courses[course_id]['Time']))
+
+    for _ in range(2000):
+        query = random_query(rng)
+        assert catalog.query(**query) == scan(courses, **query), query
+
+
+def test_removed_course_leaves_no_prefix():
+    catalog = CatalogIndex()
+    catalog.add('C-1', {'Department': 'Math', 'Credits': 3, 'Location': 'Building 3 Room 101'},
+                course_meetings({'Lesson-1': {'Weekday': 'Monday', 'StartTime': '8:00', 'EndTime': '9:00'}}))
+    assert catalog.query(location_prefix='Building 3 ') == ['C-1']
+
+    catalog.remove('C-1')
+
+    assert catalog.location_prefixes == {}
+    assert catalog.query(location_prefix='Building 3 ') == []
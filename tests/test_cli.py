@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from basic_class import CourseManager
+from conftest import make_course, make_student, write_jsonl
+
+import cli
+
+
+def test_import_courses_with_add(workdir):
+    write_jsonl(workdir / 'courses.jsonl', [make_course('CS-101').to_dict(), make_course('CS-102').to_dict()])
+
+    assert cli.main(['import', 'courses', 'courses.jsonl', '--add']) == 0
+
+    assert os.path.exists('Courses/CS-101.json')
+    manager = CourseManager()
+    assert set(manager.courses) == {'CS-101', 'CS-102'}
+    manager.close()
+
+
+def test_import_courses_with_add_keeps_the_registrations(workdir):
+    write_jsonl(workdir / 'courses.jsonl', [make_course('CS-101').to_dict()])
+    assert cli.main(['import', 'courses', 'courses.jsonl', '--add']) == 0
+    manager = CourseManager()
+    manager.register('CS-101', make_student('S-1').registration_information())
+    manager.close()
+
+    assert cli.main(['import', 'courses', 'courses.jsonl', '--add']) == 0
+
+    manager = CourseManager()
+    assert list(manager.courses['CS-101']['Registration']) == ['S-1']
+    manager.close()
+
+
+def test_import_students_with_add_is_rejected(workdir):
+    write_jsonl(workdir / 'students.jsonl', [make_student('S-1').to_dict()])
+
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(['import', 'students', 'students.jsonl', '--add'])
+
+    assert exit_info.value.code == 2
+    # Nothing is written before the command fails.
+    assert not os.path.exists('Students/S-1.json')
+
+
+def test_import_students(workdir):
+    write_jsonl(workdir / 'students.jsonl', [make_student('S-1').to_dict()])
+
+    assert cli.main(['import', 'students', 'students.jsonl']) == 0
+
+    assert os.path.exists('Students/S-1.json')
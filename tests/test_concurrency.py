@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+
+from basic_class import CourseManager
+from conftest import make_course, make_student
+
+
+def test_counters_under_concurrent_threads(workdir):
+    manager = CourseManager()
+    for index in range(8):
+        manager.add_courses(make_course('C-{}'.format(index), weekday=['Monday', 'Tuesday'][index % 2],
+                                        start='{:02d}:00'.format(8 + index), end='{:02d}:30'.format(8 + index)))
+    manager.save_courses_file()
+
+    def work(index):
+        student = make_student('S-{}'.format(index))
+        for round_number in range(50):
+            course_id = 'C-{}'.format((index + round_number) % 8)
+            manager.register(course_id, student.registration_information())
+            manager.student_view(student.student_id)
+            manager.student_view(student.student_id)
+            manager.drop(course_id, student.student_id)
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.changes_since_save.value == 8 * 50 * 2
+    statistics = manager.view_statistics()
+    assert statistics['Hits'] + statistics['Misses'] == 8 * 50 * 2
+    manager.close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+from journal import Journal, load_snapshot
+
+
+def add_course(course_id):
+    return {'Op': 'add_course', 'CourseId': course_id,
+            'Information': {'Name': course_id, 'Department': 'Math', 'Credits': 3, 'Time': {}, 'Location': 'Room'}}
+
+
+def add_student(course_id, student_id):
+    return {'Op': 'add_student', 'CourseId': course_id, 'StudentId': student_id,
+            'Record': {'Name': student_id, 'Grade': -1, 'Department': 'Math', 'Gender': 'Male'}}
+
+
+def recover(directory='./Journal/', snapshot_file='courses.json'):
+    courses = load_snapshot(snapshot_file)
+    journal = Journal(directory, snapshot_file)
+    replayed = journal.replay(courses)
+    journal.close()
+    return courses, replayed
+
+
+def test_replay_skips_a_torn_line(workdir):
+    journal = Journal()
+    journal.append(add_course('C'))
+    journal.append(add_student('C', 'S-1'))
+    journal.close()
+    segment = os.path.join('Journal', sorted(os.listdir('Journal'))[-1])
+    with open(segment, 'a') as f:
+        f.write('{"Op": "add_student", "CourseId": "C", "Stud')
+
+    courses, replayed = recover()
+
+    assert replayed == 2
+    assert list(courses['C']['Registration']) == ['S-1']
+
+
+def test_checkpoint_drops_the_segments(workdir):
+    journal = Journal()
+    journal.append(add_course('C'))
+    journal.checkpoint({'C': {'Information': add_course('C')['Information'], 'Registration': {}}})
+    journal.append(add_student('C', 'S-1'))
+    journal.close()
+
+    courses, replayed = recover()
+
+    assert replayed == 1
+    assert list(courses['C']['Registration']) == ['S-1']
+
+
+def test_compaction_keeps_every_entry(workdir):
+    journal = Journal(compact_threshold=10)
+    journal.append(add_course('C'))
+    for i in range(95):
+        journal.append(add_student('C', 'S-{}'.format(i)))
+    journal.close()
+
+    courses, replayed = recover()
+
+    # A threshold crossed while a compaction runs is skipped, so more than 10 entries may be left in the journal.
+    assert os.path.exists('courses.json')
+    assert replayed < 96
+    assert len(courses['C']['Registration']) == 95
+
+
+def test_concurrent_writers_start_one_compaction_at_a_time(workdir):
+    errors = []
+    journal = Journal(compact_threshold=20)
+    journal.append(add_course('C'))
+    original = journal._compact
+
+    def compact(segments):
+        try:
+            original(segments)
+        except Exception as e:
+            errors.append(e)
+    journal._compact = compact
+
+    def write(index):
+        for i in range(200):
+            journal.append(add_student('C', 'S-{}-{}'.format(index, i)), sync=False)
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+
+    courses, _ = recover()
+    assert errors == []
+    assert len(courses['C']['Registration']) == 1600
+
+
+def test_batch_holds_the_compaction_back_until_the_flush(workdir):
+    journal = Journal(compact_threshold=10)
+    for i in range(30):
+        journal.append(add_course('C-{}'.format(i)), sync=False)
+    assert journal._compaction is None
+    assert not os.path.exists('courses.json')
+
+    journal.flush()
+    journal.wait()
+
+    assert len(load_snapshot('courses.json')) == 30
+    journal.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from basic_class import CourseManager
+from conftest import make_course, make_student
+
+
+def test_snapshot_is_isolated_from_the_changes(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    manager.add_courses(make_course('D', weekday='Tuesday'))
+    manager.register('C', make_student('S-1').registration_information())
+    manager.set_grade('C', 'S-1', 80)
+
+    with manager.snapshot() as snapshot:
+        manager.set_grade('C', 'S-1', 95)
+        manager.register('C', make_student('S-2').registration_information())
+        manager.register('D', make_student('S-1').registration_information())
+        manager.remove_courses('D')
+        manager.add_courses(make_course('E', weekday='Friday'))
+
+        assert sorted(snapshot.keys()) == ['C', 'D']
+        assert snapshot['C']['Registration']['S-1']['Grade'] == 80
+        assert 'Waitlist' not in snapshot['C']
+        assert snapshot['D']['Registration'] == {}
+        assert snapshot.transcripts(['S-1'])['S-1']['Credits'] == 3
+
+    assert manager.courses['C']['Registration']['S-1']['Grade'] == 95
+    assert list(manager.courses['C']['Waitlist']) == ['S-2']
+    assert sorted(manager.courses) == ['C', 'E']
+    assert manager._history == {}
+    manager.close()
+
+
+def test_replayed_changes_are_unsaved(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C'))
+    manager.register('C', make_student('S-1').registration_information())
+    manager.close()
+
+    manager = CourseManager()
+
+    assert manager.changes_since_save.value == 2
+    assert manager.save_courses_file()
+    assert manager.changes_since_save.value == 0
+    manager.close()
+
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+
+import pytest
+
+from storage import write_entity_file
+
+import storage
+
+
+def test_write_entity_file_fsyncs_before_the_rename(workdir, monkeypatch):
+    calls = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(storage.os, 'fsync', lambda fd: (calls.append('fsync'), fsync(fd)))
+    monkeypatch.setattr(storage.os, 'replace', lambda source, target: (calls.append('replace'), replace(source, target)))
+
+    write_entity_file('./Courses/', 'C', {'course_id': 'C'})
+
+    assert calls == ['fsync', 'replace']
+    with open('Courses/C.json') as f:
+        assert json.load(f) == {'course_id': 'C'}
+
+
+def test_write_entity_file_failure_keeps_the_old_file(workdir):
+    write_entity_file('./Courses/', 'C', {'course_id': 'C'})
+
+    with pytest.raises(TypeError):
+        write_entity_file('./Courses/', 'C', {'course_id': object()})
+
+    assert os.listdir('Courses') == ['C.json']
+    with open('Courses/C.json') as f:
+        assert json.load(f) == {'course_id': 'C'}
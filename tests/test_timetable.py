@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+from timetable import ScheduleIndex, find_clashes
+
+
+def overlapping(schedule, meetings, ignore=None):
+    """Find every course of the schedule that clashes with the meetings, by comparing all the pairs.
+    """
+    return {course_id for course_id, course_meetings in schedule.items() if course_id != ignore
+            for weekday, start, end in course_meetings for other_weekday, other_start, other_end in meetings
+            if weekday == other_weekday and start < other_end and other_start < end}
+
+
+def random_meetings(rng):
+    meetings = []
+    for _ in range(rng.randint(1, 3)):
+        start = rng.randrange(8 * 60, 20 * 60, 10)
+        meetings.append((rng.randrange(3), start, start + rng.choice([10, 30, 50, 100, 240])))
+    return meetings
+
+
+def test_clash_matches_a_brute_force_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        # The meetings of a schedule overlap each other too, like in the data loaded.
+        index = ScheduleIndex()
+        schedule = {}
+        for number in range(rng.randint(0, 12)):
+            course_id = 'C-{}'.format(number)
+            schedule[course_id] = random_meetings(rng)
+            index.add(course_id, schedule[course_id])
+        for course_id in rng.sample(sorted(schedule), len(schedule) // 3):
+            index.remove(course_id, schedule.pop(course_id))
+        assert len(index) == sum(len(meetings) for meetings in schedule.values())
+
+        for _ in range(20):
+            meetings = random_meetings(rng)
+            ignore = rng.choice(sorted(schedule)) if schedule and rng.random() < 0.3 else None
+            expected = overlapping(schedule, meetings, ignore)
+            clash = index.clash(meetings, ignore)
+            if expected:
+                assert clash in expected
+            else:
+                assert clash is None
+
+
+def test_clash_behind_a_short_meeting():
+    # The long meeting starts first, and a short one ends before the new meeting starts.
+    index = ScheduleIndex()
+    index.add('LONG', [(0, 8 * 60, 12 * 60)])
+    index.add('SHORT', [(0, 8 * 60 + 30, 9 * 60)])
+
+    assert index.clash([(0, 10 * 60, 11 * 60)]) == 'LONG'
+    assert index.clash([(0, 12 * 60, 13 * 60)]) is None
+
+
+def test_find_clashes_matches_a_brute_force_scan():
+    rng = random.Random(1)
+    meetings_by_course = {'C-{}'.format(number): random_meetings(rng) for number in range(40)}
+
+    found = {frozenset((first, second)) for first, second, weekday in find_clashes(meetings_by_course)}
+
+    expected = {frozenset((course_id, other)) for course_id, meetings in meetings_by_course.items()
+                for other in overlapping({key: value for key, value in meetings_by_course.items() if key != course_id}, meetings)}
+    assert found == expected
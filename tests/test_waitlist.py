@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from basic_class import CourseManager
+from conftest import make_course, make_student
+
+
+def register(manager, course_id, student_id):
+    return manager.register(course_id, make_student(student_id).registration_information())[0]
+
+
+def test_promotion_in_the_order_of_the_waitlist(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    assert register(manager, 'C', 'S-0') == 'registered'
+    for i in range(1, 4):
+        assert register(manager, 'C', 'S-{}'.format(i)) == 'waitlisted'
+
+    promoted = []
+    current = 'S-0'
+    for _ in range(3):
+        status, _, current_promoted = manager.drop('C', current)
+        assert status == 'dropped'
+        promoted += current_promoted
+        current = current_promoted[0]
+
+    assert promoted == ['S-1', 'S-2', 'S-3']
+    assert 'Waitlist' not in manager.courses['C']
+    manager.close()
+
+
+def test_clashing_student_keeps_the_position(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    manager.add_courses(make_course('D', weekday='Tuesday'))
+    # E meets at the same time as C.
+    manager.add_courses(make_course('E'))
+    register(manager, 'C', 'S-0')
+    register(manager, 'C', 'S-1')
+    register(manager, 'C', 'S-2')
+    register(manager, 'E', 'S-1')
+
+    assert manager.drop('C', 'S-0')[2] == ['S-2']
+    assert list(manager.courses['C']['Waitlist']) == ['S-1']
+
+    # The seat is free again, but the student waiting still clashes.
+    assert manager.drop('C', 'S-2')[2] == []
+    assert list(manager.courses['C']['Waitlist']) == ['S-1']
+    manager.close()
+
+
+def test_clash_dropped_promotes_from_the_waitlist(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    manager.add_courses(make_course('E'))
+    register(manager, 'C', 'S-0')
+    register(manager, 'C', 'S-1')
+    register(manager, 'C', 'S-2')
+    register(manager, 'E', 'S-1')
+    manager.drop('C', 'S-0')
+    assert list(manager.courses['C']['Waitlist']) == ['S-1']
+
+    manager.set_course_capacity('C', 2)
+    assert list(manager.courses['C']['Waitlist']) == ['S-1']
+    manager.drop('E', 'S-1')
+
+    assert 'S-1' in manager.courses['C']['Registration']
+    assert 'S-1' not in manager.student_waitlists
+    manager.close()
+
+
+def test_newcomer_waits_behind_the_waitlist(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    manager.add_courses(make_course('E'))
+    register(manager, 'C', 'S-0')
+    register(manager, 'C', 'S-1')
+    register(manager, 'E', 'S-1')
+    # The seat is free, but S-1 waits for it, so the newcomer waits too.
+    manager.drop('C', 'S-0')
+
+    assert register(manager, 'C', 'S-2') == 'waitlisted'
+    assert list(manager.courses['C']['Waitlist']) == ['S-1', 'S-2']
+    manager.close()
+
+
+def test_waitlist_survives_a_restart(workdir):
+    manager = CourseManager()
+    manager.add_courses(make_course('C', capacity=1))
+    for i in range(4):
+        register(manager, 'C', 'S-{}'.format(i))
+    manager.drop('C', 'S-2')
+    manager.close()
+
+    manager = CourseManager()
+    assert list(manager.courses['C']['Waitlist']) == ['S-1', 'S-3']
+    assert manager.drop('C', 'S-0')[2] == ['S-1']
+    manager.close()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+from array import array
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday',
+            'Thursday', 'Friday', 'Saturday', 'Sunday']
+# The index of each weekday, Monday is 0.
+DAY_INDEX = {weekday: index for index, weekday in enumerate(WEEKDAYS)}
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_time(time_string):
+    """Parse the time like '8:30' into the minutes since midnight.
+
+    Args:
+        time_string (str): The time in the format of 'HH:MM'.
+
+    Returns:
+        minutes (int): The minutes since midnight.
+    """
+    hour, minute = time_string.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def format_minutes(minutes):
+    """Format the minutes since midnight like '8:30'.
+
+    Args:
+        minutes (int): The minutes since midnight.
+
+    Returns:
+        time_string (str): The time in the format of 'H:MM'.
+    """
+    return '{}:{:02d}'.format(minutes // 60, minutes % 60)
+
+
+def compile_time(time):
+    """Compile the time of the course once into the minutes since the start of the week, Monday 0:00.
+
+    Args:
+        time (dict): The time of the course, like {'Lesson-1': {'Weekday': 'Monday', 'StartTime': '8:30', 'EndTime': '10:10'}}.
+
+    Returns:
+        week_minutes (array): The start and the end of each lesson in turn, in the order of the lessons,
+            like array('H', [510, 610]) for the time above.
+    """
+    week_minutes = array('H')
+    for lesson in time.values():
+        day = DAY_INDEX[lesson['Weekday']] * MINUTES_PER_DAY
+        week_minutes.append(day + parse_time(lesson['StartTime']))
+        week_minutes.append(day + parse_time(lesson['EndTime']))
+    return week_minutes
+
+
+def render_time(week_minutes):
+    """Render the compiled time for the schedule.
+
+    Args:
+        week_minutes (array): The compiled time, from compile_time.
+
+    Returns:
+        lessons (list): The (weekday, start, end) tuples like ('Monday', '8:30', '10:10'), in the order of the lessons.
+    """
+    return [(WEEKDAYS[week_minutes[i] // MINUTES_PER_DAY], format_minutes(week_minutes[i] % MINUTES_PER_DAY),
+             format_minutes(week_minutes[i + 1] % MINUTES_PER_DAY)) for i in range(0, len(week_minutes), 2)]
+
+
+def time_meetings(week_minutes):
+    """Get the meetings of the compiled time.
+
+    Args:
+        week_minutes (array): The compiled time, from compile_time.
+
+    Returns:
+        meetings (list): The (weekday, start, end) tuples, with the minutes since midnight.
+    """
+    return sorted((WEEKDAYS[week_minutes[i] // MINUTES_PER_DAY], week_minutes[i] % MINUTES_PER_DAY,
+                   week_minutes[i + 1] % MINUTES_PER_DAY) for i in range(0, len(week_minutes), 2))
+
+
+def course_meetings(time):
+    """Parse the time of the course once into the meetings.
+
+    Args:
+        time (dict): The time of the course, like {'Lesson-1': {'Weekday': 'Monday', 'StartTime': '8:30', 'EndTime': '10:10'}}.
+
+    Returns:
+        meetings (list): The (weekday, start, end) tuples, with the minutes since midnight.
+    """
+    return time_meetings(compile_time(time))
+
+
+def times_overlap(first, second):
+    """Check whether two compiled times overlap, on the integers only.
+
+    Args:
+        first (array): The compiled time, from compile_time.
+        second (array): The other compiled time.
+
+    Returns:
+        overlap (bool): Whether a lesson of the first overlaps a lesson of the second.
+    """
+    for i in range(0, len(first), 2):
+        for j in range(0, len(second), 2):
+            if first[i] < second[j + 1] and second[j] < first[i + 1]:
+                return True
+    return False
+
+
+def busy_intervals(times):
+    """Merge the compiled times, like the courses of a student, into the busy intervals of the week.
+
+    Args:
+        times (iterable): The compiled times, from compile_time.
+
+    Returns:
+        intervals (list): The sorted (start, end) tuples of the minutes since the start of the week, which never overlap.
+    """
+    lessons = sorted((week_minutes[i], week_minutes[i + 1])
+                     for week_minutes in times for i in range(0, len(week_minutes), 2))
+    intervals = []
+    for start, end in lessons:
+        if intervals and start <= intervals[-1][1]:
+            intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+        else:
+            intervals.append((start, end))
+    return intervals
+
+
+def free_intervals(times, day_start=8 * 60, day_end=22 * 60, weekdays=WEEKDAYS[:5]):
+    """Find the free intervals of each weekday between the busy ones.
+
+    Args:
+        times (iterable): The compiled times, from compile_time.
+        day_start (int): The minutes since midnight the day starts.
+        day_end (int): The minutes since midnight the day ends.
+        weekdays (list): The weekdays, Monday to Friday by default.
+
+    Returns:
+        intervals (list): The sorted (start, end) tuples of the minutes since the start of the week.
+    """
+    busy = busy_intervals(times)
+    intervals = []
+    for weekday in weekdays:
+        day = DAY_INDEX[weekday] * MINUTES_PER_DAY
+        start, end = day + day_start, day + day_end
+        # Only the busy intervals of the day are visited.
+        i = bisect.bisect_right(busy, (start, MINUTES_PER_DAY * 7))
+        if i > 0 and busy[i - 1][1] > start:
+            start = busy[i - 1][1]
+        while i < len(busy) and busy[i][0] < end:
+            if busy[i][0] > start:
+                intervals.append((start, busy[i][0]))
+            start = max(start, busy[i][1])
+            i += 1
+        if start < end:
+            intervals.append((start, end))
+    return intervals
+
+
+class ScheduleIndex(object):
+    """The interval index of the meetings in the schedule of one student.
+
+    The meetings of each weekday are kept sorted by the start time, with the running maximum of the end times.
+    The meetings of a schedule may overlap, e.g. in the data loaded or in the lessons of one course, so a clash
+    is found by walking back from the last meeting that starts before the end, only while the running maximum
+    says an earlier meeting still runs.
+    """
+
+    def __init__(self):
+        # {'Weekday': ([start, start], [(end, course_id), (end, course_id)], [max end, max end])}
+        self.days = {}
+
+    def clash(self, meetings, ignore=None):
+        """Find the course in the schedule that clashes with the meetings.
+
+        Args:
+            meetings (list): The (weekday, start, end) tuples of the course.
+            ignore (str): The id of the course that is not checked, like the course itself.
+
+        Returns:
+            course_id (str): The id of the course clashed, None if there is no clash.
+        """
+        for weekday, start, end in meetings:
+            if weekday not in self.days:
+                continue
+            starts, ends, max_ends = self.days[weekday]
+            # Only the meetings that start before the end may overlap, and none of the earlier ones does
+            # once the running maximum of their ends is not after the start.
+            i = bisect.bisect_left(starts, end) - 1
+            while i >= 0 and max_ends[i] > start:
+                if ends[i][0] > start and ends[i][1] != ignore:
+                    return ends[i][1]
+                i -= 1
+        return None
+
+    @staticmethod
+    def _update_max_ends(ends, max_ends, i):
+        """Recompute the running maximum of the end times from the index given.
+        """
+        running = max_ends[i - 1] if i > 0 else 0
+        for j in range(i, len(ends)):
+            running = max(running, ends[j][0])
+            max_ends[j] = running
+
+    def add(self, course_id, meetings):
+        """Add the meetings of the course into the schedule.
+
+        Args:
+            course_id (str): The id of the course.
+            meetings (list): The (weekday, start, end) tuples of the course.
+        """
+        for weekday, start, end in meetings:
+            if weekday not in self.days:
+                self.days[weekday] = ([], [], [])
+            starts, ends, max_ends = self.days[weekday]
+            i = bisect.bisect_right(starts, start)
+            starts.insert(i, start)
+            ends.insert(i, (end, course_id))
+            max_ends.insert(i, end)
+            self._update_max_ends(ends, max_ends, i)
+
+    def remove(self, course_id, meetings):
+        """Remove the meetings of the course from the schedule.
+
+        Args:
+            course_id (str): The id of the course.
+            meetings (list): The (weekday, start, end) tuples of the course.
+        """
+        for weekday, start, end in meetings:
+            if weekday not in self.days:
+                continue
+            starts, ends, max_ends = self.days[weekday]
+            i = bisect.bisect_left(starts, start)
+            while i < len(starts) and starts[i] == start:
+                if ends[i] == (end, course_id):
+                    del starts[i]
+                    del ends[i]
+                    del max_ends[i]
+                    self._update_max_ends(ends, max_ends, i)
+                    break
+                i += 1
+            if len(starts) == 0:
+                del self.days[weekday]
+
+    def __len__(self):
+        return sum(len(starts) for starts, ends, max_ends in self.days.values())
+
+
+def find_clashes(meetings_by_course):
+    """Find every pair of the courses whose meetings overlap, with one sweep over each weekday.
+
+    Args:
+        meetings_by_course (dict): The meetings of each course, from course_meetings.
+
+    Returns:
+        clashes (list): The (course_id, course_id, weekday) tuples of the clashes.
+    """
+    days = {}
+    for course_id, meetings in meetings_by_course.items():
+        for weekday, start, end in meetings:
+            days.setdefault(weekday, []).append((start, end, course_id))
+
+    clashes = []
+    for weekday, day in days.items():
+        day.sort()
+        # The meetings that are still running at the current start time.
+        active = []
+        for start, end, course_id in day:
+            active = [meeting for meeting in active if meeting[0] > start]
+            for active_end, active_course_id in active:
+                if active_course_id != course_id:
+                    clashes.append((active_course_id, course_id, weekday))
+            active.append((end, course_id))
+    return clashes